@@ -0,0 +1,213 @@
+"""Time the till's real data paths against a synthetic database.
+
+    python -m benchmarks.data_paths --save baseline.json
+    python -m benchmarks.data_paths --baseline baseline.json      # exits 1 on a regression
+
+A database is generated with benchmarks.synthetic (sizes as flags), or an
+existing one is reused with --db. Each path is warmed up once and then
+timed --repeat times; the median is what gets compared. A path regresses
+when its median grows by more than --tolerance and by more than
+NOISE_FLOOR_MS. The checkout path inserts real sales.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+from benchmarks import synthetic
+from services import instrumentation
+
+# Differences smaller than this are timer noise, whatever the ratio
+NOISE_FLOOR_MS = 0.05
+
+# Codes looked up per "price lookup" run
+LOOKUPS = 1000
+
+SEARCH_PREFIXES = ('ch', 'cho', 'milk', 'tea 1l', 'sku-00001', 'pack')
+
+
+def build_paths(rng):
+    """name -> zero-argument callable for every timed path"""
+    # The page models pull in PyQt5, so they are imported only for a run
+    import db
+    from services import reports, sales_summary
+    from services.cart import Cart
+    from services.catalog import ProductCatalog, catalog
+    from services.credentials import verify_credentials
+    from services.inventory import StockCache
+    from services.search import ProductSearch
+    from pages.inventory import InventoryModel
+    from pages.settings import UsersModel, RolesModel, PermissionsModel, ModulesModel
+
+    catalog.load()
+    codes = [p.sku for p in rng.sample(list(catalog.products()), min(LOOKUPS, len(catalog)))]
+    search = ProductSearch()
+    username = db.get_connection().execute(
+        "SELECT username FROM users WHERE is_active = 1 AND username LIKE 'user%' LIMIT 1"
+    ).fetchone()[0]
+    end = date.today().isoformat()
+    start = (date.today() - timedelta(days=29)).isoformat()
+    year_start = (date.today() - timedelta(days=364)).isoformat()
+
+    def price_lookup():
+        for code in codes:
+            catalog.price(catalog.lookup_code(code).product_id)
+
+    def checkout():
+        cart = Cart()
+        for code in rng.sample(codes, 3):
+            cart.add(catalog.lookup_code(code), rng.randint(1, 3))
+        cart.checkout(username)
+
+    def product_search():
+        search.clear()
+        for prefix in SEARCH_PREFIXES:
+            search.fetch(prefix)
+
+    def listing(model_class, sort_column=None, **filters):
+        model = model_class()
+        model.filters.update(filters)
+        if sort_column is not None:
+            model.sort_column = sort_column
+        return lambda: model.fetch_page(None, model.page_size)
+
+    paths = {
+        'product load': lambda: ProductCatalog().load(),
+        f'price lookup x{len(codes)}': price_lookup,
+        'product search': product_search,
+        'checkout insert': checkout,
+        'day totals': sales_summary.day_totals,
+        'login lookup': lambda: verify_credentials(username, synthetic.PASSWORD),
+        'stock load': lambda: StockCache().load(),
+        'users listing': listing(UsersModel),
+        'users by role': listing(UsersModel, sort_column=1),
+        'users search': listing(UsersModel, search='user0001'),
+        'roles listing': listing(RolesModel),
+        'permissions listing': listing(PermissionsModel),
+        'modules listing': listing(ModulesModel),
+        'inventory listing': listing(InventoryModel),
+        'low stock listing': listing(InventoryModel, low=True),
+    }
+    for name in reports.REPORTS:
+        paths[f'report by {name} (30 days)'] = lambda name=name: reports.run(name, start, end)
+    paths['report by product (year)'] = lambda: reports.run('product', year_start, end)
+    return paths
+
+
+def time_path(func, repeat):
+    func()  # warm caches and prepared statements
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        'runs': repeat,
+        'min_ms': round(samples[0], 4),
+        'median_ms': round(statistics.median(samples), 4),
+        'p95_ms': round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 4),
+    }
+
+
+def run(repeat, seed, only=None):
+    rng = random.Random(seed)
+    results = {}
+    for name, func in build_paths(rng).items():
+        if only and not any(part in name for part in only):
+            continue
+        results[name] = time_path(func, repeat)
+        print(f"{name:<28} {results[name]['median_ms']:>10.3f} ms  "
+              f"(p95 {results[name]['p95_ms']:.3f})", flush=True)
+    return results
+
+
+def compare(results, baseline, tolerance, key='median_ms'):
+    """Print the change of every path against a baseline; return the names that regressed"""
+    regressions = []
+    print(f"\n{'path':<28} {'baseline':>10} {'now':>10} {'change':>8}")
+    for name, now in results.items():
+        before = baseline['results'].get(name)
+        if before is None:
+            print(f"{name:<28} {'-':>10} {now[key]:>10.3f}      new")
+            continue
+        old, new = before[key], now[key]
+        # Anything above a zero baseline (e.g. a first stall) is an unbounded change
+        change = (new - old) / old if old else (float('inf') if new > old else 0.0)
+        regressed = change > tolerance and new - old > NOISE_FLOOR_MS
+        if regressed:
+            regressions.append(name)
+        print(f"{name:<28} {old:>10.3f} {new:>10.3f} {change:>+7.0%}"
+              f"{'  REGRESSION' if regressed else ''}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--db', help="reuse this database instead of generating one")
+    synthetic.add_size_arguments(parser)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--only', nargs='*', help="time only paths whose name contains one of these")
+    parser.add_argument('--save', help="write the results to this JSON file")
+    parser.add_argument('--baseline', help="compare against results saved with --save")
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help="allowed median slowdown before a path counts as regressed")
+    args = parser.parse_args()
+
+    # Measure the login lookup, not a rehash to the configured bcrypt cost
+    os.environ['BCRYPT_ROUNDS'] = str(synthetic.BCRYPT_ROUNDS)
+
+    sizes = synthetic.sizes_from(args)
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = args.db or os.path.join(tmp, 'bench.db')
+        generated = not os.path.exists(db_path)
+        if generated:
+            start = time.perf_counter()
+            sales = synthetic.setup_database(db_path, **sizes)
+            print(f"generated {sales} sales in {time.perf_counter() - start:.1f}s", flush=True)
+        os.environ['DB_PATH'] = db_path
+
+        import db
+        db.setup_database(db_path)  # brings a reused database up to the current schema
+        try:
+            results = run(args.repeat, args.seed, args.only)
+        finally:
+            db.close_all()
+
+    report = {
+        'meta': {
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'sizes': sizes if generated else None,  # unknown for a reused database
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'repeat': args.repeat,
+            'instrumented': instrumentation.ENABLED,
+        },
+        'results': results,
+    }
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline['meta'].get('sizes') != report['meta']['sizes']:
+            print("warning: baseline was taken with different data sizes", file=sys.stderr)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regressed: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,342 @@
+"""Time the real Qt pages offscreen against a synthetic database.
+
+    python -m benchmarks.gui --save gui.json
+    python -m benchmarks.gui --baseline gui.json      # exits 1 on a regression
+
+Runs headless (QT_QPA_PLATFORM=offscreen). Measures how long MainWindow,
+CashierPage and SettingsPage take to build, how long each settings tab
+takes to show its first page, memory per row as the users table is
+scrolled, and event-loop stalls while simulated checkouts go through the
+cashier page and the sales journal. Dialogs are answered automatically so
+nothing blocks on them. Results are compared like benchmarks.data_paths.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+from benchmarks import synthetic
+from benchmarks.data_paths import compare
+
+# Heartbeat timer interval; a tick arriving later than this plus --stall-ms is a stall
+HEARTBEAT_MS = 5
+
+# Longest wait for a page or query before the run is abandoned
+WAIT_TIMEOUT = 60
+
+# Users rows scrolled through for the memory measurement
+MEMORY_ROWS = 5000
+
+SETTINGS_TABS = ('users', 'roles', 'permissions', 'modules')
+
+
+def wait(app, condition, timeout=WAIT_TIMEOUT):
+    """Run the event loop until condition() holds"""
+    deadline = time.perf_counter() + timeout
+    while not condition():
+        if time.perf_counter() > deadline:
+            raise TimeoutError("page did not finish loading")
+        app.processEvents()
+        time.sleep(0.0005)
+
+
+def first_page_loaded(model):
+    return not model.loading and (model.rows or not model.has_more)
+
+
+def rss_bytes():
+    """Resident set size of this process (Linux)"""
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+
+def summarize(samples, unit='ms'):
+    samples = sorted(samples)
+    return {
+        'runs': len(samples),
+        'unit': unit,
+        'min': round(samples[0], 4),
+        'median': round(statistics.median(samples), 4),
+        'p95': round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 4),
+    }
+
+
+def single(value, unit):
+    return {'runs': 1, 'unit': unit, 'min': round(value, 4), 'median': round(value, 4),
+            'p95': round(value, 4)}
+
+
+def elapsed_ms(start):
+    return (time.perf_counter() - start) * 1000
+
+
+class Heartbeat:
+    """Records how late a fast repeating timer fires while the event loop is busy"""
+
+    def __init__(self, stall_ms):
+        from PyQt5.QtCore import QTimer
+        self.stall_ms = stall_ms
+        self.timer = QTimer()
+        self.timer.setInterval(HEARTBEAT_MS)
+        self.timer.timeout.connect(self.tick)
+        self.gaps = []
+
+    def start(self):
+        self.gaps = []
+        self.last = time.perf_counter()
+        self.timer.start()
+
+    def stop(self):
+        self.timer.stop()
+
+    def tick(self):
+        now = time.perf_counter()
+        self.gaps.append((now - self.last) * 1000 - HEARTBEAT_MS)
+        self.last = now
+
+    def stalls(self):
+        return [gap for gap in self.gaps if gap > self.stall_ms]
+
+
+def answer_dialogs():
+    """Make the message boxes return at once instead of waiting for a click"""
+    from PyQt5.QtWidgets import QMessageBox
+    shown = []
+
+    def record(parent, title, text, *args, **kwargs):
+        shown.append((title, text))
+        return QMessageBox.Ok
+    for name in ('information', 'warning', 'critical'):
+        setattr(QMessageBox, name, staticmethod(record))
+    QMessageBox.question = staticmethod(lambda *args, **kwargs: QMessageBox.Yes)
+    return shown
+
+
+def measure_construction(app, repeat):
+    import main
+    from pages.cashier import CashierPage
+    from pages.settings import SettingsPage
+
+    results = {}
+    for name, build in (('main window build', main.MainWindow),
+                        ('cashier page build', CashierPage),
+                        ('settings page build', SettingsPage)):
+        samples = []
+        for _ in range(repeat + 1):
+            start = time.perf_counter()
+            widget = build()
+            samples.append(elapsed_ms(start))
+            widget.close()
+            widget.deleteLater()
+            app.processEvents()
+        results[name] = summarize(samples[1:])  # the first build also imports and warms up
+    return results
+
+
+def measure_settings_tabs(app, window, repeat):
+    """Time from opening each settings tab to its first page of rows"""
+    from pages.settings import SettingsPage
+
+    samples = {tab: [] for tab in SETTINGS_TABS}
+    for _ in range(repeat):
+        page = SettingsPage()
+        window.stacked_widget.addWidget(page)
+        start = time.perf_counter()
+        window.stacked_widget.setCurrentWidget(page)
+        for index, tab in enumerate(SETTINGS_TABS):
+            if index:
+                start = time.perf_counter()
+                page.tab_widget.setCurrentIndex(index)
+            wait(app, lambda: index in page.tabs and first_page_loaded(page.tabs[index].model))
+            samples[tab].append(elapsed_ms(start))
+        window.stacked_widget.removeWidget(page)
+        page.deleteLater()
+        app.processEvents()
+    return {f'{tab} tab first page': summarize(samples[tab]) for tab in SETTINGS_TABS}
+
+
+def measure_row_memory(app, window, rows):
+    """Python heap and RSS growth after scrolling through rows users rows, and the rows held"""
+    from pages.settings import SettingsPage
+
+    page = SettingsPage()
+    window.stacked_widget.addWidget(page)
+    window.stacked_widget.setCurrentWidget(page)
+    tab = page.tabs[0]
+    wait(app, lambda: first_page_loaded(tab.model))
+
+    scrolled = [len(tab.model.rows)]
+    tab.model.rowsInserted.connect(lambda parent, first, last: scrolled.__setitem__(
+        0, scrolled[0] + last - first + 1))
+    rss_before = rss_bytes()
+    tracemalloc.start()
+    heap_before = tracemalloc.get_traced_memory()[0]
+    while scrolled[0] < rows and tab.model.has_more:
+        tab.table.scrollToBottom()
+        tab.model.fetchMore()
+        wait(app, lambda: not tab.model.loading)
+    app.processEvents()
+    heap_after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    rss_after = rss_bytes()
+    held = len(tab.model.rows)
+
+    window.stacked_widget.removeWidget(page)
+    page.deleteLater()
+    app.processEvents()
+    return {
+        'users scroll python heap': single((heap_after - heap_before) / 1024, 'KiB'),
+        'users scroll rss': single(max(0, rss_after - rss_before) / 1024, 'KiB'),
+        'users rows held': single(held, 'rows'),
+    }
+
+
+def measure_checkouts(app, window, checkouts, stall_ms, seed):
+    """Scan and check out carts from timer events, watching the loop with a heartbeat"""
+    from PyQt5.QtCore import QTimer
+    from services.catalog import catalog
+    from services.journal import journal
+
+    window.navigate_to('cashier')
+    page = window.pages['cashier']
+    wait(app, lambda: catalog.loaded and page.product_input.isEnabled())
+    rng = random.Random(seed)
+    codes = [p.sku for p in rng.sample(list(catalog.products()), min(500, len(catalog)))]
+
+    handler_ms = []
+    remaining = [checkouts]
+    heartbeat = Heartbeat(stall_ms)
+
+    def one_checkout():
+        start = time.perf_counter()
+        for code in rng.sample(codes, rng.randint(1, 5)):
+            page.scan_input.setText(code)
+            page.scan_product()
+        page.checkout()
+        handler_ms.append(elapsed_ms(start))
+        remaining[0] -= 1
+        if remaining[0]:
+            QTimer.singleShot(rng.randint(5, 30), one_checkout)
+
+    heartbeat.start()
+    QTimer.singleShot(0, one_checkout)
+    wait(app, lambda: not remaining[0] and not journal.pending())
+    heartbeat.stop()
+
+    stalls = heartbeat.stalls()
+    return {
+        'checkout handler': summarize(handler_ms),
+        'checkout loop max gap': single(max(heartbeat.gaps, default=0.0), 'ms'),
+        'checkout stalls': single(len(stalls), 'count'),
+    }
+
+
+def run(args):
+    from PyQt5.QtWidgets import QApplication
+    import db
+    import main
+    from services.journal import journal
+    from services.queries import executor
+
+    app = QApplication(sys.argv[:1])
+    dialogs = answer_dialogs()
+    journal.start()
+    results = {}
+    try:
+        results.update(measure_construction(app, args.repeat))
+
+        window = main.MainWindow()
+        window.show()
+        window.on_login_success('admin', 'admin')
+        app.processEvents()
+        results.update(measure_settings_tabs(app, window, args.repeat))
+        results.update(measure_row_memory(app, window, args.rows))
+        results.update(measure_checkouts(app, window, args.checkouts, args.stall_ms, args.seed))
+    finally:
+        executor.shutdown()
+        journal.stop()
+        db.close_all()
+
+    for name, result in results.items():
+        print(f"{name:<28} {result['median']:>10.3f} {result['unit']:<5} (p95 {result['p95']:.3f})")
+    unexpected = [text for title, text in dialogs if title != "Checkout"]
+    if unexpected:
+        print(f"warning: {len(unexpected)} unexpected dialogs, first: {unexpected[0]}",
+              file=sys.stderr)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--db', help="reuse this database instead of generating one")
+    synthetic.add_size_arguments(parser)
+    parser.set_defaults(users=20000, years=0.25)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--rows', type=int, default=MEMORY_ROWS,
+                        help="users rows scrolled through for the memory measurement")
+    parser.add_argument('--checkouts', type=int, default=200)
+    parser.add_argument('--stall-ms', type=float, default=50,
+                        help="event-loop delay that counts as a stall")
+    parser.add_argument('--save', help="write the results to this JSON file")
+    parser.add_argument('--baseline', help="compare against results saved with --save")
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help="allowed median growth before a measurement counts as regressed")
+    args = parser.parse_args()
+
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    os.environ['BCRYPT_ROUNDS'] = str(synthetic.BCRYPT_ROUNDS)
+
+    sizes = synthetic.sizes_from(args)
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = args.db or os.path.join(tmp, 'bench.db')
+        generated = not os.path.exists(db_path)
+        if generated:
+            start = time.perf_counter()
+            sales = synthetic.setup_database(db_path, **sizes)
+            print(f"generated {sales} sales in {time.perf_counter() - start:.1f}s", flush=True)
+        os.environ['DB_PATH'] = db_path
+        os.environ['JOURNAL_PATH'] = os.path.join(tmp, 'bench.journal')
+
+        import db
+        db.setup_database(db_path)
+        results = run(args)
+
+    report = {
+        'meta': {
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'sizes': sizes if generated else None,
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'qpa': os.environ['QT_QPA_PLATFORM'],
+            'repeat': args.repeat,
+            'stall_ms': args.stall_ms,
+        },
+        'results': results,
+    }
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline['meta'].get('sizes') != report['meta']['sizes']:
+            print("warning: baseline was taken with different data sizes", file=sys.stderr)
+        regressions = compare(results, baseline, args.tolerance, key='median')
+        if regressions:
+            print(f"\n{len(regressions)} regressed: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,111 @@
+"""Assert that the hot queries are answered from indexes rather than full table scans.
+
+Run from the repository root:  python -m benchmarks.query_plans
+"""
+import os
+import re
+import sys
+import tempfile
+
+from PyQt5.QtCore import Qt
+
+import db
+from pages.inventory import InventoryModel
+from pages.settings import ROLES_WITH_PERMISSION, USERS_WITH_ROLE, UsersModel
+from services import changelog, reports
+from services.catalog import PRODUCT_CHANGES
+from services.credentials import LOGIN_QUERY
+from services.inventory import SET_COUNT_BY_CODE, STOCK_CHANGES
+from services.permissions import PERMISSION_TABLES
+from services.sales_summary import DAY_TOTALS
+from services.search import PRODUCT_MATCH
+from services.sync import CATALOG_CHANGES, CATALOG_SNAPSHOT, SALE_LINES_BETWEEN, SALES_AFTER
+
+# Rows a listing page continues after, shaped like each model's rows
+USER_ROW = (1, 'admin', 'admin', 1, '2025-01-01', 1)
+INVENTORY_ROW = (1, 'Widget', 'SKU1', 5, 2)
+
+
+def page_query(model, column, order=Qt.AscendingOrder, after=None, **filters):
+    """The (sql, params) a listing model runs for the page after the given row"""
+    model.sort_column = column
+    model.sort_order = order
+    model.filters = filters
+    where, params = model.keyset(after)
+    return model.query(where, params, model.order_by(), model.page_size)
+
+
+def listing_queries():
+    """Keyset pages of the listings, in every order the user can pick"""
+    queries = {}
+    users = UsersModel()
+    for column in users.sort_keys:
+        for order, label in ((Qt.AscendingOrder, 'asc'), (Qt.DescendingOrder, 'desc')):
+            name = f"user listing by {users.headers[column].lower()} {label}"
+            queries[name] = page_query(users, column, order, USER_ROW)
+    inventory = InventoryModel()
+    queries['inventory listing'] = page_query(inventory, 0, after=INVENTORY_ROW)
+    queries['low stock listing'] = page_query(inventory, 0, after=INVENTORY_ROW, low=True)
+    return queries
+
+
+# name -> (sql, params) for every query on a latency-sensitive path, taken from the code
+# that runs it so the plans checked are the plans the app gets
+HOT_QUERIES = {
+    'login lookup': (LOGIN_QUERY, ('admin',)),
+    'product search': (PRODUCT_MATCH, ('"wid"*', 20)),
+    'catalog refresh': (PRODUCT_CHANGES, (0,)),
+    'permission changes': changelog.changes_query(0, PERMISSION_TABLES),
+    'day totals': (DAY_TOTALS, ('2025-01-01', 1)),
+    'users with role': (USERS_WITH_ROLE, (1,)),
+    'roles with permission': (ROLES_WITH_PERMISSION, (1,)),
+    'stock refresh': (STOCK_CHANGES, (0,)),
+    'stock count by code': (SET_COUNT_BY_CODE, {'count': 1, 'code': 'SKU1'}),
+    **{f"report: {name}": (report.sql, ('2025-01-01', '2025-01-31'))
+       for name, report in reports.REPORTS.items()},
+    **listing_queries(),
+    'sync: sales to send': (SALES_AFTER, (0, 500)),
+    'sync: sale lines': (SALE_LINES_BETWEEN, (1, 500)),
+    'sync: catalog changes': (CATALOG_CHANGES, (0, 5000)),
+    'sync: catalog snapshot': (CATALOG_SNAPSHOT, (0, 5000)),
+}
+
+# A bare "SCAN <table>" is a full table scan; "SCAN ... USING [COVERING] INDEX" is fine
+FULL_SCAN = re.compile(r'^SCAN (\w+)$')
+
+
+def full_scans(conn, sql, params):
+    """Return the tables a query would read with a full scan"""
+    # Scanning a subquery's already aggregated rows (e.g. the reports' "t") is expected
+    tables = {name for name, in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    plan = conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+    return [m.group(1) for *_, detail in plan
+            if (m := FULL_SCAN.match(detail)) and m.group(1) in tables]
+
+
+def check(conn):
+    """Return {query name: [scanned tables]} for every hot query that scans"""
+    failures = {}
+    for name, (sql, params) in HOT_QUERIES.items():
+        scans = full_scans(conn, sql, params)
+        if scans:
+            failures[name] = scans
+    return failures
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'plans.db')
+        db.setup_database(db_path)
+        conn = db.connect(db_path)
+        failures = check(conn)
+        conn.close()
+
+    for name in HOT_QUERIES:
+        status = f"FULL SCAN of {', '.join(failures[name])}" if name in failures else "ok"
+        print(f"{name:<32} {status}")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,83 @@
+"""Measure import time and time-to-login-screen for the application.
+
+Each run happens in a fresh interpreter so imports are cold. Run from the
+repository root:  python -m benchmarks.startup [--runs N] [--json out.json]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+
+def measure():
+    """Child process: time importing main and showing the login screen
+
+    Only stdlib modules are loaded before the timer starts, so the
+    application's own imports (db, PyQt5, the pages) are all counted.
+    """
+    start = time.perf_counter()
+    import main
+    imported = time.perf_counter()
+
+    from PyQt5.QtWidgets import QApplication
+    app = QApplication(sys.argv[:1])
+    main.migrations.migrate(main.db.get_connection())
+    window = main.MainWindow()
+    window.show()
+    while not window.login_page.isVisible():
+        app.processEvents()
+    app.processEvents()
+    shown = time.perf_counter()
+
+    result = {
+        'import_ms': (imported - start) * 1000,
+        'login_screen_ms': (shown - start) * 1000,
+        'pages_built': sorted(window.pages),
+    }
+    main.db.close_all()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--json', help="write the results to this file")
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure()))
+        return
+
+    import db  # only the parent needs it, to create the database
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, DB_PATH=os.path.join(tmp, 'startup.db'))
+        env.setdefault('QT_QPA_PLATFORM', 'offscreen')
+        db.setup_database(env['DB_PATH'])
+
+        runs = []
+        for _ in range(args.runs):
+            out = subprocess.run([sys.executable, '-m', 'benchmarks.startup', '--child'],
+                                 env=env, capture_output=True, text=True, check=True).stdout
+            runs.append(json.loads(out.strip().splitlines()[-1]))
+
+    summary = {
+        'runs': runs,
+        'median_import_ms': statistics.median(r['import_ms'] for r in runs),
+        'median_login_screen_ms': statistics.median(r['login_screen_ms'] for r in runs),
+    }
+    print(f"import:        {summary['median_import_ms']:.1f} ms (median of {len(runs)})")
+    print(f"login screen:  {summary['median_login_screen_ms']:.1f} ms (median of {len(runs)})")
+    print(f"pages built:   {runs[-1]['pages_built'] or 'none'}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,173 @@
+"""Build a database filled with reproducible synthetic POS data.
+
+    python -m benchmarks.synthetic bench.db --products 10000 --users 50 --roles 8 --years 1
+
+The schema comes from db.setup_database(); products, roles, users and
+sales are generated from a seeded RNG, so the same arguments always give
+the same data (sales are dated back from today). Sales go in through the normal tables, so the summary
+and rollup triggers fill the counters exactly as at the till.
+"""
+import argparse
+import random
+import sys
+import time
+from itertools import islice
+
+import bcrypt
+
+import db
+
+# Rows per executemany call
+BATCH_SIZE = 10000
+
+# Password of every generated user, hashed at the lowest bcrypt cost
+PASSWORD = 'bench'
+BCRYPT_ROUNDS = 4
+
+# Store opening hours the generated sales fall into
+OPEN_HOUR, CLOSE_HOUR = 8, 22
+
+WORDS = ('apple', 'banana', 'bread', 'butter', 'cheese', 'chocolate', 'coffee', 'cola', 'cookie',
+         'cream', 'egg', 'flour', 'grape', 'honey', 'juice', 'lemon', 'milk', 'noodle', 'oat',
+         'orange', 'pasta', 'pepper', 'rice', 'salt', 'soap', 'soda', 'sugar', 'tea', 'tomato',
+         'water', 'yogurt')
+SIZES = ('small', 'medium', 'large', '250g', '500g', '1kg', '1l', '2l', 'pack of 6')
+
+
+def batched(rows, size=BATCH_SIZE):
+    rows = iter(rows)
+    while batch := list(islice(rows, size)):
+        yield batch
+
+
+def product_rows(rng, count):
+    for i in range(1, count + 1):
+        name = f"{rng.choice(WORDS).title()} {rng.choice(WORDS)} {rng.choice(SIZES)}"
+        yield (f"SKU-{i:07d}", f"{2000000000000 + i:013d}", name,
+               round(rng.uniform(0.5, 50), 2))
+
+
+def generate_catalog(conn, rng, products):
+    for batch in batched(product_rows(rng, products)):
+        conn.executemany("INSERT INTO products (sku, barcode, name, price) VALUES (?, ?, ?, ?)",
+                         batch)
+    # Every product is stock-tracked; about 5% start at or below their reorder level
+    for batch in batched((product_id, rng.randint(0, 200), 10)
+                         for product_id in range(1, products + 1)):
+        conn.executemany('''
+            INSERT INTO inventory (product_id, on_hand, reorder_level) VALUES (?, ?, ?)
+        ''', batch)
+
+
+def generate_staff(conn, rng, users, roles):
+    keys = [key for key, in conn.execute("SELECT key FROM permissions ORDER BY key")]
+    existing = conn.execute("SELECT COUNT(*) FROM roles").fetchone()[0]
+    for i in range(existing + 1, roles + 1):
+        conn.execute("INSERT INTO roles (name, description) VALUES (?, ?)",
+                     (f"role{i:03d}", f"Synthetic role {i}"))
+        conn.executemany('''
+            INSERT INTO role_permissions (role_id, permission_id)
+            SELECT r.role_id, p.permission_id FROM roles r, permissions p
+            WHERE r.name = ? AND p.key = ?
+        ''', [(f"role{i:03d}", key) for key in rng.sample(keys, rng.randint(1, len(keys)))])
+
+    role_ids = [role_id for role_id, in conn.execute("SELECT role_id FROM roles")]
+    password_hash = bcrypt.hashpw(PASSWORD.encode('utf-8'), bcrypt.gensalt(BCRYPT_ROUNDS))
+    conn.executemany('''
+        INSERT INTO users (username, password_hash, role_id, is_active) VALUES (?, ?, ?, ?)
+    ''', [(f"user{i:05d}", password_hash, rng.choice(role_ids), int(rng.random() > 0.1))
+          for i in range(1, users + 1)])
+
+
+def sale_rows(rng, products, user_ids, years, sales_per_day, registers):
+    """Yield (sale row, line rows) for every day of the last `years` years"""
+    today = int(time.time()) // 86400 * 86400
+    days = int(years * 365)
+    sale_id = 0
+    for day in range(days, 0, -1):
+        start = today - day * 86400
+        for _ in range(rng.randint(sales_per_day // 2, sales_per_day * 3 // 2)):
+            sale_id += 1
+            created_at = start + rng.randint(OPEN_HOUR * 3600, CLOSE_HOUR * 3600)
+            lines = []
+            for line_no, product_id in enumerate(
+                    rng.sample(range(1, products + 1), min(products, rng.randint(1, 5))), start=1):
+                quantity = rng.randint(1, 3)
+                unit_price = round(rng.uniform(0.5, 50), 2)
+                lines.append((sale_id, line_no, product_id, quantity, unit_price,
+                              round(quantity * unit_price, 2)))
+            total = round(sum(line[-1] for line in lines), 2)
+            hour = (created_at % 86400) // 3600
+            shift = 1 if hour < 14 else 2
+            yield ((sale_id, f"bench-{sale_id:012d}", rng.choice(user_ids),
+                    rng.randint(1, registers), shift, total, 0, total, created_at), lines)
+
+
+def generate_sales(conn, rng, products, years, sales_per_day, registers=2):
+    user_ids = [user_id for user_id, in conn.execute("SELECT user_id FROM users")]
+    offset = conn.execute("SELECT COALESCE(MAX(sale_id), 0) FROM sales").fetchone()[0]
+    count = 0
+    for batch in batched(sale_rows(rng, products, user_ids, years, sales_per_day, registers),
+                         BATCH_SIZE // 5):
+        conn.executemany('''
+            INSERT INTO sales (sale_id, sale_uuid, user_id, register_id, shift,
+                               subtotal, discount, total, created_at)
+            VALUES (? + ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', [(offset, *sale) for sale, _ in batch])
+        conn.executemany('''
+            INSERT INTO sale_lines (sale_id, line_no, product_id, quantity, unit_price, total)
+            VALUES (? + ?, ?, ?, ?, ?, ?)
+        ''', [(offset, *line) for _, lines in batch for line in lines])
+        count += len(batch)
+    return count
+
+
+def generate(conn, products=10000, users=50, roles=8, years=1.0, sales_per_day=300, seed=1):
+    """Fill a migrated database with synthetic data in one transaction; return the sale count"""
+    rng = random.Random(seed)
+    with conn:
+        generate_catalog(conn, rng, products)
+        generate_staff(conn, rng, users, roles)
+        sales = generate_sales(conn, rng, products, years, sales_per_day)
+    conn.execute("ANALYZE")
+    return sales
+
+
+def setup_database(db_path, **sizes):
+    """db.setup_database() plus synthetic data; see generate() for the sizes"""
+    db.setup_database(db_path)
+    conn = db.connect(db_path)
+    try:
+        return generate(conn, **sizes)
+    finally:
+        conn.close()
+
+
+def add_size_arguments(parser):
+    parser.add_argument('--products', type=int, default=10000)
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--roles', type=int, default=8, help="total roles, including the defaults")
+    parser.add_argument('--years', type=float, default=1.0, help="years of sales history")
+    parser.add_argument('--sales-per-day', type=int, default=300)
+    parser.add_argument('--seed', type=int, default=1)
+
+
+def sizes_from(args):
+    return {'products': args.products, 'users': args.users, 'roles': args.roles,
+            'years': args.years, 'sales_per_day': args.sales_per_day, 'seed': args.seed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('path', help="database file to create")
+    add_size_arguments(parser)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    sales = setup_database(args.path, **sizes_from(args))
+    print(f"{args.path}: {args.products} products, {args.users} users, {sales} sales "
+          f"in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,252 @@
+"""Stream supplier catalogs into and out of the products table.
+
+    python catalog_io.py import suppliers.csv [--batch-size 5000] [--db cashier.db]
+    python catalog_io.py export products.json
+
+Files are read and written one record at a time, so memory stays flat for
+any catalog size. CSV, JSON arrays and JSON Lines (.jsonl / .ndjson) are
+supported; each record has sku, name, price and an optional barcode.
+An import is one transaction of batched executemany upserts keyed on SKU.
+Rows that fail validation or clash with another product's barcode are
+reported and skipped.
+"""
+import argparse
+import csv
+import json
+import os
+import sqlite3
+import sys
+import time
+from collections import namedtuple
+from itertools import islice
+
+import db
+import migrations
+
+FIELDS = ('sku', 'barcode', 'name', 'price')
+
+# Rows per executemany call
+BATCH_SIZE = 5000
+
+# Unchanged rows are left alone so updated_at (and the till's catalog refresh) only sees real edits
+UPSERT = '''
+    INSERT INTO products (sku, barcode, name, price) VALUES (?, ?, ?, ?)
+    ON CONFLICT(sku) DO UPDATE SET
+        barcode = excluded.barcode, name = excluded.name, price = excluded.price
+    WHERE (products.barcode, products.name, products.price)
+        IS NOT (excluded.barcode, excluded.name, excluded.price)
+'''
+
+ImportResult = namedtuple('ImportResult', ['imported', 'rejected', 'errors', 'seconds'])
+
+
+def detect_format(path, fmt=None):
+    if fmt:
+        return fmt
+    ext = os.path.splitext(path)[1].lower()
+    return {'.csv': 'csv', '.json': 'json', '.jsonl': 'json', '.ndjson': 'json'}.get(ext, 'csv')
+
+
+def read_csv(f):
+    """Yield (line number, record) from a CSV file with a header row"""
+    reader = csv.DictReader(f)
+    for record in reader:
+        yield reader.line_num, record
+
+
+def read_json(f, chunk_size=65536):
+    """Yield (record number, record) from a JSON array or JSON Lines, one object at a time"""
+    decoder = json.JSONDecoder()
+    buffer, pos, number = '', 0, 0
+    while True:
+        # Skip the separators between objects: whitespace, commas and the array brackets
+        while pos < len(buffer) and buffer[pos] in ' \t\r\n,[]':
+            pos += 1
+        if pos == len(buffer):
+            buffer, pos = f.read(chunk_size), 0
+            if not buffer:
+                return
+            continue
+        try:
+            record, pos = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            # Object cut off at the chunk boundary: keep the tail and read on
+            chunk = f.read(chunk_size)
+            if not chunk:
+                raise
+            buffer, pos = buffer[pos:] + chunk, 0
+            continue
+        number += 1
+        yield number, record
+
+
+READERS = {'csv': read_csv, 'json': read_json}
+
+
+def validate(record):
+    """Return an UPSERT parameter tuple or raise ValueError"""
+    if not isinstance(record, dict):
+        raise ValueError("record is not an object")
+    sku = str(record.get('sku') or '').strip()
+    name = str(record.get('name') or '').strip()
+    barcode = str(record.get('barcode') or '').strip() or None
+    if not sku:
+        raise ValueError("sku is required")
+    if not name:
+        raise ValueError("name is required")
+    try:
+        price = round(float(record.get('price')), 2)
+    except (TypeError, ValueError):
+        raise ValueError(f"invalid price {record.get('price')!r}")
+    if price < 0:
+        raise ValueError(f"negative price {price}")
+    return sku, barcode, name, price
+
+
+def valid_rows(records, errors):
+    """Yield validated rows; (position, message) of rejects is appended to errors"""
+    for position, record in records:
+        try:
+            yield validate(record)
+        except ValueError as e:
+            errors.append((position, str(e)))
+
+
+def batched(rows, size):
+    rows = iter(rows)
+    while batch := list(islice(rows, size)):
+        yield batch
+
+
+def deferred_indexes(conn, table):
+    """Drop the explicit indexes on table and return their CREATE statements"""
+    indexes = conn.execute('''
+        SELECT name, sql FROM sqlite_master
+        WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL
+    ''', (table,)).fetchall()
+    for name, _ in indexes:
+        conn.execute(f"DROP INDEX {name}")
+    return [sql for _, sql in indexes]
+
+
+def upsert_batch(conn, batch, errors):
+    """Upsert a batch; on a constraint clash redo it row by row and reject the offenders"""
+    conn.execute("SAVEPOINT batch")
+    try:
+        conn.executemany(UPSERT, batch)
+        conn.execute("RELEASE batch")
+        return len(batch)
+    except sqlite3.IntegrityError:
+        conn.execute("ROLLBACK TO batch")
+        conn.execute("RELEASE batch")
+
+    imported = 0
+    for row in batch:
+        try:
+            conn.execute(UPSERT, row)
+            imported += 1
+        except sqlite3.IntegrityError as e:
+            errors.append((row[0], str(e)))
+    return imported
+
+
+def import_products(conn, path, fmt=None, batch_size=BATCH_SIZE, defer_indexes=True,
+                    progress=None):
+    """Upsert every valid record of a CSV / JSON file in a single transaction
+
+    progress, if given, is called as progress(rows, seconds) after each batch.
+    """
+    errors = []
+    imported = 0
+    start = time.perf_counter()
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        rows = valid_rows(READERS[detect_format(path, fmt)](f), errors)
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            indexes = deferred_indexes(conn, 'products') if defer_indexes else []
+            for batch in batched(rows, batch_size):
+                imported += upsert_batch(conn, batch, errors)
+                if progress:
+                    progress(imported, time.perf_counter() - start)
+            for sql in indexes:
+                conn.execute(sql)
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+    return ImportResult(imported, len(errors), errors, time.perf_counter() - start)
+
+
+def export_products(conn, path, fmt=None, progress=None, batch_size=BATCH_SIZE):
+    """Write every product to a CSV / JSON file and return the row count"""
+    fmt = detect_format(path, fmt)
+    json_lines = path.lower().endswith(('.jsonl', '.ndjson'))
+    cursor = conn.execute("SELECT sku, barcode, name, price FROM products ORDER BY product_id")
+    count = 0
+    start = time.perf_counter()
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        if fmt == 'csv':
+            writer = csv.writer(f)
+            writer.writerow(FIELDS)
+        elif not json_lines:
+            f.write('[')
+        while rows := cursor.fetchmany(batch_size):
+            if fmt == 'csv':
+                writer.writerows(rows)
+            else:
+                for i, row in enumerate(rows, count):
+                    record = json.dumps(dict(zip(FIELDS, row)))
+                    if json_lines:
+                        f.write(record + '\n')
+                    else:
+                        f.write(('\n' if i == 0 else ',\n') + record)
+            count += len(rows)
+            if progress:
+                progress(count, time.perf_counter() - start)
+        if fmt == 'json' and not json_lines:
+            f.write('\n]\n')
+    return count
+
+
+def print_progress(rows, seconds):
+    rate = rows / seconds if seconds else 0
+    print(f"\r{rows} rows ({rate:,.0f} rows/s)", end='', file=sys.stderr, flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('command', choices=['import', 'export'])
+    parser.add_argument('path')
+    parser.add_argument('--format', choices=sorted(READERS), help="default: from the file extension")
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--keep-indexes', action='store_true',
+                        help="maintain secondary indexes row by row instead of rebuilding them")
+    parser.add_argument('--db', help="database file (default: DB_PATH)")
+    args = parser.parse_args()
+
+    conn = db.connect(args.db)
+    migrations.migrate(conn)
+    try:
+        if args.command == 'import':
+            result = import_products(conn, args.path, args.format, args.batch_size,
+                                     not args.keep_indexes, print_progress)
+            print(file=sys.stderr)
+            for position, message in result.errors[:20]:
+                print(f"  rejected {position}: {message}", file=sys.stderr)
+            rate = result.imported / result.seconds if result.seconds else 0
+            print(f"imported {result.imported} rows, rejected {result.rejected} "
+                  f"in {result.seconds:.1f}s ({rate:,.0f} rows/s)")
+            return 1 if result.rejected else 0
+
+        start = time.perf_counter()
+        count = export_products(conn, args.path, args.format, print_progress, args.batch_size)
+        seconds = time.perf_counter() - start
+        print(file=sys.stderr)
+        print(f"exported {count} rows in {seconds:.1f}s ({count / seconds if seconds else 0:,.0f} rows/s)")
+        return 0
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
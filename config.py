@@ -0,0 +1,8 @@
+"""Application configuration, loaded once from the environment and .env
+
+Entry points import it first (main.py, db, the command-line scripts), so
+.env is loaded before any other module reads its settings with os.getenv.
+"""
+from dotenv import load_dotenv
+
+load_dotenv()
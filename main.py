@@ -1,22 +1,39 @@
-from msilib.schema import Icon
-import sqlite3
-from PyQt5.QtWidgets import QApplication, QMainWindow, QVBoxLayout, QWidget, QPushButton, QComboBox, QSpinBox, QLabel, QHBoxLayout, QGridLayout, QStackedWidget, QFrame, QLineEdit, QMessageBox
-from PyQt5.QtWidgets import (QApplication, QMainWindow, QVBoxLayout, QWidget, 
-    QPushButton, QComboBox, QSpinBox, QLabel, QHBoxLayout, QGridLayout, 
-    QStackedWidget, QFrame)
-from PyQt5.QtCore import Qt, pyqtSignal
-import bcrypt
+import importlib
+import os
+from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QPushButton,
+    QHBoxLayout, QStackedWidget, QMessageBox, QShortcut)
+from PyQt5.QtGui import QKeySequence
+from PyQt5.QtCore import QTimer
 
+import config  # loads .env once for every module
+import db
+import migrations
 import widgets.sidebar as Sidebar
 import pages.login as Login
-import pages.home as Home
-import pages.cashier as Cashier
-import pages.settings as Settings
-import os
-from dotenv import load_dotenv
-load_dotenv()
+from services.journal import journal
+from services import changelog
+from services.instrumentation import recorder, timed
+from services.permissions import permissions
+from services.queries import executor
+from services.sync import replicator
+from services.watchdog import watchdog
+
+# route -> (module, class); page modules are imported and built on first use
+PAGE_FACTORIES = {
+    'home': ('pages.home', 'MainPage'),
+    'cashier': ('pages.cashier', 'CashierPage'),
+    'inventory': ('pages.inventory', 'InventoryPage'),
+    'reports': ('pages.reports', 'ReportsPage'),
+    'settings': ('pages.settings', 'SettingsPage'),
+}
 
-DB_PATH = os.getenv("DB_PATH")
+# Pages without a sidebar button, opened by shortcut
+HIDDEN_PAGES = {
+    'diagnostics': ('pages.diagnostics', 'DiagnosticsPage'),
+}
+
+# Milliseconds between checks of the change log for permission edits made elsewhere
+PERMISSION_POLL_MS = 5000
 
 
 class MainWindow(QMainWindow):
@@ -47,21 +64,12 @@ class MainWindow(QMainWindow):
         self.stacked_widget = QStackedWidget()
         self.main_layout.addWidget(self.stacked_widget)
 
-        # Create pages dictionary to store pages and their indices
-        self.pages = {
-            'home': Home.MainPage(),
-            'cashier': Cashier.CashierPage(),
-            'settings': Settings.SettingsPage()
-        }
-
-        # Add pages to stacked widget and store their indices
-        for page in self.pages.values():
-            self.stacked_widget.addWidget(page)
+        # Pages are constructed on first navigation, see get_page()
+        self.pages = {}
 
         # Connect sidebar buttons with named routes
-        self.sidebar.buttons['home'].clicked.connect(lambda: self.navigate_to('home'))
-        self.sidebar.buttons['cashier'].clicked.connect(lambda: self.navigate_to('cashier'))
-        self.sidebar.buttons['settings'].clicked.connect(lambda: self.navigate_to('settings'))
+        for route in PAGE_FACTORIES:
+            self.sidebar.buttons[route].clicked.connect(lambda checked, r=route: self.navigate_to(r))
         
         # Add logout button to sidebar
         self.logout_btn = QPushButton("Logout")
@@ -80,55 +88,113 @@ class MainWindow(QMainWindow):
         """)
         self.sidebar.layout.addWidget(self.logout_btn)
         
-        # Connect login/logout signals
-        self.login_page.login_btn.clicked.connect(self.handle_login)
+        # Connect logout signal
         self.logout_btn.clicked.connect(self.handle_logout)
         
+        # Timings overlay for support staff
+        QShortcut(QKeySequence("Ctrl+Shift+D"), self, lambda: self.show_hidden_page('diagnostics'))
+
+        # Picks up permission edits from other processes while a user is logged in
+        self.permission_timer = QTimer(self)
+        self.permission_timer.setInterval(PERMISSION_POLL_MS)
+        self.permission_timer.timeout.connect(self.poll_permissions)
+
         # Start with login page
         self.central_stack.setCurrentIndex(0)
     
-    def on_login_success(self):
+    def on_login_success(self, username, role):
         """Handle successful login"""
+        self.current_user = username
+        permissions.load(username)
+        self.permission_timer.start()
         self.central_stack.setCurrentIndex(1)
+        self.navigate_to('home')
+
+        # Build the remaining pages while the till is idle
+        QTimer.singleShot(0, self.prewarm_pages)
     
-    def handle_login(self):
-        if self.login_page.check_credentials():
-            self.central_stack.setCurrentIndex(1)
+    def prewarm_pages(self):
+        """Construct one not-yet-built page per event loop pass"""
+        for route in PAGE_FACTORIES:
+            if route not in self.pages and permissions.can_access(route):
+                self.get_page(route)
+                QTimer.singleShot(0, self.prewarm_pages)
+                return
+
+    def get_page(self, route_name):
+        """Return the page for a route, importing and building it on first use"""
+        page = self.pages.get(route_name)
+        factory = PAGE_FACTORIES.get(route_name) or HIDDEN_PAGES.get(route_name)
+        if page is None and factory:
+            module_name, class_name = factory
+            page = getattr(importlib.import_module(module_name), class_name)()
+            self.pages[route_name] = page
+            self.stacked_widget.addWidget(page)
+        return page
+
+    def show_hidden_page(self, route_name):
+        # Ignored on the login screen and for users who may not open it
+        if self.central_stack.currentIndex() == 1 and permissions.can_access(route_name):
+            self.navigate_to(route_name)
 
     def handle_logout(self):
         reply = QMessageBox.question(self, 'Logout', 'Are you sure you want to logout?',
                                    QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
         if reply == QMessageBox.Yes:
+            self.permission_timer.stop()
+            executor.cancel(self)
+            permissions.clear()
             self.central_stack.setCurrentIndex(0)
 
+    @timed
     def navigate_to(self, route_name):
         """Navigate to a specific page by route name"""
-        if route_name == 'settings' and not self.check_permission('settings_manage'):
+        if not permissions.can_access(route_name):
             QMessageBox.warning(self, "Access Denied", "You don't have permission to access this page")
             return
         
-        page = self.pages.get(route_name)
+        page = self.get_page(route_name)
         if page:
             self.stacked_widget.setCurrentWidget(page)
 
+    def poll_permissions(self):
+        if executor.pending(self):
+            return
+        executor.submit(permissions.fetch_update, permissions.username, permissions.seq,
+                        permissions.user_id, permissions.role_id,
+                        on_done=lambda update, username=permissions.username:
+                            self.on_permissions_polled(username, update),
+                        owner=self)
+
+    def on_permissions_polled(self, username, update):
+        if not permissions.apply_update(username, update):
+            return
+        # Leave a page the user may no longer open
+        for route, page in self.pages.items():
+            if page is self.stacked_widget.currentWidget() and not permissions.can_access(route):
+                self.navigate_to('home')
+                break
+
     def check_permission(self, permission_name):
         """Check if current user has specific permission"""
-        # conn = sqlite3.connect(DB_PATH)
-        # cursor = conn.cursor()
-        # cursor.execute('''
-        #     SELECT COUNT(*) FROM users u
-        #     JOIN role_permissions rp ON u.role_id = rp.role_id
-        #     JOIN permissions p ON rp.permission_id = p.permission_id
-        #     WHERE u.username = ? AND p.key = ?
-        # ''', (self.current_user, permission_name))
-        # has_permission = cursor.fetchone()[0] > 0
-        # conn.close()
-        return True
+        return permissions.has(permission_name)
 
 
 if __name__ == '__main__':
     import sys
     app = QApplication(sys.argv)
+    app.aboutToQuit.connect(executor.shutdown)
+    app.aboutToQuit.connect(journal.stop)
+    app.aboutToQuit.connect(replicator.stop)
+    app.aboutToQuit.connect(db.close_all)
+    if os.getenv("INSTRUMENT_DUMP"):
+        app.aboutToQuit.connect(lambda: recorder.dump(os.getenv("INSTRUMENT_DUMP")))
+    migrations.migrate(db.get_connection())
+    changelog.prune()
+    journal.start()  # replays sales a crash left in the journal
+    replicator.start()  # ships sales to the store server when STORE_URL is set
+    watchdog.start()  # logs the GUI thread's stack when the event loop stalls
+    app.aboutToQuit.connect(watchdog.stop)
     window = MainWindow()
     window.show()
     sys.exit(app.exec_())
\ No newline at end of file
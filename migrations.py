@@ -0,0 +1,685 @@
+"""Numbered, non-destructive schema migrations tracked in PRAGMA user_version.
+
+Each migration runs inside its own transaction together with the
+user_version bump, so a failed or interrupted upgrade leaves the database
+at the previous version. Large table rewrites copy rows in keyset-ordered
+batches so memory stays flat and progress can be reported.
+"""
+from collections import namedtuple
+from datetime import datetime
+import logging
+
+import bcrypt
+
+logger = logging.getLogger('cashier.migrations')
+
+Migration = namedtuple('Migration', ['version', 'description', 'apply'])
+
+MIGRATIONS = []
+
+# Rows copied per batch during table rewrites
+BATCH_SIZE = 5000
+
+
+def migration(version, description):
+    def register(func):
+        MIGRATIONS.append(Migration(version, description, func))
+        return func
+    return register
+
+
+def latest_version():
+    return max(m.version for m in MIGRATIONS)
+
+
+def migrate(conn, progress=None):
+    """Apply every pending migration and return the resulting schema version
+
+    progress, if given, is called as progress(label, done, total) during
+    batched rewrites. When the database is already current this costs a
+    single PRAGMA read.
+    """
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version >= latest_version():
+        return version
+
+    for m in sorted(MIGRATIONS):
+        if m.version <= version:
+            continue
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Another process may have upgraded while we waited for the lock
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if m.version > version:
+                m.apply(conn, progress or (lambda label, done, total: None))
+                conn.execute(f"PRAGMA user_version = {m.version}")
+                version = m.version
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+    return version
+
+
+def iter_batches(conn, table, columns, key, batch_size=BATCH_SIZE):
+    """Yield rows of table in key order, batch_size rows at a time"""
+    select = f"SELECT {', '.join(columns)} FROM {table}"
+    key_index = columns.index(key)
+    rows = conn.execute(f"{select} ORDER BY {key} LIMIT ?", (batch_size,)).fetchall()
+    while rows:
+        yield rows
+        rows = conn.execute(f"{select} WHERE {key} > ? ORDER BY {key} LIMIT ?",
+                            (rows[-1][key_index], batch_size)).fetchall()
+
+
+def table_columns(conn, table):
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+
+def table_exists(conn, table):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                        (table,)).fetchone() is not None
+
+
+def rewrite_table(conn, table, create_sql, progress):
+    """Rebuild a rowid table from create_sql (which must create <table>_new), keeping shared columns"""
+    conn.execute(create_sql)
+    columns = [c for c in table_columns(conn, table) if c in table_columns(conn, f"{table}_new")]
+    insert = (f"INSERT INTO {table}_new ({', '.join(columns)}) "
+              f"VALUES ({', '.join('?' * len(columns))})")
+
+    total = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    done = 0
+    for rows in iter_batches(conn, table, ['rowid'] + columns, 'rowid'):
+        conn.executemany(insert, [row[1:] for row in rows])
+        done += len(rows)
+        progress(table, done, total)
+
+    conn.execute(f"DROP TABLE {table}")
+    conn.execute(f"ALTER TABLE {table}_new RENAME TO {table}")
+
+
+@migration(1, "Baseline schema and default data")
+def create_baseline(conn, progress):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS products (
+            product_id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            price REAL NOT NULL
+        )
+    ''')
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS transactions (
+            transaction_id INTEGER PRIMARY KEY,
+            product_id INTEGER NOT NULL,
+            quantity INTEGER NOT NULL,
+            total REAL NOT NULL,
+            timestamp TEXT DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (product_id) REFERENCES products(product_id)
+        )
+    ''')
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS roles (
+            role_id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL UNIQUE CHECK(length(name) <= 20),
+            description TEXT CHECK(length(description) <= 60)
+        )
+    ''')
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS permissions (
+            permission_id INTEGER PRIMARY KEY,
+            key TEXT NOT NULL UNIQUE
+        )
+    ''')
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS role_permissions (
+            role_id INTEGER,
+            permission_id INTEGER,
+            FOREIGN KEY (role_id) REFERENCES roles(role_id),
+            FOREIGN KEY (permission_id) REFERENCES permissions(permission_id),
+            PRIMARY KEY (role_id, permission_id)
+        )
+    ''')
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            user_id INTEGER PRIMARY KEY,
+            username TEXT NOT NULL UNIQUE,
+            password_hash TEXT NOT NULL,
+            role_id INTEGER,
+            is_active BOOLEAN DEFAULT 1,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (role_id) REFERENCES roles(role_id)
+        )
+    ''')
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS modules (
+            module_id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL UNIQUE,
+            is_active BOOLEAN DEFAULT 1,
+            required_permission_id INTEGER,
+            FOREIGN KEY (required_permission_id) REFERENCES permissions(permission_id)
+        )
+    ''')
+
+    # Seed default data only into a brand new database
+    if conn.execute("SELECT COUNT(*) FROM roles").fetchone()[0]:
+        return
+
+    conn.execute('''
+        INSERT INTO roles (name, description) VALUES
+        ('admin', 'Full system access'),
+        ('manager', 'Store management access'),
+        ('cashier', 'Basic cashier access')
+    ''')
+
+    conn.execute('''
+        INSERT INTO permissions (key) VALUES
+        ('users_read'),
+        ('users_write'),
+        ('users_update'),
+        ('users_delete'),
+        ('inventory_read'),
+        ('inventory_write'),
+        ('inventory_update'),
+        ('inventory_delete'),
+        ('sales_read'),
+        ('sales_write'),
+        ('sales_update'),
+        ('sales_delete'),
+        ('reports_read'),
+        ('settings_read'),
+        ('settings_write'),
+        ('settings_update'),
+        ('settings_delete')
+    ''')
+
+    conn.execute('''
+        INSERT INTO modules (name, is_active) VALUES
+        ('home', 1),
+        ('cashier', 1),
+        ('inventory', 1),
+        ('reports', 1),
+        ('settings', 1)
+    ''')
+
+    # Add default admin user with bcrypt hashed password
+    default_password = 'admin123'  # You should change this in production
+    password_hash = bcrypt.hashpw(default_password.encode('utf-8'), bcrypt.gensalt())
+
+    conn.execute('''
+        INSERT INTO users (username, password_hash, role_id, is_active)
+        VALUES (?, ?, (SELECT role_id FROM roles WHERE name = 'admin'), 1)
+    ''', ('admin', password_hash))
+
+    # Define permission assignments for each role
+    role_permissions = {
+        'admin': [
+            'users_read', 'users_write', 'users_update', 'users_delete',
+            'inventory_read', 'inventory_write', 'inventory_update', 'inventory_delete',
+            'sales_read', 'sales_write', 'sales_update', 'sales_delete',
+            'reports_read',
+            'settings_read', 'settings_write', 'settings_update', 'settings_delete'
+        ],
+        'manager': [
+            'inventory_read', 'inventory_write', 'inventory_update',
+            'sales_read', 'sales_write', 'sales_update',
+            'reports_read'
+        ],
+        'cashier': [
+            'sales_read', 'sales_write'
+        ],
+    }
+
+    conn.executemany('''
+        INSERT INTO role_permissions (role_id, permission_id)
+        SELECT r.role_id, p.permission_id
+        FROM roles r, permissions p
+        WHERE r.name = ? AND p.key = ?
+    ''', [(role, key) for role, keys in role_permissions.items() for key in keys])
+
+
+@migration(2, "Product SKU/barcode codes and change tracking")
+def add_product_codes(conn, progress):
+    rewrite_table(conn, 'products', '''
+        CREATE TABLE products_new (
+            product_id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            price REAL NOT NULL,
+            sku TEXT UNIQUE,
+            barcode TEXT UNIQUE,
+            updated_at INTEGER NOT NULL DEFAULT (strftime('%s', 'now'))
+        )
+    ''', progress)
+    conn.execute("CREATE INDEX idx_products_updated_at ON products(updated_at)")
+
+    # Keep updated_at current so the catalog cache can refresh incrementally
+    conn.execute('''
+        CREATE TRIGGER products_touch
+        AFTER UPDATE OF name, price, sku, barcode ON products
+        BEGIN
+            UPDATE products SET updated_at = strftime('%s', 'now')
+            WHERE product_id = NEW.product_id;
+        END
+    ''')
+
+
+@migration(3, "Sales header/line model with summary counters")
+def create_sales(conn, progress):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS sales (
+            sale_id INTEGER PRIMARY KEY,
+            user_id INTEGER,
+            register_id INTEGER NOT NULL DEFAULT 1,
+            shift INTEGER NOT NULL DEFAULT 1,
+            subtotal REAL NOT NULL,
+            discount REAL NOT NULL DEFAULT 0,
+            total REAL NOT NULL,
+            created_at INTEGER NOT NULL DEFAULT (strftime('%s', 'now')),
+            FOREIGN KEY (user_id) REFERENCES users(user_id)
+        )
+    ''')
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS sale_lines (
+            sale_id INTEGER NOT NULL,
+            line_no INTEGER NOT NULL,
+            product_id INTEGER NOT NULL,
+            quantity INTEGER NOT NULL,
+            unit_price REAL NOT NULL,
+            discount REAL NOT NULL DEFAULT 0,
+            total REAL NOT NULL,
+            PRIMARY KEY (sale_id, line_no),
+            FOREIGN KEY (sale_id) REFERENCES sales(sale_id),
+            FOREIGN KEY (product_id) REFERENCES products(product_id)
+        ) WITHOUT ROWID
+    ''')
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS sales_summary (
+            day TEXT NOT NULL,
+            shift INTEGER NOT NULL,
+            register_id INTEGER NOT NULL,
+            sale_count INTEGER NOT NULL DEFAULT 0,
+            subtotal REAL NOT NULL DEFAULT 0,
+            discount REAL NOT NULL DEFAULT 0,
+            total REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, register_id, shift)
+        ) WITHOUT ROWID
+    ''')
+
+    # Move legacy one-product-per-row transactions into sales and sale_lines
+    if table_exists(conn, 'transactions'):
+        from services.sales_summary import current_shift
+
+        def shift_at(ts):
+            return current_shift(datetime.fromtimestamp(ts) if ts else datetime(1970, 1, 1))
+
+        offset = conn.execute("SELECT COALESCE(MAX(sale_id), 0) FROM sales").fetchone()[0]
+        total = conn.execute("SELECT COUNT(*) FROM transactions").fetchone()[0]
+        # A NULL or unparseable timestamp must not block startup; keep the sale, dated 1970-01-01
+        undated = conn.execute(
+            "SELECT COUNT(*) FROM transactions WHERE strftime('%s', timestamp) IS NULL"
+        ).fetchone()[0]
+        if undated:
+            logger.warning("%d legacy transactions have no readable timestamp; "
+                           "migrated as sales dated 1970-01-01", undated)
+        done = 0
+        columns = ['transaction_id', 'product_id', 'quantity', 'total',
+                   "COALESCE(CAST(strftime('%s', timestamp) AS INTEGER), 0)"]
+        for rows in iter_batches(conn, 'transactions', columns, 'transaction_id'):
+            conn.executemany('''
+                INSERT INTO sales (sale_id, shift, subtotal, discount, total, created_at)
+                VALUES (?, ?, ?, 0, ?, ?)
+            ''', [(offset + tid, shift_at(ts), amount, amount, ts)
+                  for tid, _, _, amount, ts in rows])
+            conn.executemany('''
+                INSERT INTO sale_lines (sale_id, line_no, product_id, quantity, unit_price, total)
+                VALUES (?, 1, ?, ?, ?, ?)
+            ''', [(offset + tid, product_id, quantity, amount / quantity if quantity else amount, amount)
+                  for tid, product_id, quantity, amount, _ in rows])
+            done += len(rows)
+            progress('transactions', done, total)
+        conn.execute("DROP TABLE transactions")
+
+    # Backfill the counters once, then let the triggers maintain them
+    conn.execute("DELETE FROM sales_summary")
+    conn.execute('''
+        INSERT INTO sales_summary (day, shift, register_id, sale_count, subtotal, discount, total)
+        SELECT date(created_at, 'unixepoch', 'localtime') AS day, shift, register_id,
+               COUNT(*), SUM(subtotal), SUM(discount), SUM(total)
+        FROM sales
+        GROUP BY day, register_id, shift
+    ''')
+
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS sales_summary_insert AFTER INSERT ON sales
+        BEGIN
+            INSERT INTO sales_summary (day, shift, register_id, sale_count, subtotal, discount, total)
+            VALUES (date(NEW.created_at, 'unixepoch', 'localtime'), NEW.shift, NEW.register_id,
+                    1, NEW.subtotal, NEW.discount, NEW.total)
+            ON CONFLICT (day, register_id, shift) DO UPDATE SET
+                sale_count = sale_count + 1,
+                subtotal = subtotal + excluded.subtotal,
+                discount = discount + excluded.discount,
+                total = total + excluded.total;
+        END
+    ''')
+
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS sales_summary_delete AFTER DELETE ON sales
+        BEGIN
+            UPDATE sales_summary SET
+                sale_count = sale_count - 1,
+                subtotal = subtotal - OLD.subtotal,
+                discount = discount - OLD.discount,
+                total = total - OLD.total
+            WHERE day = date(OLD.created_at, 'unixepoch', 'localtime')
+              AND register_id = OLD.register_id AND shift = OLD.shift;
+        END
+    ''')
+
+    # Covering indexes for date-range, per-cashier and per-product report lookups
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_sales_created_at ON sales(created_at, user_id, total)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_sales_user_created_at ON sales(user_id, created_at, total)")
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_sale_lines_product
+        ON sale_lines(product_id, sale_id, quantity, total)
+    ''')
+
+
+@migration(4, "Keyed role_permissions and lookup indexes")
+def index_roles(conn, progress):
+    rewrite_table(conn, 'role_permissions', '''
+        CREATE TABLE role_permissions_new (
+            role_id INTEGER,
+            permission_id INTEGER,
+            FOREIGN KEY (role_id) REFERENCES roles(role_id),
+            FOREIGN KEY (permission_id) REFERENCES permissions(permission_id),
+            PRIMARY KEY (role_id, permission_id)
+        ) WITHOUT ROWID
+    ''', progress)
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_role_permissions_permission
+        ON role_permissions(permission_id, role_id)
+    ''')
+    # Also serves the user listing sorted by role, with username as the tiebreaker
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_users_role_username ON users(role_id, username)")
+
+
+@migration(5, "User PIN and badge for quick switching")
+def add_quick_switch(conn, progress):
+    conn.execute("ALTER TABLE users ADD COLUMN pin_hash TEXT")
+    conn.execute("ALTER TABLE users ADD COLUMN badge_code TEXT")
+    conn.execute("CREATE UNIQUE INDEX idx_users_badge_code ON users(badge_code)")
+
+
+@migration(6, "Indexes for sorted, keyset-paged user listing")
+def index_user_listing(conn, progress):
+    # One index per sortable column, each ending in the unique username tiebreaker;
+    # idx_users_role_username comes from migration 4
+    conn.execute("CREATE INDEX idx_users_active_username ON users(is_active, username)")
+    conn.execute("CREATE INDEX idx_users_created_at_username ON users(created_at, username)")
+
+
+@migration(7, "Client-generated sale UUIDs for idempotent journal replay")
+def add_sale_uuid(conn, progress):
+    conn.execute("ALTER TABLE sales ADD COLUMN sale_uuid TEXT")
+    conn.execute("CREATE UNIQUE INDEX idx_sales_sale_uuid ON sales(sale_uuid)")
+
+
+@migration(8, "Report rollups by hour, cashier and product")
+def create_rollups(conn, progress):
+    conn.execute('''
+        CREATE TABLE sales_hourly (
+            day TEXT NOT NULL,
+            hour INTEGER NOT NULL,
+            sale_count INTEGER NOT NULL DEFAULT 0,
+            total REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, hour)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+        CREATE TABLE cashier_daily (
+            day TEXT NOT NULL,
+            user_id INTEGER NOT NULL,   -- 0 for sales without a cashier
+            sale_count INTEGER NOT NULL DEFAULT 0,
+            total REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, user_id)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+        CREATE TABLE product_daily (
+            day TEXT NOT NULL,
+            product_id INTEGER NOT NULL,
+            quantity INTEGER NOT NULL DEFAULT 0,
+            total REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, product_id)
+        ) WITHOUT ROWID
+    ''')
+
+    # Backfill once, then let the triggers maintain them
+    conn.execute('''
+        INSERT INTO sales_hourly (day, hour, sale_count, total)
+        SELECT date(created_at, 'unixepoch', 'localtime') AS day,
+               CAST(strftime('%H', created_at, 'unixepoch', 'localtime') AS INTEGER) AS hour,
+               COUNT(*), SUM(total)
+        FROM sales
+        GROUP BY day, hour
+    ''')
+    conn.execute('''
+        INSERT INTO cashier_daily (day, user_id, sale_count, total)
+        SELECT date(created_at, 'unixepoch', 'localtime') AS day, COALESCE(user_id, 0) AS cashier,
+               COUNT(*), SUM(total)
+        FROM sales
+        GROUP BY day, cashier
+    ''')
+    conn.execute('''
+        INSERT INTO product_daily (day, product_id, quantity, total)
+        SELECT date(s.created_at, 'unixepoch', 'localtime') AS day, l.product_id,
+               SUM(l.quantity), SUM(l.total)
+        FROM sale_lines l
+        JOIN sales s ON s.sale_id = l.sale_id
+        GROUP BY day, l.product_id
+    ''')
+
+    conn.execute('''
+        CREATE TRIGGER sales_rollups_insert AFTER INSERT ON sales
+        BEGIN
+            INSERT INTO sales_hourly (day, hour, sale_count, total)
+            VALUES (date(NEW.created_at, 'unixepoch', 'localtime'),
+                    CAST(strftime('%H', NEW.created_at, 'unixepoch', 'localtime') AS INTEGER),
+                    1, NEW.total)
+            ON CONFLICT (day, hour) DO UPDATE SET
+                sale_count = sale_count + 1,
+                total = total + excluded.total;
+            INSERT INTO cashier_daily (day, user_id, sale_count, total)
+            VALUES (date(NEW.created_at, 'unixepoch', 'localtime'), COALESCE(NEW.user_id, 0),
+                    1, NEW.total)
+            ON CONFLICT (day, user_id) DO UPDATE SET
+                sale_count = sale_count + 1,
+                total = total + excluded.total;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER sales_rollups_delete AFTER DELETE ON sales
+        BEGIN
+            UPDATE sales_hourly SET
+                sale_count = sale_count - 1,
+                total = total - OLD.total
+            WHERE day = date(OLD.created_at, 'unixepoch', 'localtime')
+              AND hour = CAST(strftime('%H', OLD.created_at, 'unixepoch', 'localtime') AS INTEGER);
+            UPDATE cashier_daily SET
+                sale_count = sale_count - 1,
+                total = total - OLD.total
+            WHERE day = date(OLD.created_at, 'unixepoch', 'localtime')
+              AND user_id = COALESCE(OLD.user_id, 0);
+        END
+    ''')
+    # Lines are inserted after (and deleted before) their sale header, which supplies the day
+    conn.execute('''
+        CREATE TRIGGER sale_lines_rollup_insert AFTER INSERT ON sale_lines
+        BEGIN
+            INSERT INTO product_daily (day, product_id, quantity, total)
+            SELECT date(created_at, 'unixepoch', 'localtime'), NEW.product_id, NEW.quantity, NEW.total
+            FROM sales WHERE sale_id = NEW.sale_id
+            ON CONFLICT (day, product_id) DO UPDATE SET
+                quantity = quantity + excluded.quantity,
+                total = total + excluded.total;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER sale_lines_rollup_delete AFTER DELETE ON sale_lines
+        BEGIN
+            UPDATE product_daily SET
+                quantity = quantity - OLD.quantity,
+                total = total - OLD.total
+            WHERE day = (SELECT date(created_at, 'unixepoch', 'localtime')
+                         FROM sales WHERE sale_id = OLD.sale_id)
+              AND product_id = OLD.product_id;
+        END
+    ''')
+
+
+@migration(9, "Inventory stock levels with a low-stock index")
+def create_inventory(conn, progress):
+    # Products without a row are not stock-tracked; a stock take adds them
+    conn.execute('''
+        CREATE TABLE inventory (
+            product_id INTEGER PRIMARY KEY,
+            on_hand INTEGER NOT NULL DEFAULT 0,
+            reorder_level INTEGER NOT NULL DEFAULT 0,
+            updated_at INTEGER NOT NULL DEFAULT (strftime('%s', 'now')),
+            FOREIGN KEY (product_id) REFERENCES products(product_id)
+        )
+    ''')
+    conn.execute("CREATE INDEX idx_inventory_updated_at ON inventory(updated_at)")
+    # Holds only the items at or below their reorder level, so the alert query reads just those
+    conn.execute('''
+        CREATE INDEX idx_inventory_low_stock ON inventory(product_id)
+        WHERE on_hand <= reorder_level
+    ''')
+    # Keyset-paged product listing on the inventory page
+    conn.execute("CREATE INDEX idx_products_name ON products(name)")
+
+
+@migration(10, "Full-text product search index")
+def create_product_search(conn, progress):
+    # External content: the index stores only tokens and reads the text back from products.
+    # '-' stays inside tokens so SKUs like AB-1234 match as typed; prefix indexes
+    # make the short typeahead prefixes index lookups
+    conn.execute('''
+        CREATE VIRTUAL TABLE products_fts USING fts5(
+            name, sku, barcode,
+            content='products', content_rowid='product_id',
+            prefix='2 3', tokenize="unicode61 tokenchars '-'"
+        )
+    ''')
+    # Name matches rank above SKU / barcode matches
+    conn.execute("INSERT INTO products_fts (products_fts, rank) VALUES ('rank', 'bm25(10.0, 1.0, 1.0)')")
+    conn.execute("INSERT INTO products_fts (products_fts) VALUES ('rebuild')")
+
+    conn.execute('''
+        CREATE TRIGGER products_fts_insert AFTER INSERT ON products
+        BEGIN
+            INSERT INTO products_fts (rowid, name, sku, barcode)
+            VALUES (NEW.product_id, NEW.name, NEW.sku, NEW.barcode);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER products_fts_delete AFTER DELETE ON products
+        BEGIN
+            INSERT INTO products_fts (products_fts, rowid, name, sku, barcode)
+            VALUES ('delete', OLD.product_id, OLD.name, OLD.sku, OLD.barcode);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER products_fts_update AFTER UPDATE OF name, sku, barcode ON products
+        BEGIN
+            INSERT INTO products_fts (products_fts, rowid, name, sku, barcode)
+            VALUES ('delete', OLD.product_id, OLD.name, OLD.sku, OLD.barcode);
+            INSERT INTO products_fts (rowid, name, sku, barcode)
+            VALUES (NEW.product_id, NEW.name, NEW.sku, NEW.barcode);
+        END
+    ''')
+
+
+@migration(11, "Replication cursors for store sync")
+def create_sync_state(conn, progress):
+    # name -> position, e.g. the last sale_id the store acknowledged
+    conn.execute('''
+        CREATE TABLE sync_state (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        ) WITHOUT ROWID
+    ''')
+
+
+# table -> key column logged for it; role_permissions changes are logged against the role
+CHANGELOG_TABLES = {
+    'products': 'product_id',
+    'users': 'user_id',
+    'roles': 'role_id',
+    'permissions': 'permission_id',
+    'role_permissions': 'role_id',
+    'modules': 'module_id',
+}
+
+
+@migration(12, "Change log of catalog, user and role edits")
+def create_changelog(conn, progress):
+    # AUTOINCREMENT: sequence numbers are never reused, even after the oldest rows are pruned
+    conn.execute('''
+        CREATE TABLE changelog (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            table_name TEXT NOT NULL,
+            row_key INTEGER NOT NULL,
+            op TEXT NOT NULL CHECK (op IN ('I', 'U', 'D')),
+            changed_at INTEGER NOT NULL DEFAULT (strftime('%s', 'now'))
+        )
+    ''')
+    conn.execute("CREATE INDEX idx_changelog_table_seq ON changelog(table_name, seq)")
+
+    for table, key in CHANGELOG_TABLES.items():
+        # products_touch only moves updated_at, which is not worth a second entry
+        columns = ' OF name, price, sku, barcode' if table == 'products' else ''
+        for op, event, row in (('I', 'INSERT', 'NEW'), ('U', f'UPDATE{columns}', 'NEW'),
+                               ('D', 'DELETE', 'OLD')):
+            conn.execute(f'''
+                CREATE TRIGGER changelog_{table}_{event.split()[0].lower()}
+                AFTER {event} ON {table}
+                BEGIN
+                    INSERT INTO changelog (table_name, row_key, op)
+                    VALUES ('{table}', {row}.{key}, '{op}');
+                END
+            ''')
+
+    # Store sync now follows the change log; a till re-reads the store catalog once
+    conn.execute("DELETE FROM sync_state WHERE name IN ('catalog_since', 'catalog_after_id')")
+
+
+@migration(13, "Cashier username stored on each sale")
+def add_sale_username(conn, progress):
+    # The store keeps the till's username; its own users table need not know the cashier
+    conn.execute("ALTER TABLE sales ADD COLUMN username TEXT")
+
+
+if __name__ == '__main__':
+    import sys
+    import db
+
+    def print_progress(label, done, total):
+        print(f"\r{label}: {done}/{total} rows", end='\n' if done >= total else '', flush=True)
+
+    db_path = sys.argv[1] if len(sys.argv) > 1 else "cashier.db"
+    conn = db.connect(db_path)
+    before = conn.execute("PRAGMA user_version").fetchone()[0]
+    after = migrate(conn, print_progress)
+    conn.close()
+    print(f"{db_path}: schema version {before} -> {after}")
@@ -1,15 +1,21 @@
-from msilib.schema import Icon
-import sqlite3
 from PyQt5.QtWidgets import QApplication, QMainWindow, QVBoxLayout, QWidget, QPushButton, QComboBox, QSpinBox, QLabel
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QVBoxLayout, QWidget, 
     QPushButton, QComboBox, QSpinBox, QLabel, QHBoxLayout, QGridLayout, 
-    QStackedWidget, QFrame)
+    QStackedWidget, QFrame, QLineEdit, QMessageBox, QTableWidget, QTableWidgetItem,
+    QAbstractItemView, QCompleter)
+from PyQt5.QtGui import QStandardItem, QStandardItemModel
+from PyQt5.QtCore import Qt, QModelIndex
 
-import os
-from dotenv import load_dotenv
-load_dotenv()
-
-DB_PATH = os.getenv("DB_PATH")
+from services.catalog import catalog
+from services.cart import Cart, from_cents
+from services import sales_summary
+from services.instrumentation import timed
+from services.inventory import stock
+from services.journal import journal
+from services.permissions import permissions
+from services.queries import executor
+from services.search import product_search, MIN_PREFIX
+from services.sync import replicator
 
 class CashierPage(QMainWindow):
     def __init__(self):
@@ -22,10 +28,28 @@ class CashierPage(QMainWindow):
         self.setCentralWidget(self.central_widget)
         self.layout = QVBoxLayout(self.central_widget)
 
-        # Product combo box
-        self.product_combo = QComboBox()
-        self.load_products()
-        self.layout.addWidget(self.product_combo)
+        # Barcode / SKU scan input
+        self.scan_input = QLineEdit()
+        self.scan_input.setPlaceholderText("Scan barcode or enter SKU")
+        self.scan_input.returnPressed.connect(self.scan_product)
+        self.layout.addWidget(self.scan_input)
+
+        # Product typeahead; matches come ranked from the full-text index
+        self.product_input = QLineEdit()
+        self.product_input.setPlaceholderText("Search products by name, SKU or barcode")
+        self.selected_product_id = None
+        self.match_model = QStandardItemModel(self)
+        self.completer = QCompleter(self.match_model, self)
+        self.completer.setCompletionMode(QCompleter.UnfilteredPopupCompletion)
+        self.completer.activated[QModelIndex].connect(self.select_match)
+        self.product_input.setCompleter(self.completer)
+        self.product_input.textEdited.connect(self.search_products)
+        self.product_input.returnPressed.connect(self.add_to_cart)
+        self.layout.addWidget(self.product_input)
+
+        # Stock of the selected product, from the stock cache
+        self.stock_label = QLabel()
+        self.layout.addWidget(self.stock_label)
 
         # Quantity spin box
         self.quantity_spin = QSpinBox()
@@ -37,42 +61,248 @@ class CashierPage(QMainWindow):
         self.add_button.clicked.connect(self.add_to_cart)
         self.layout.addWidget(self.add_button)
 
+        # Cart lines
+        self.cart = Cart()
+        self.cart_rows = {}  # product_id -> table row
+        self.cart_table = QTableWidget(0, 4)
+        self.cart_table.setHorizontalHeaderLabels(["Product", "Qty", "Price", "Total"])
+        self.cart_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.cart_table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.layout.addWidget(self.cart_table)
+
+        # Cart actions
+        cart_buttons = QHBoxLayout()
+        self.remove_button = QPushButton("Remove Line")
+        self.remove_button.clicked.connect(self.remove_line)
+        self.checkout_button = QPushButton("Checkout")
+        self.checkout_button.clicked.connect(self.checkout)
+        cart_buttons.addWidget(self.remove_button)
+        cart_buttons.addWidget(self.checkout_button)
+        self.layout.addLayout(cart_buttons)
+
         # Total label
         self.total_label = QLabel("Total: $0.00")
         self.layout.addWidget(self.total_label)
 
-    def load_products(self):
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        cursor.execute("SELECT product_id, name FROM products")
-        products = cursor.fetchall()
-        conn.close()
+        # Register takings for today, read from the maintained counters
+        self.day_total_label = QLabel()
+        self.layout.addWidget(self.day_total_label)
+        journal.committed.connect(self.on_sales_committed)
+        journal.failed.connect(self.on_journal_failed)
+        replicator.catalog_updated.connect(self.on_catalog_synced)
+
+    def showEvent(self, event):
+        # Pick up products and stock levels changed since the page was last shown
+        self.refresh_products()
+        self.refresh_stock()
+        self.update_day_total()
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        # Navigated away: results still in flight are no longer wanted
+        executor.cancel(self)
+        executor.cancel(self.completer)
+        super().hideEvent(event)
+
+    def refresh_products(self):
+        if catalog.loaded:
+            executor.submit(catalog.fetch_changes, catalog.high_water,
+                            on_done=self.on_products_changed, on_error=self.on_load_error,
+                            owner=self)
+            return
+
+        self.product_input.setPlaceholderText("Loading products...")
+        self.product_input.setEnabled(False)
+        executor.submit(catalog.fetch_all, on_done=self.on_products_loaded,
+                        on_error=self.on_load_error, owner=self)
+
+    def refresh_stock(self):
+        if stock.loaded:
+            executor.submit(stock.fetch_changes, stock.high_water,
+                            on_done=self.on_stock_changed, on_error=self.on_load_error, owner=self)
+        else:
+            executor.submit(stock.fetch_all, on_done=self.on_stock_loaded,
+                            on_error=self.on_load_error, owner=self)
+
+    def on_stock_loaded(self, rows):
+        stock.apply_load(rows)
+        self.update_stock()
+
+    def on_stock_changed(self, rows):
+        if stock.apply_changes(rows):
+            self.update_stock()
+
+    def update_stock(self):
+        level = stock.get(self.selected_product_id)
+        if level is None:
+            self.stock_label.setText("")
+        elif level.on_hand <= level.reorder_level:
+            self.stock_label.setText(f"In stock: {level.on_hand} (low)")
+        else:
+            self.stock_label.setText(f"In stock: {level.on_hand}")
+
+    @timed
+    def on_products_loaded(self, snapshot):
+        catalog.apply_load(snapshot)
+        product_search.clear()
+        self.product_input.setPlaceholderText("Search products by name, SKU or barcode")
+        self.product_input.setEnabled(True)
+
+    def on_products_changed(self, changes):
+        if catalog.apply_changes(changes):
+            product_search.clear()  # cached matches may name changed products
+        elif not catalog.loaded:
+            self.refresh_products()  # the change log was pruned past the cache
+
+    def on_load_error(self, message):
+        QMessageBox.warning(self, "Database Error", f"Failed to load data: {message}")
+
+    @timed
+    def search_products(self, text):
+        self.select_product(None)
+        if len(text.strip()) < MIN_PREFIX:
+            self.match_model.clear()
+            return
+        product_ids = product_search.cached(text)
+        if product_ids is not None:
+            self.show_matches(product_ids)
+            return
+        # Only the latest keystroke's matches are wanted
+        executor.cancel(self.completer)
+        executor.submit(product_search.fetch, text,
+                        on_done=lambda product_ids: self.on_matches(text, product_ids),
+                        on_error=self.on_load_error, owner=self.completer)
+
+    def on_matches(self, text, product_ids):
+        product_search.store(text, product_ids)
+        if text == self.product_input.text():
+            self.show_matches(product_ids)
 
-        for product in products:
-            self.product_combo.addItem(product[1], product[0])
+    def show_matches(self, product_ids):
+        self.match_model.clear()
+        for product_id in product_ids:
+            product = catalog.get(product_id)
+            if product is None:
+                continue
+            code = product.sku or product.barcode
+            item = QStandardItem(f"{product.name} ({code})" if code else product.name)
+            item.setData(product.product_id, Qt.UserRole)
+            self.match_model.appendRow(item)
+        if self.match_model.rowCount():
+            self.completer.complete()
 
+    def select_match(self, index):
+        self.select_product(index.data(Qt.UserRole))
+
+    def select_product(self, product_id):
+        self.selected_product_id = product_id
+        self.update_stock()
+
+    @timed
+    def scan_product(self):
+        code = self.scan_input.text().strip()
+        if not code:
+            return
+        if not catalog.loaded:
+            QMessageBox.warning(self, "Please Wait", "Products are still loading")
+            return
+
+        product = catalog.lookup_code(code)
+        if product is None:
+            QMessageBox.warning(self, "Not Found", f"No product matches '{code}'")
+            return
+
+        self.select_product(product.product_id)
+        self.product_input.setText(product.name)
+        self.scan_input.clear()
+        self.add_to_cart()
+
+    @timed
     def add_to_cart(self):
-        product_id = self.product_combo.currentData()
-        quantity = self.quantity_spin.value()
+        product = catalog.get(self.selected_product_id)
+        if product is None:
+            return
+
+        line = self.cart.add(product, self.quantity_spin.value())
+        self.update_line(line)
+        self.update_total()
+
+    def update_line(self, line):
+        row = self.cart_rows.get(line.product_id)
+        if row is None:
+            row = self.cart_table.rowCount()
+            self.cart_table.insertRow(row)
+            self.cart_rows[line.product_id] = row
+            name_item = QTableWidgetItem(line.name)
+            name_item.setData(Qt.UserRole, line.product_id)
+            self.cart_table.setItem(row, 0, name_item)
+            self.cart_table.setItem(row, 2, QTableWidgetItem(f"${from_cents(line.unit_price):.2f}"))
+
+        self.cart_table.setItem(row, 1, QTableWidgetItem(str(line.quantity)))
+        self.cart_table.setItem(row, 3, QTableWidgetItem(f"${from_cents(line.total):.2f}"))
 
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        cursor.execute("SELECT price FROM products WHERE product_id = ?", (product_id,))
-        # price = cursor.fetchone()
-        # total = price * quantity
+    def remove_line(self):
+        row = self.cart_table.currentRow()
+        if row < 0:
+            return
 
-        cursor.execute("INSERT INTO transactions (product_id, quantity, total) VALUES (?, ?, ?)",
-                       (product_id, quantity, float(12)))
-        conn.commit()
-        conn.close()
+        product_id = self.cart_table.item(row, 0).data(Qt.UserRole)
+        self.cart.remove(product_id)
+        self.cart_table.removeRow(row)
+        self.cart_rows = {pid: r - 1 if r > row else r
+                          for pid, r in self.cart_rows.items() if pid != product_id}
+        self.update_total()
+
+    @timed
+    def checkout(self):
+        if not self.cart.lines:
+            return
+
+        # Only appends to the journal; the database write happens in the background
+        sale = self.cart.to_sale(permissions.username)
+        try:
+            journal.submit(sale)
+        except OSError as e:
+            QMessageBox.critical(self, "Journal Error", f"Failed to record sale: {str(e)}")
+            return
+
+        # The journal writes the same decrement to SQLite with the sale
+        now_low = stock.apply_sale(sale)
+        self.update_stock()
+
+        # Names as sold: a sync may have deleted or replaced the product in the catalog since
+        message = f"Sale {sale['sale_uuid'][:8]} recorded"
+        if now_low:
+            names = ', '.join(self.cart.lines[product_id].name for product_id in now_low)
+            message += f"\n\nNow at or below reorder level: {names}"
 
+        self.cart.clear()
+        self.cart_table.setRowCount(0)
+        self.cart_rows.clear()
         self.update_total()
+        QMessageBox.information(self, "Checkout", message)
+
+    def on_sales_committed(self, count):
+        if self.isVisible():
+            self.update_day_total()
+
+    def on_catalog_synced(self, count):
+        # Prices pulled from the store apply to the next scan
+        if self.isVisible():
+            self.refresh_products()
+
+    def on_journal_failed(self, message):
+        self.day_total_label.setText(f"Sales queued, database unavailable: {message}")
 
     def update_total(self):
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        cursor.execute("SELECT SUM(total) FROM transactions")
-        total = cursor.fetchone() or 0.0
-        conn.close()
+        self.total_label.setText(f"Total: ${from_cents(self.cart.total):.2f}")
+
+    def update_day_total(self):
+        if not self.day_total_label.text():
+            self.day_total_label.setText("Today: loading...")
+        executor.submit(sales_summary.day_totals, on_done=self.show_day_total,
+                        on_error=self.on_load_error, owner=self)
 
-        self.total_label.setText(f"Total: ${total}")
+    def show_day_total(self, totals):
+        sale_count, total = totals
+        self.day_total_label.setText(f"Today: ${total:.2f} ({sale_count} sales)")
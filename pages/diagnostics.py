@@ -0,0 +1,119 @@
+from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLabel, QTabWidget,
+    QTableWidget, QTableWidgetItem, QAbstractItemView, QFileDialog, QMessageBox)
+from PyQt5.QtCore import Qt, QTimer
+
+from services import instrumentation
+from services.instrumentation import recorder
+
+# How often the tables refresh while the page is open
+REFRESH_MS = 1000
+
+TIMING_HEADERS = ["Count", "Mean ms", "p50 ms", "p95 ms", "Max ms", "Total ms"]
+
+
+def number_item(value):
+    """Right-aligned cell that sorts numerically"""
+    item = QTableWidgetItem()
+    item.setData(Qt.DisplayRole, value)
+    item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+    return item
+
+
+def timing_items(stats):
+    return [number_item(stats['count']), number_item(stats['mean_ms']), number_item(stats['p50_ms']),
+            number_item(stats['p95_ms']), number_item(stats['max_ms']), number_item(stats['total_ms'])]
+
+
+class DiagnosticsPage(QWidget):
+    """Hidden page (Ctrl+Shift+D) showing handler and SQL timings from services.instrumentation"""
+
+    def __init__(self):
+        super().__init__()
+        self.layout = QVBoxLayout(self)
+
+        self.status_label = QLabel()
+        if not instrumentation.ENABLED:
+            self.status_label.setText("Instrumentation is off; start the app with INSTRUMENT=1")
+        self.layout.addWidget(self.status_label)
+
+        # Toolbar
+        toolbar = QHBoxLayout()
+        refresh_btn = QPushButton("Refresh")
+        refresh_btn.clicked.connect(self.refresh)
+        reset_btn = QPushButton("Reset")
+        reset_btn.clicked.connect(self.reset)
+        dump_btn = QPushButton("Dump JSON...")
+        dump_btn.clicked.connect(self.dump)
+        toolbar.addWidget(refresh_btn)
+        toolbar.addWidget(reset_btn)
+        toolbar.addStretch()
+        toolbar.addWidget(dump_btn)
+        self.layout.addLayout(toolbar)
+
+        # One table per view of the recorded data
+        self.tabs = QTabWidget()
+        self.handlers_table = self.add_table("Handlers", ["Handler", *TIMING_HEADERS, "Queries"])
+        self.queries_table = self.add_table("Queries", ["Statement", *TIMING_HEADERS])
+        self.slow_table = self.add_table("Slow Queries", ["ms", "Handler", "Statement", "Plan"])
+        self.layout.addWidget(self.tabs)
+
+        self.timer = QTimer(self)
+        self.timer.setInterval(REFRESH_MS)
+        self.timer.timeout.connect(self.refresh)
+
+    def add_table(self, label, headers):
+        table = QTableWidget(0, len(headers))
+        table.setHorizontalHeaderLabels(headers)
+        table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        table.horizontalHeader().setStretchLastSection(True)
+        self.tabs.addTab(table, label)
+        return table
+
+    def showEvent(self, event):
+        self.refresh()
+        self.timer.start()
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self.timer.stop()
+        super().hideEvent(event)
+
+    def refresh(self):
+        snapshot = recorder.snapshot()
+        self.fill(self.handlers_table, [
+            [QTableWidgetItem(name), *timing_items(stats), number_item(stats['queries'])]
+            for name, stats in snapshot['actions'].items()
+        ])
+        self.fill(self.queries_table, [
+            [QTableWidgetItem(sql), *timing_items(stats)]
+            for sql, stats in snapshot['queries'].items()
+        ])
+        self.fill(self.slow_table, [
+            [number_item(entry['ms']), QTableWidgetItem(entry['action'] or entry['thread']),
+             QTableWidgetItem(entry['sql']), QTableWidgetItem(' | '.join(entry['plan']))]
+            for entry in reversed(snapshot['slow_queries'])
+        ])
+
+    def fill(self, table, rows):
+        # Sorting is suspended while filling so rows are not reordered mid-update
+        table.setSortingEnabled(False)
+        table.setRowCount(len(rows))
+        for i, items in enumerate(rows):
+            for j, item in enumerate(items):
+                table.setItem(i, j, item)
+        table.setSortingEnabled(True)
+
+    def reset(self):
+        recorder.reset()
+        self.refresh()
+
+    def dump(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Dump Timings", "timings.json",
+                                              "JSON files (*.json)")
+        if not path:
+            return
+        try:
+            recorder.dump(path)
+        except OSError as e:
+            QMessageBox.warning(self, "Error", f"Failed to write timings: {str(e)}")
@@ -1,18 +1,12 @@
-from msilib.schema import Icon
 import sqlite3
 from PyQt5.QtWidgets import QApplication, QMainWindow, QVBoxLayout, QWidget, QPushButton, QComboBox, QSpinBox, QLabel, QHBoxLayout, QGridLayout, QStackedWidget, QFrame, QLineEdit, QMessageBox
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QVBoxLayout, QWidget, 
     QPushButton, QComboBox, QSpinBox, QLabel, QHBoxLayout, QGridLayout, 
     QStackedWidget, QFrame)
+from PyQt5.QtGui import QIcon
 from PyQt5.QtCore import Qt, pyqtSignal
 
-
-import pages.cashier as CashierPage
-import os
-from dotenv import load_dotenv
-load_dotenv()
-
-DB_PATH = os.getenv("DB_PATH")
+from services.permissions import permissions
 
 class ModuleButton(QPushButton):
     def __init__(self, title, icon_path=None):
@@ -20,7 +14,7 @@ class ModuleButton(QPushButton):
         self.setText(title)
         self.setMinimumSize(150, 150)
         if icon_path:
-            self.setIcon(Icon(icon_path))
+            self.setIcon(QIcon(icon_path))
         self.setStyleSheet("""
             QPushButton {
                 border: 2px solid #ccc;
@@ -37,29 +31,22 @@ class MainPage(QWidget):
     def __init__(self):
         super().__init__()
         self.layout = QGridLayout(self)
-        
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        # Get active modules and their permissions
-        cursor.execute('''
-            SELECT 
-                m.name,
-                m.required_permission_id,
-                p.key as permission_key
-            FROM modules m
-            LEFT JOIN permissions p ON m.required_permission_id = p.permission_id
-            WHERE m.is_active = 1
-        ''')
-        available_modules = cursor.fetchall()
-        conn.close()
-        
+
+    def showEvent(self, event):
+        # Cheap: rendering only reads the cached permission service
+        self.render_modules()
+        super().showEvent(event)
+
+    def render_modules(self):
+        """Show a button for every module the logged-in user may open"""
+        while self.layout.count():
+            self.layout.takeAt(0).widget().deleteLater()
+
         row = 0
         col = 0
-        for module_name, _, permission_key in available_modules:
-            if not permission_key or self.parent().check_permission(permission_key):
-                btn = ModuleButton(module_name.title(), None)
-                self.layout.addWidget(btn, row, col)
-                col = (col + 1) % 2
-                if col == 0:
-                    row += 1
\ No newline at end of file
+        for module_name in permissions.visible_modules():
+            btn = ModuleButton(module_name.title(), None)
+            self.layout.addWidget(btn, row, col)
+            col = (col + 1) % 2
+            if col == 0:
+                row += 1
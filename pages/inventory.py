@@ -0,0 +1,217 @@
+from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLabel, QCheckBox,
+    QDialog, QFormLayout, QSpinBox, QMessageBox, QFileDialog)
+import sqlite3
+
+import db
+from services import inventory
+from services.inventory import stock
+from services.events import changes
+from services.permissions import permissions
+from services.queries import executor
+from widgets.tables import QueryTableModel, QueryTableView, SearchBox
+
+# Largest quantity the adjust dialog accepts
+MAX_QUANTITY = 1000000
+
+# More changed levels than this reload the listing instead of patching row by row
+PATCH_LIMIT = 50
+
+
+class InventoryModel(QueryTableModel):
+    headers = ["Product", "SKU", "On Hand", "Reorder Level", "Actions"]
+    table = 'inventory'
+    key_column = 'p.product_id'
+    sort_keys = {
+        0: [('p.name', 1), ('p.product_id', 0)],
+    }
+
+    def query(self, where, params, order_by, limit):
+        source = "products p LEFT JOIN inventory i ON i.product_id = p.product_id"
+        if 'search' in self.filters:
+            where += " AND (p.name LIKE ? OR p.sku = ? OR p.barcode = ?)"
+            params += ['%' + self.filters['search'] + '%', self.filters['search'],
+                       self.filters['search']]
+        if 'low' in self.filters:
+            # Start from idx_inventory_low_stock, which holds only these rows;
+            # CROSS JOIN stops the planner walking every product by name instead
+            source = "inventory i CROSS JOIN products p ON p.product_id = i.product_id"
+            where += " AND i.on_hand <= i.reorder_level"
+        return f'''
+            SELECT p.product_id, p.name, p.sku, i.on_hand, i.reorder_level
+            FROM {source}
+            WHERE {where}
+            ORDER BY {order_by}
+            LIMIT ?
+        ''', params + [limit]
+
+    def cell(self, row, column):
+        if column == 0:
+            return row[1]
+        if column == 1:
+            return row[2] or ""
+        if column < 4:
+            return "Not tracked" if row[3] is None else str(row[column + 1])
+        return None
+
+
+class InventoryPage(QWidget):
+    def __init__(self):
+        super().__init__()
+        self.layout = QVBoxLayout(self)
+
+        # Low-stock alert, answered from the stock cache
+        self.alert_label = QLabel()
+        self.alert_label.setStyleSheet("color: #f44336; font-weight: bold;")
+        self.layout.addWidget(self.alert_label)
+
+        # Toolbar
+        toolbar = QHBoxLayout()
+        self.search_box = SearchBox("Search name, SKU or barcode...")
+        self.low_check = QCheckBox("Low stock only")
+        self.stock_take_btn = QPushButton("Stock Take...")
+        self.stock_take_btn.clicked.connect(self.stock_take)
+        toolbar.addWidget(self.search_box)
+        toolbar.addWidget(self.low_check)
+        toolbar.addStretch()
+        toolbar.addWidget(self.stock_take_btn)
+        self.layout.addLayout(toolbar)
+
+        # Table; rows are fetched a page at a time as the view scrolls
+        self.model = InventoryModel(self)
+        self.table = QueryTableView(self.model, 4, ["Adjust"])
+        self.search_box.search.connect(lambda text: self.model.set_filter('search', text))
+        self.low_check.toggled.connect(
+            lambda checked: self.model.set_filter('low', checked or None))
+        self.table.action_clicked.connect(self.on_action)
+        changes.watch(self.model)  # Adjustments patch single rows
+        self.layout.addWidget(self.table)
+
+    def showEvent(self, event):
+        # Pick up sales and stock takes from other registers
+        self.refresh_stock()
+        super().showEvent(event)
+
+    def refresh_stock(self):
+        if stock.loaded:
+            executor.submit(stock.fetch_changes, stock.high_water, on_done=self.on_stock_changed,
+                            on_error=self.on_load_error, owner=self)
+        else:
+            executor.submit(stock.fetch_all, on_done=self.on_stock_loaded,
+                            on_error=self.on_load_error, owner=self)
+        self.update_alert()
+
+    def hideEvent(self, event):
+        executor.cancel(self)
+        super().hideEvent(event)
+
+    def on_stock_loaded(self, rows):
+        stock.apply_load(rows)
+        self.update_alert()
+
+    def on_stock_changed(self, rows):
+        changed = stock.apply_changes(rows)
+        if len(changed) > PATCH_LIMIT:
+            self.model.reload()
+        else:
+            for level in changed:
+                changes.changed.emit('inventory', level.product_id)
+        self.update_alert()
+
+    def on_load_error(self, message):
+        QMessageBox.warning(self, "Database Error", f"Failed to load stock levels: {message}")
+
+    def update_alert(self):
+        if not stock.loaded:
+            self.alert_label.setText("Checking stock levels...")
+            return
+        low = len(stock.low_stock())
+        self.alert_label.setText(f"{low} items at or below their reorder level" if low else "")
+
+    def on_action(self, action, row):
+        product_id, name, _, on_hand, reorder_level = self.model.row_at(row)
+        if action == "Adjust":
+            self.adjust_stock(product_id, name, on_hand, reorder_level)
+
+    def can_update(self):
+        if permissions.has('inventory_update'):
+            return True
+        QMessageBox.warning(self, "Access Denied", "You don't have permission to change stock")
+        return False
+
+    def adjust_stock(self, product_id, name, on_hand, reorder_level):
+        if not self.can_update():
+            return
+        dialog = AdjustStockDialog(product_id, name, on_hand or 0, reorder_level or 0, self)
+        if dialog.exec_() == QDialog.Accepted:
+            self.update_alert()
+
+    def stock_take(self):
+        if not self.can_update():
+            return
+        path, _ = QFileDialog.getOpenFileName(self, "Stock Take", "",
+                                              "CSV files with code,count columns (*.csv)")
+        if not path:
+            return
+        # No owner: leaving the page must not interrupt the write
+        self.stock_take_btn.setEnabled(False)
+        executor.submit(inventory.apply_stock_take, path, on_done=self.on_stock_taken,
+                        on_error=self.on_stock_take_error)
+
+    def on_stock_taken(self, result):
+        applied, unknown = result
+        self.stock_take_btn.setEnabled(True)
+        # The cache pulls what the counts changed, then patches the listing or reloads it
+        if not stock.loaded:
+            self.model.reload()
+        self.refresh_stock()
+        message = f"Applied {applied} counts"
+        if unknown:
+            message += f"; no product matches {len(unknown)} codes: {', '.join(unknown[:10])}"
+        QMessageBox.information(self, "Stock Take", message)
+
+    def on_stock_take_error(self, message):
+        self.stock_take_btn.setEnabled(True)
+        QMessageBox.warning(self, "Error", f"Failed to apply stock take: {message}")
+
+
+class AdjustStockDialog(QDialog):
+    def __init__(self, product_id, name, on_hand, reorder_level, parent=None):
+        super().__init__(parent)
+        self.product_id = product_id
+        self.setWindowTitle(f"Adjust Stock - {name}")
+        self.layout = QFormLayout(self)
+
+        # Stock may run negative when sales outpace the last count
+        self.on_hand_spin = QSpinBox()
+        self.on_hand_spin.setRange(-MAX_QUANTITY, MAX_QUANTITY)
+        self.on_hand_spin.setValue(on_hand)
+        self.reorder_spin = QSpinBox()
+        self.reorder_spin.setRange(0, MAX_QUANTITY)
+        self.reorder_spin.setValue(reorder_level)
+        self.layout.addRow("On Hand:", self.on_hand_spin)
+        self.layout.addRow("Reorder Level:", self.reorder_spin)
+
+        # Buttons
+        button_box = QHBoxLayout()
+        save_btn = QPushButton("Save")
+        save_btn.clicked.connect(self.save_changes)
+        cancel_btn = QPushButton("Cancel")
+        cancel_btn.clicked.connect(self.reject)
+
+        button_box.addWidget(save_btn)
+        button_box.addWidget(cancel_btn)
+        self.layout.addRow(button_box)
+
+    def save_changes(self):
+        conn = db.get_connection()
+        try:
+            with conn:
+                inventory.set_levels(conn, [(self.product_id, self.on_hand_spin.value(),
+                                             self.reorder_spin.value())])
+        except sqlite3.Error as e:
+            QMessageBox.warning(self, "Error", f"Failed to update stock: {str(e)}")
+            return
+
+        stock.refresh()
+        changes.changed.emit('inventory', self.product_id)
+        self.accept()
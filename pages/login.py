@@ -1,13 +1,9 @@
 from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QFrame, QLabel, 
     QLineEdit, QPushButton, QMessageBox, QHBoxLayout, QApplication)
 from PyQt5.QtCore import Qt, pyqtSignal
-import sqlite3
-import bcrypt
-import os
-from dotenv import load_dotenv
-
-load_dotenv()
-DB_PATH = os.getenv("DB_PATH")
+from services.credentials import credentials, check_password
+from services.instrumentation import timed
+from services.sessions import sessions
 
 
 
@@ -82,6 +78,7 @@ class LoginPage(QWidget):
             }
         """)
         self.login_btn.clicked.connect(self.check_credentials)
+        self.password_input.returnPressed.connect(self.check_credentials)
         
         # Close button
         self.close_btn = QPushButton("Close")
@@ -104,10 +101,41 @@ class LoginPage(QWidget):
         button_container.addWidget(self.login_btn)
         button_container.addWidget(self.close_btn)
         
+        # Quick switch: PIN (with username) or badge scan for recently verified users
+        self.pin_input = QLineEdit()
+        self.pin_input.setPlaceholderText("PIN or badge (quick switch)")
+        self.pin_input.setEchoMode(QLineEdit.Password)
+        self.pin_input.setStyleSheet("""
+            QLineEdit {
+                padding: 8px;
+                border: 1px solid #ccc;
+                border-radius: 4px;
+                margin-top: 10px;
+            }
+        """)
+        self.pin_input.returnPressed.connect(self.quick_switch)
+        
+        self.switch_btn = QPushButton("Quick Switch")
+        self.switch_btn.setStyleSheet("""
+            QPushButton {
+                background-color: #2196F3;
+                color: white;
+                padding: 8px;
+                border: none;
+                border-radius: 4px;
+            }
+            QPushButton:hover {
+                background-color: #1976D2;
+            }
+        """)
+        self.switch_btn.clicked.connect(self.quick_switch)
+        
         # Add widgets to form
         form_layout.addWidget(self.username_input)
         form_layout.addWidget(self.password_input)
         form_layout.addLayout(button_container)
+        form_layout.addWidget(self.pin_input)
+        form_layout.addWidget(self.switch_btn)
         form_layout.addStretch()
         
         # Center the form
@@ -121,49 +149,95 @@ class LoginPage(QWidget):
     def clear_inputs(self):
         self.username_input.clear()
         self.password_input.clear()
+        self.pin_input.clear()
     
+    @timed
     def check_credentials(self):
         username = self.username_input.text().strip()
         password = self.password_input.text().strip()
         
         if not username or not password:
             QMessageBox.warning(self, "Error", "Please fill in all fields")
-            return False
-        
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        try:
-            # Get user data including role
-            cursor.execute('''
-                SELECT u.password_hash, u.user_id, r.name as role_name 
-                FROM users u
-                JOIN roles r ON u.role_id = r.role_id
-                WHERE u.username = ? AND u.is_active = 1
-            ''', (username,))
-            
-            user_data = cursor.fetchone()
-            
-            if user_data:
-                stored_hash = user_data[0]
-                
-                # Check password using bcrypt
-                if bcrypt.checkpw(password.encode('utf-8'), stored_hash):
-                    self.login_successful.emit(username, user_data[2])  # Emit username and role
-                    self.clear_inputs()
-                    return True
-                else:
-                    QMessageBox.warning(self, "Error", "Invalid credentials")
-                    return False
-            else:
-                QMessageBox.warning(self, "Error", "Invalid credentials")
-                return False
-                
-        except sqlite3.Error as e:
-            QMessageBox.critical(self, "Database Error", f"An error occurred: {str(e)}")
-            return False
-        finally:
-            conn.close()
+            return
+        
+        # bcrypt runs on a worker thread; the result arrives via on_verified
+        self.set_busy(True)
+        credentials.verify(username, password, self.on_verified, self.on_verify_error)
+
+    def on_verified(self, user):
+        self.set_busy(False)
+        if user:
+            sessions.remember(user)
+            self.clear_inputs()
+            self.login_successful.emit(user.username, user.role)  # Emit username and role
+        else:
+            QMessageBox.warning(self, "Error", "Invalid credentials")
+
+    def on_verify_error(self, message):
+        self.set_busy(False)
+        QMessageBox.critical(self, "Database Error", f"An error occurred: {message}")
+
+    def quick_switch(self):
+        code = self.pin_input.text().strip()
+        if not code:
+            return
+
+        # A badge scan identifies the user on its own
+        session = sessions.find_badge(code)
+        if session:
+            self.complete_switch(session)
+            return
+
+        username = self.username_input.text().strip()
+        session = sessions.get(username) if username else None
+        if session is None or not session.pin_hash:
+            QMessageBox.warning(self, "Quick Switch", "Please sign in with your password")
+            return
+
+        matched = sessions.check_pin(session, code)
+        if matched is None:
+            # First PIN use since the password login: confirm against bcrypt once
+            self.set_busy(True)
+            credentials.run(check_password, code, session.pin_hash,
+                            on_done=lambda ok: self.on_pin_checked(session, code, ok),
+                            on_error=self.on_verify_error)
+        elif matched:
+            self.complete_switch(session)
+        else:
+            self.reject_pin(session)
+
+    def on_pin_checked(self, session, pin, ok):
+        self.set_busy(False)
+        if ok:
+            sessions.confirm_pin(session, pin)
+            self.complete_switch(session)
+        else:
+            self.reject_pin(session)
+
+    def reject_pin(self, session):
+        self.pin_input.clear()
+        if sessions.record_failure(session):
+            QMessageBox.warning(self, "Quick Switch",
+                                "Too many invalid PINs. Please sign in with your password")
+        else:
+            QMessageBox.warning(self, "Error", "Invalid PIN")
+
+    def complete_switch(self, session):
+        sessions.record_switch(session)
+        self.clear_inputs()
+        self.login_successful.emit(session.username, session.role)
+
+    def set_busy(self, busy):
+        self.username_input.setEnabled(not busy)
+        self.password_input.setEnabled(not busy)
+        self.pin_input.setEnabled(not busy)
+        self.switch_btn.setEnabled(not busy)
+        self.login_btn.setEnabled(not busy)
+        self.login_btn.setText("Signing in..." if busy else "Login")
+        if busy:
+            QApplication.setOverrideCursor(Qt.WaitCursor)
+        else:
+            QApplication.restoreOverrideCursor()
     
     def close_application(self):
         reply = QMessageBox.question(self, 'Close Application', 
@@ -0,0 +1,118 @@
+from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QComboBox,
+    QDateEdit, QLabel, QTableWidget, QTableWidgetItem, QAbstractItemView, QFileDialog,
+    QMessageBox)
+from PyQt5.QtCore import Qt, QDate
+
+from services import reports
+from services.queries import executor
+
+
+class ReportsPage(QWidget):
+    def __init__(self):
+        super().__init__()
+        self.layout = QVBoxLayout(self)
+        self.rows = []
+        self.shown_report = None
+
+        # Report selection and date range
+        toolbar = QHBoxLayout()
+        self.report_combo = QComboBox()
+        for name, report in reports.REPORTS.items():
+            self.report_combo.addItem(report.title, name)
+        self.start_date = QDateEdit(QDate.currentDate().addDays(-29))
+        self.end_date = QDateEdit(QDate.currentDate())
+        for picker in (self.start_date, self.end_date):
+            picker.setCalendarPopup(True)
+            picker.setDisplayFormat("yyyy-MM-dd")
+
+        self.run_button = QPushButton("Run")
+        self.run_button.clicked.connect(self.run_report)
+        self.export_button = QPushButton("Export CSV")
+        self.export_button.clicked.connect(self.export_report)
+        self.export_button.setEnabled(False)
+
+        toolbar.addWidget(self.report_combo)
+        toolbar.addWidget(QLabel("From:"))
+        toolbar.addWidget(self.start_date)
+        toolbar.addWidget(QLabel("To:"))
+        toolbar.addWidget(self.end_date)
+        toolbar.addWidget(self.run_button)
+        toolbar.addWidget(self.export_button)
+        toolbar.addStretch()
+        self.layout.addLayout(toolbar)
+
+        # Results
+        self.table = QTableWidget()
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.layout.addWidget(self.table)
+
+        self.status_label = QLabel()
+        self.layout.addWidget(self.status_label)
+
+    def showEvent(self, event):
+        if self.shown_report is None:
+            self.run_report()
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        executor.cancel(self)
+        self.run_button.setEnabled(True)
+        super().hideEvent(event)
+
+    def run_report(self):
+        name = self.report_combo.currentData()
+        start = self.start_date.date().toString("yyyy-MM-dd")
+        end = self.end_date.date().toString("yyyy-MM-dd")
+        if start > end:
+            QMessageBox.warning(self, "Invalid Range", "The start date is after the end date")
+            return
+
+        self.run_button.setEnabled(False)
+        self.status_label.setText("Loading...")
+        executor.submit(reports.run, name, start, end,
+                        on_done=lambda rows: self.show_report(name, rows),
+                        on_error=self.on_report_error, owner=self)
+
+    def show_report(self, name, rows):
+        report = reports.REPORTS[name]
+        self.shown_report = name
+        self.rows = rows
+        self.run_button.setEnabled(True)
+        self.export_button.setEnabled(bool(rows))
+
+        self.table.setUpdatesEnabled(False)
+        self.table.clear()
+        self.table.setColumnCount(len(report.headers))
+        self.table.setHorizontalHeaderLabels(report.headers)
+        self.table.setRowCount(len(rows))
+        for i, row in enumerate(rows):
+            for j, value in enumerate(row):
+                if j in report.money_columns:
+                    item = QTableWidgetItem(f"${value or 0:,.2f}")
+                    item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                else:
+                    item = QTableWidgetItem(str(value))
+                self.table.setItem(i, j, item)
+        self.table.setUpdatesEnabled(True)
+
+        total = sum(row[-1] or 0 for row in rows)
+        self.status_label.setText(f"{len(rows)} rows, total ${total:,.2f}")
+
+    def on_report_error(self, message):
+        self.run_button.setEnabled(True)
+        self.status_label.clear()
+        QMessageBox.warning(self, "Database Error", f"Failed to run report: {message}")
+
+    def export_report(self):
+        if self.shown_report is None:
+            return
+        path, _ = QFileDialog.getSaveFileName(self, "Export Report",
+                                              f"{self.shown_report}_report.csv",
+                                              "CSV files (*.csv)")
+        if not path:
+            return
+        try:
+            reports.export_csv(path, self.shown_report, self.rows)
+        except OSError as e:
+            QMessageBox.warning(self, "Error", f"Failed to export report: {str(e)}")
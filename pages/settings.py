@@ -1,10 +1,104 @@
 from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QPushButton, 
-    QTableWidget, QTableWidgetItem, QComboBox, QMessageBox, QDialog, 
-    QFormLayout, QLineEdit, QLabel, QTabWidget, QCheckBox)
-from PyQt5.QtCore import Qt
+    QComboBox, QMessageBox, QDialog, 
+    QFormLayout, QLineEdit, QLabel, QTabWidget, QCheckBox, QApplication)
+from PyQt5.QtCore import Qt, pyqtSignal
 import sqlite3
-import bcrypt
-import os
+
+import db
+from services.credentials import credentials, hash_password
+from services.permissions import permissions
+from services.sessions import sessions
+from services.events import changes
+from services.queries import executor, fetch_all
+from widgets.tables import QueryTableModel, QueryTableView, SearchBox
+
+# Checked before a role or permission is deleted
+USERS_WITH_ROLE = "SELECT COUNT(*) FROM users WHERE role_id = ?"
+ROLES_WITH_PERMISSION = "SELECT COUNT(*) FROM role_permissions WHERE permission_id = ?"
+
+# Choices offered by the dialogs
+ROLE_CHOICES = "SELECT role_id, name FROM roles"
+PERMISSION_CHOICES = "SELECT permission_id, key FROM permissions ORDER BY key"
+ROLE_NAME = "SELECT name FROM roles WHERE role_id = ?"
+
+
+def fetch_user_form(username):
+    """Roles and the user's (user_id, role_id, badge_code), None if the user is gone"""
+    conn = db.get_connection()
+    user = conn.execute("SELECT user_id, role_id, badge_code FROM users WHERE username = ?",
+                        (username,)).fetchone()
+    return user and (conn.execute(ROLE_CHOICES).fetchall(), user)
+
+
+def fetch_role_form(role_id):
+    """A role's name, description, the permissions and the ids it holds; None if it is gone"""
+    conn = db.get_connection()
+    role = conn.execute("SELECT name, description FROM roles WHERE role_id = ?",
+                        (role_id,)).fetchone()
+    if role is None:
+        return None
+    granted = conn.execute("SELECT permission_id FROM role_permissions WHERE role_id = ?",
+                           (role_id,))
+    return (*role, conn.execute(PERMISSION_CHOICES).fetchall(), {row[0] for row in granted})
+
+
+def fetch_permission_key(perm_id):
+    """A permission's key, None if it is gone"""
+    row = db.get_connection().execute(
+        "SELECT key FROM permissions WHERE permission_id = ?", (perm_id,)).fetchone()
+    return row and row[0]
+
+
+def fetch_module_form(module_id):
+    """A module's name, required permission id and the permissions; None if it is gone"""
+    conn = db.get_connection()
+    module = conn.execute("SELECT name, required_permission_id FROM modules WHERE module_id = ?",
+                          (module_id,)).fetchone()
+    return module and (*module, conn.execute(PERMISSION_CHOICES).fetchall())
+
+
+def set_busy(dialog, busy):
+    """Block input on a dialog while a password is hashed in the background"""
+    dialog.setEnabled(not busy)
+    if busy:
+        QApplication.setOverrideCursor(Qt.WaitCursor)
+    else:
+        QApplication.restoreOverrideCursor()
+
+
+def hash_secrets(*values):
+    """Hash each non-empty value; runs on a credential worker"""
+    return tuple(hash_password(value) if value else None for value in values)
+
+
+class FormDialog(QDialog):
+    """Dialog whose current values are read on the query thread
+
+    Save stays disabled until load() delivers them. A None result means
+    the record was deleted in the meantime and closes the dialog.
+    """
+
+    def load(self, func, *args, on_done):
+        self.save_btn.setEnabled(False)
+        executor.submit(func, *args, on_done=lambda result: self.loaded(on_done, result),
+                        on_error=self.on_load_error, owner=self)
+
+    def loaded(self, on_done, result):
+        if result is None:
+            QMessageBox.warning(self, "Error", "It has been deleted in the meantime")
+            self.reject()
+            return
+        on_done(result)
+        self.save_btn.setEnabled(True)
+
+    def on_load_error(self, message):
+        QMessageBox.warning(self, "Database Error", f"Failed to load: {message}")
+        self.reject()
+
+    def done(self, result):
+        executor.cancel(self)  # closed before its values arrived
+        super().done(result)
+
 
 class SettingsPage(QWidget):
     def __init__(self):
@@ -14,14 +108,80 @@ class SettingsPage(QWidget):
         # Create tab widget
         self.tab_widget = QTabWidget()
         
-        # Add tabs
-        self.tab_widget.addTab(UsersTab(), "Users")
-        self.tab_widget.addTab(RolesTab(), "Roles")
-        self.tab_widget.addTab(PermissionsTab(), "Permissions")
-        self.tab_widget.addTab(ModulesTab(), "Modules")
+        # Add placeholder tabs; each real tab (and its query) is built when first opened
+        self.tab_factories = [UsersTab, RolesTab, PermissionsTab, ModulesTab]
+        for label in ["Users", "Roles", "Permissions", "Modules"]:
+            placeholder = QWidget()
+            QVBoxLayout(placeholder).setContentsMargins(0, 0, 0, 0)
+            self.tab_widget.addTab(placeholder, label)
+        self.tabs = {}
+        self.tab_widget.currentChanged.connect(self.ensure_tab)
+        self.ensure_tab(self.tab_widget.currentIndex())
         
         self.layout.addWidget(self.tab_widget)
 
+    def ensure_tab(self, index):
+        if index < 0 or index in self.tabs:
+            return
+        tab = self.tab_factories[index]()
+        self.tab_widget.widget(index).layout().addWidget(tab)
+        self.tabs[index] = tab
+
+class UsersModel(QueryTableModel):
+    headers = ["Username", "Role", "Status", "Created At", "Actions"]
+    table = 'users'
+    key_column = 'u.user_id'
+    # Username is unique, so it breaks ties; each ordering has a matching index
+    sort_keys = {
+        0: [('u.username', 1)],
+        1: [('r.name', 2), ('u.username', 1)],
+        2: [('u.is_active', 3), ('u.username', 1)],
+        3: [('u.created_at', 4), ('u.username', 1)],
+    }
+
+    def query(self, where, params, order_by, limit):
+        if 'search' in self.filters:
+            pattern = '%' + self.filters['search'] + '%'
+            where += " AND (u.username LIKE ? OR r.name LIKE ?)"
+            params += [pattern, pattern]
+        if 'active' in self.filters:
+            where += " AND u.is_active = ?"
+            params.append(self.filters['active'])
+        return f'''
+            SELECT u.user_id, u.username, r.name, u.is_active, u.created_at, u.role_id
+            FROM users u
+            JOIN roles r ON u.role_id = r.role_id
+            WHERE {where}
+            ORDER BY {order_by}
+            LIMIT ?
+        ''', params + [limit]
+
+    def cell(self, row, column):
+        if column == 2:  # Status column
+            return "Active" if row[3] else "Inactive"
+        if column < 4:
+            return str(row[column + 1])
+        return None
+
+    def on_changed(self, table, key):
+        if table == 'roles':
+            self.patch_role(key)
+        else:
+            super().on_changed(table, key)
+
+    def patch_role(self, role_id):
+        """Show a renamed role on the loaded rows that have it, once its name is read"""
+        executor.query(ROLE_NAME, (role_id,), on_done=lambda rows: self.rename_role(role_id, rows),
+                       on_error=self.load_failed.emit, owner=self)
+
+    def rename_role(self, role_id, rows):
+        if not rows:
+            return
+        for i, row in enumerate(self.rows):
+            if row[5] == role_id and row[2] != rows[0][0]:
+                self.set_row(i, row[:2] + (rows[0][0],) + row[3:])
+
+
 class UsersTab(QWidget):
     def __init__(self):
         super().__init__()
@@ -34,77 +194,57 @@ class UsersTab(QWidget):
         toolbar.addWidget(add_btn)
         toolbar.addStretch()
         
-        # Table
-        self.table = QTableWidget()
-        self.table.setColumnCount(5)
-        self.table.setHorizontalHeaderLabels(["Username", "Role", "Status", "Created At", "Actions"])
+        # Filters run in SQL; the search box waits for a pause in typing
+        self.search_box = SearchBox("Search username or role...")
+        self.status_combo = QComboBox()
+        self.status_combo.addItem("All", None)
+        self.status_combo.addItem("Active", 1)
+        self.status_combo.addItem("Inactive", 0)
+        toolbar.addWidget(self.search_box)
+        toolbar.addWidget(self.status_combo)
+        
+        # Table; rows are fetched a page at a time as the view scrolls
+        self.model = UsersModel(self)
+        self.table = QueryTableView(self.model, 4, ["Edit", "Delete"], sortable=True)
+        self.search_box.search.connect(lambda text: self.model.set_filter('search', text))
+        self.status_combo.currentIndexChanged.connect(
+            lambda: self.model.set_filter('active', self.status_combo.currentData()))
+        self.table.action_clicked.connect(self.on_action)
+        changes.watch(self.model)  # Edits patch single rows
         
         layout.addLayout(toolbar)
         layout.addWidget(self.table)
-        
-        self.load_users()
     
+    def on_action(self, action, row):
+        if action == "Edit":
+            self.edit_user(row)
+        else:
+            self.delete_user(row)
+
     def add_user(self):
-        dialog = AddUserDialog(self)
-        if dialog.exec_() == QDialog.Accepted:
-            self.load_users()  # Refresh the table
+        AddUserDialog(self).exec_()
     
-    def load_users(self):
-        conn = sqlite3.connect(os.getenv("DB_PATH"))
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT users.username, roles.name, users.is_active, users.created_at 
-            FROM users 
-            JOIN roles ON users.role_id = roles.role_id
-        ''')
-        users = cursor.fetchall()
-        conn.close()
-        
-        self.table.setRowCount(len(users))
-        for i, user in enumerate(users):
-            for j, value in enumerate(user):
-                item = QTableWidgetItem(str(value))
-                if j == 2:  # Status column
-                    item.setText("Active" if value else "Inactive")
-                self.table.setItem(i, j, item)
-            
-            # Add action buttons
-            actions = QWidget()
-            actions_layout = QHBoxLayout(actions)
-            actions_layout.setContentsMargins(0, 0, 0, 0)
-            
-            edit_btn = QPushButton("Edit")
-            edit_btn.clicked.connect(lambda checked, row=i: self.edit_user(row))
-            
-            delete_btn = QPushButton("Delete")
-            delete_btn.clicked.connect(lambda checked, row=i: self.delete_user(row))
-            
-            actions_layout.addWidget(edit_btn)
-            actions_layout.addWidget(delete_btn)
-            self.table.setCellWidget(i, 4, actions)
-
     def edit_user(self, row):
-        username = self.table.item(row, 0).text()
-        dialog = EditUserDialog(username, self)
-        if dialog.exec_() == QDialog.Accepted:
-            self.load_users()  # Refresh the table
+        username = self.model.row_at(row)[1]
+        EditUserDialog(username, self).exec_()
 
     def delete_user(self, row):
-        username = self.table.item(row, 0).text()
+        user_id, username = self.model.row_at(row)[:2]
         reply = QMessageBox.question(self, 'Delete User', 
                                    f'Are you sure you want to delete user {username}?',
                                    QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
         
         if reply == QMessageBox.Yes:
-            conn = sqlite3.connect(os.getenv("DB_PATH"))
+            conn = db.get_connection()
             cursor = conn.cursor()
-            cursor.execute("DELETE FROM users WHERE username = ?", (username,))
+            cursor.execute("DELETE FROM users WHERE user_id = ?", (user_id,))
             conn.commit()
-            conn.close()
-            self.load_users()  # Refresh the table
+            permissions.refresh()
+            sessions.forget(username)
+            changes.removed.emit('users', user_id)
 
 
-class AddUserDialog(QDialog):
+class AddUserDialog(FormDialog):
     def __init__(self, parent=None):
         super().__init__(parent)
         self.setWindowTitle("Add User")
@@ -116,7 +256,7 @@ class AddUserDialog(QDialog):
         self.password.setEchoMode(QLineEdit.Password)
         
         self.role_combo = QComboBox()
-        self.load_roles()
+        self.role_combo.addItem("Loading...")
         
         # Add fields to form
         self.layout.addRow("Username:", self.username)
@@ -125,22 +265,18 @@ class AddUserDialog(QDialog):
         
         # Add buttons
         button_box = QHBoxLayout()
-        save_btn = QPushButton("Save")
-        save_btn.clicked.connect(self.save_user)
+        self.save_btn = QPushButton("Save")
+        self.save_btn.clicked.connect(self.save_user)
         cancel_btn = QPushButton("Cancel")
         cancel_btn.clicked.connect(self.reject)
         
-        button_box.addWidget(save_btn)
+        button_box.addWidget(self.save_btn)
         button_box.addWidget(cancel_btn)
         self.layout.addRow(button_box)
+        self.load(fetch_all, ROLE_CHOICES, on_done=self.show_roles)
 
-    def load_roles(self):
-        conn = sqlite3.connect(os.getenv("DB_PATH"))
-        cursor = conn.cursor()
-        cursor.execute("SELECT id, name FROM roles")
-        roles = cursor.fetchall()
-        conn.close()
-        
+    def show_roles(self, roles):
+        self.role_combo.clear()
         for role_id, role_name in roles:
             self.role_combo.addItem(role_name, role_id)
 
@@ -153,10 +289,22 @@ class AddUserDialog(QDialog):
             QMessageBox.warning(self, "Error", "Please fill all fields")
             return
         
-        # Hash password
-        password_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
+        # Hash password on a worker thread, then insert
+        set_busy(self, True)
+        credentials.hash(password,
+                         lambda password_hash: self.insert_user(username, password_hash, role_id),
+                         self.on_hash_error)
+
+    def on_hash_error(self, message):
+        set_busy(self, False)
+        QMessageBox.warning(self, "Error", f"Failed to hash password: {message}")
+
+    def insert_user(self, username, password_hash, role_id):
+        set_busy(self, False)
+        if not self.isVisible():  # Dialog was closed while hashing
+            return
         
-        conn = sqlite3.connect(os.getenv("DB_PATH"))
+        conn = db.get_connection()
         cursor = conn.cursor()
         try:
             cursor.execute(
@@ -164,14 +312,17 @@ class AddUserDialog(QDialog):
                 (username, password_hash, role_id)
             )
             conn.commit()
+            permissions.refresh()
+            changes.changed.emit('users', cursor.lastrowid)
             self.accept()
         except sqlite3.IntegrityError:
             QMessageBox.warning(self, "Error", "Username already exists")
         finally:
-            conn.close()
+            if conn.in_transaction:
+                conn.rollback()
 
 
-class EditUserDialog(QDialog):
+class EditUserDialog(FormDialog):
     def __init__(self, username, parent=None):
         super().__init__(parent)
         self.username = username
@@ -183,41 +334,38 @@ class EditUserDialog(QDialog):
         self.password.setEchoMode(QLineEdit.Password)
         self.password.setPlaceholderText("Leave blank to keep current password")
         
+        self.pin = QLineEdit()
+        self.pin.setEchoMode(QLineEdit.Password)
+        self.pin.setPlaceholderText("4-8 digits, blank to keep current PIN")
+        self.badge = QLineEdit()
+        
         self.role_combo = QComboBox()
-        self.load_roles()
-        self.load_user_data()
+        self.role_combo.addItem("Loading...")
         
         # Add fields to form
         self.layout.addRow("New Password:", self.password)
+        self.layout.addRow("Quick Switch PIN:", self.pin)
+        self.layout.addRow("Badge:", self.badge)
         self.layout.addRow("Role:", self.role_combo)
         
         # Add buttons
         button_box = QHBoxLayout()
-        save_btn = QPushButton("Save")
-        save_btn.clicked.connect(self.save_changes)
+        self.save_btn = QPushButton("Save")
+        self.save_btn.clicked.connect(self.save_changes)
         cancel_btn = QPushButton("Cancel")
         cancel_btn.clicked.connect(self.reject)
         
-        button_box.addWidget(save_btn)
+        button_box.addWidget(self.save_btn)
         button_box.addWidget(cancel_btn)
         self.layout.addRow(button_box)
+        self.load(fetch_user_form, username, on_done=self.show_user)
 
-    def load_roles(self):
-        conn = sqlite3.connect(os.getenv("DB_PATH"))
-        cursor = conn.cursor()
-        cursor.execute("SELECT id, name FROM roles")
-        roles = cursor.fetchall()
-        conn.close()
-        
-        for role_id, role_name in roles:
-            self.role_combo.addItem(role_name, role_id)
-
-    def load_user_data(self):
-        conn = sqlite3.connect(os.getenv("DB_PATH"))
-        cursor = conn.cursor()
-        cursor.execute("SELECT role_id FROM users WHERE username = ?", (self.username,))
-        role_id = cursor.fetchone()[0]
-        conn.close()
+    def show_user(self, form):
+        roles, (self.user_id, role_id, badge_code) = form
+        self.role_combo.clear()
+        for choice_id, role_name in roles:
+            self.role_combo.addItem(role_name, choice_id)
+        self.badge.setText(badge_code or "")
         
         # Set current role in combo box
         index = self.role_combo.findData(role_id)
@@ -226,32 +374,93 @@ class EditUserDialog(QDialog):
 
     def save_changes(self):
         new_password = self.password.text()
+        new_pin = self.pin.text().strip()
+        badge_code = self.badge.text().strip() or None
         role_id = self.role_combo.currentData()
         
-        conn = sqlite3.connect(os.getenv("DB_PATH"))
+        if new_pin and not (new_pin.isdigit() and 4 <= len(new_pin) <= 8):
+            QMessageBox.warning(self, "Error", "PIN must be 4-8 digits")
+            return
+        
+        if new_password or new_pin:
+            # Hash password and PIN on a worker thread, then update
+            set_busy(self, True)
+            credentials.run(hash_secrets, new_password, new_pin,
+                            on_done=lambda hashes: self.update_user(role_id, badge_code, *hashes),
+                            on_error=self.on_hash_error)
+        else:
+            self.update_user(role_id, badge_code)
+
+    def on_hash_error(self, message):
+        set_busy(self, False)
+        QMessageBox.warning(self, "Error", f"Failed to hash password: {message}")
+
+    def update_user(self, role_id, badge_code, password_hash=None, pin_hash=None):
+        if password_hash is not None or pin_hash is not None:
+            set_busy(self, False)
+            if not self.isVisible():  # Dialog was closed while hashing
+                return
+        
+        # Only overwrite the secrets that were changed
+        assignments = ["role_id = ?", "badge_code = ?"]
+        params = [role_id, badge_code]
+        if password_hash is not None:
+            assignments.append("password_hash = ?")
+            params.append(password_hash)
+        if pin_hash is not None:
+            assignments.append("pin_hash = ?")
+            params.append(pin_hash)
+        
+        conn = db.get_connection()
         cursor = conn.cursor()
         
         try:
-            if new_password:
-                # Update password and role
-                password_hash = bcrypt.hashpw(new_password.encode('utf-8'), bcrypt.gensalt())
-                cursor.execute(
-                    "UPDATE users SET password_hash = ?, role_id = ? WHERE username = ?",
-                    (password_hash, role_id, self.username)
-                )
-            else:
-                # Update role only
-                cursor.execute(
-                    "UPDATE users SET role_id = ? WHERE username = ?",
-                    (role_id, self.username)
-                )
-            
+            cursor.execute(
+                f"UPDATE users SET {', '.join(assignments)} WHERE user_id = ?",
+                (*params, self.user_id)
+            )
             conn.commit()
+            permissions.refresh()
+            sessions.forget(self.username)
+            changes.changed.emit('users', self.user_id)
             self.accept()
+        except sqlite3.IntegrityError:
+            QMessageBox.warning(self, "Error", "Badge is already assigned to another user")
         except sqlite3.Error as e:
             QMessageBox.warning(self, "Error", f"Failed to update user: {str(e)}")
         finally:
-            conn.close()
+            if conn.in_transaction:
+                conn.rollback()
+
+class RolesModel(QueryTableModel):
+    headers = ["Name", "Description", "Permissions", "Actions"]
+    table = 'roles'
+    key_column = 'r.role_id'
+    sort_keys = {0: [('r.name', 1)]}
+
+    def query(self, where, params, order_by, limit):
+        if 'search' in self.filters:
+            pattern = '%' + self.filters['search'] + '%'
+            where += " AND (r.name LIKE ? OR r.description LIKE ?)"
+            params += [pattern, pattern]
+        # Get roles with their permissions
+        return f'''
+            SELECT r.role_id, r.name, r.description,
+                   GROUP_CONCAT(p.key) as permissions
+            FROM roles r
+            LEFT JOIN role_permissions rp ON r.role_id = rp.role_id
+            LEFT JOIN permissions p ON rp.permission_id = p.permission_id
+            WHERE {where}
+            GROUP BY r.role_id
+            ORDER BY {order_by}
+            LIMIT ?
+        ''', params + [limit]
+
+    def cell(self, row, column):
+        if column < 3:
+            return row[column + 1] or ""
+        return None
+
 
 class RolesTab(QWidget):
     def __init__(self):
@@ -264,76 +473,42 @@ class RolesTab(QWidget):
         add_btn.clicked.connect(self.add_role)
         toolbar.addWidget(add_btn)
         toolbar.addStretch()
+        self.search_box = SearchBox("Search roles...")
+        toolbar.addWidget(self.search_box)
         
         # Table
-        self.table = QTableWidget()
-        self.table.setColumnCount(4)
-        self.table.setHorizontalHeaderLabels(["Name", "Description", "Permissions", "Actions"])
+        self.model = RolesModel(self)
+        self.table = QueryTableView(self.model, 3, ["Edit", "Delete"], sortable=True)
+        self.search_box.search.connect(lambda text: self.model.set_filter('search', text))
+        self.table.action_clicked.connect(self.on_action)
+        changes.watch(self.model)
         
         layout.addLayout(toolbar)
         layout.addWidget(self.table)
-        
-        self.load_roles()
 
-    def add_role(self):
-        dialog = AddRoleDialog(self)
-        if dialog.exec_() == QDialog.Accepted:
-            self.load_roles()
+    def on_action(self, action, row):
+        role_id, role_name = self.model.row_at(row)[:2]
+        if action == "Edit":
+            self.edit_role(role_id)
+        else:
+            self.delete_role(role_id, role_name)
 
-    def load_roles(self):
-        conn = sqlite3.connect(os.getenv("DB_PATH"))
-        cursor = conn.cursor()
-        
-        # Get roles with their permissions
-        cursor.execute('''
-            SELECT r.role_id, r.name, r.description,
-                   GROUP_CONCAT(p.key) as permissions
-            FROM roles r
-            LEFT JOIN role_permissions rp ON r.role_id = rp.role_id
-            LEFT JOIN permissions p ON rp.permission_id = p.permission_id
-            GROUP BY r.role_id
-        ''')
-        roles = cursor.fetchall()
-        conn.close()
-        
-        self.table.setRowCount(len(roles))
-        for i, (role_id, key, description, permissions) in enumerate(roles):
-            self.table.setItem(i, 0, QTableWidgetItem(key))
-            self.table.setItem(i, 1, QTableWidgetItem(description or ""))
-            self.table.setItem(i, 2, QTableWidgetItem(permissions or ""))
-            
-            # Add action buttons
-            actions = QWidget()
-            actions_layout = QHBoxLayout(actions)
-            actions_layout.setContentsMargins(0, 0, 0, 0)
-            
-            edit_btn = QPushButton("Edit")
-            edit_btn.clicked.connect(lambda checked, r=role_id: self.edit_role(r))
-            
-            delete_btn = QPushButton("Delete")
-            delete_btn.clicked.connect(lambda checked, r=role_id: self.delete_role(r))
-            
-            actions_layout.addWidget(edit_btn)
-            actions_layout.addWidget(delete_btn)
-            self.table.setCellWidget(i, 3, actions)
+    def add_role(self):
+        AddRoleDialog(self).exec_()
 
     def edit_role(self, role_id):
-        dialog = EditRoleDialog(role_id, self)
-        if dialog.exec_() == QDialog.Accepted:
-            self.load_roles()
+        EditRoleDialog(role_id, self).exec_()
 
-    def delete_role(self, role_id):
-        conn = sqlite3.connect(os.getenv("DB_PATH"))
-        cursor = conn.cursor()
-        
-        # Get role name
-        cursor.execute("SELECT name FROM roles WHERE id = ?", (role_id,))
-        role_name = cursor.fetchone()[0]
-        
+    def delete_role(self, role_id, role_name):
         # Check if role has users
-        cursor.execute("SELECT COUNT(*) FROM users WHERE role_id = ?", (role_id,))
-        user_count = cursor.fetchone()[0]
-        
+        executor.query(USERS_WITH_ROLE, (role_id,),
+                       on_done=lambda rows: self.confirm_delete(role_id, role_name, rows[0][0]),
+                       on_error=self.on_check_error, owner=self)
+
+    def on_check_error(self, message):
+        QMessageBox.warning(self, "Error", f"Failed to check role: {message}")
+
+    def confirm_delete(self, role_id, role_name, user_count):
         if user_count > 0:
             QMessageBox.warning(self, "Cannot Delete Role", 
                               f"Role '{role_name}' is assigned to {user_count} users. "
@@ -345,20 +520,29 @@ class RolesTab(QWidget):
                                    QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
         
         if reply == QMessageBox.Yes:
+            conn = db.get_connection()
+            cursor = conn.cursor()
             try:
                 # Delete role permissions first
+                cursor.execute("SELECT permission_id FROM role_permissions WHERE role_id = ?",
+                               (role_id,))
+                granted = [row[0] for row in cursor.fetchall()]
                 cursor.execute("DELETE FROM role_permissions WHERE role_id = ?", (role_id,))
                 # Then delete the role
-                cursor.execute("DELETE FROM roles WHERE id = ?", (role_id,))
+                cursor.execute("DELETE FROM roles WHERE role_id = ?", (role_id,))
                 conn.commit()
-                self.load_roles()
+                permissions.refresh()
+                changes.removed.emit('roles', role_id)
+                for perm_id in granted:  # their "Assigned To" lists lose this role
+                    changes.changed.emit('permissions', perm_id)
             except sqlite3.Error as e:
                 QMessageBox.warning(self, "Error", f"Failed to delete role: {str(e)}")
             finally:
-                conn.close()
+                if conn.in_transaction:
+                    conn.rollback()
 
 
-class AddRoleDialog(QDialog):
+class AddRoleDialog(FormDialog):
     def __init__(self, parent=None):
         super().__init__(parent)
         self.setWindowTitle("Add Role")
@@ -375,19 +559,11 @@ class AddRoleDialog(QDialog):
         
         # Permissions group
         permissions_group = QWidget()
-        permissions_layout = QVBoxLayout(permissions_group)
-        permissions_layout.addWidget(QLabel("Permissions:"))
-        
-        # Load permissions checkboxes
+        self.permissions_layout = QVBoxLayout(permissions_group)
+        self.permissions_layout.addWidget(QLabel("Permissions:"))
+        self.loading_label = QLabel("Loading...")
+        self.permissions_layout.addWidget(self.loading_label)
         self.permission_boxes = {}
-        conn = sqlite3.connect(os.getenv("DB_PATH"))
-        cursor = conn.cursor()
-        cursor.execute("SELECT id, name, description FROM permissions")
-        for perm_id, name, description in cursor.fetchall():
-            checkbox = QCheckBox(f"{name} - {description}")
-            self.permission_boxes[perm_id] = checkbox
-            permissions_layout.addWidget(checkbox)
-        conn.close()
         
         # Add layouts to main layout
         self.layout.addLayout(form_layout)
@@ -395,14 +571,22 @@ class AddRoleDialog(QDialog):
         
         # Buttons
         buttons = QHBoxLayout()
-        save_btn = QPushButton("Save")
-        save_btn.clicked.connect(self.save_role)
+        self.save_btn = QPushButton("Save")
+        self.save_btn.clicked.connect(self.save_role)
         cancel_btn = QPushButton("Cancel")
         cancel_btn.clicked.connect(self.reject)
         
-        buttons.addWidget(save_btn)
+        buttons.addWidget(self.save_btn)
         buttons.addWidget(cancel_btn)
         self.layout.addLayout(buttons)
+        self.load(fetch_all, PERMISSION_CHOICES, on_done=self.show_permissions)
+
+    def show_permissions(self, choices):
+        self.loading_label.hide()
+        for perm_id, key in choices:
+            checkbox = QCheckBox(key)
+            self.permission_boxes[perm_id] = checkbox
+            self.permissions_layout.addWidget(checkbox)
 
     def save_role(self):
         name = self.name_input.text()
@@ -412,7 +596,7 @@ class AddRoleDialog(QDialog):
             QMessageBox.warning(self, "Error", "Role name is required")
             return
         
-        conn = sqlite3.connect(os.getenv("DB_PATH"))
+        conn = db.get_connection()
         cursor = conn.cursor()
         
         try:
@@ -424,14 +608,18 @@ class AddRoleDialog(QDialog):
             role_id = cursor.lastrowid
             
             # Insert permissions
-            for perm_id, checkbox in self.permission_boxes.items():
-                if checkbox.isChecked():
-                    cursor.execute(
-                        "INSERT INTO role_permissions (role_id, permission_id) VALUES (?, ?)",
-                        (role_id, perm_id)
-                    )
+            granted = [perm_id for perm_id, checkbox in self.permission_boxes.items()
+                       if checkbox.isChecked()]
+            cursor.executemany(
+                "INSERT INTO role_permissions (role_id, permission_id) VALUES (?, ?)",
+                [(role_id, perm_id) for perm_id in granted]
+            )
             
             conn.commit()
+            permissions.refresh()
+            changes.changed.emit('roles', role_id)
+            for perm_id in granted:
+                changes.changed.emit('permissions', perm_id)
             self.accept()
             
         except sqlite3.IntegrityError:
@@ -439,10 +627,11 @@ class AddRoleDialog(QDialog):
         except sqlite3.Error as e:
             QMessageBox.warning(self, "Error", f"Failed to create role: {str(e)}")
         finally:
-            conn.close()
+            if conn.in_transaction:
+                conn.rollback()
 
 
-class EditRoleDialog(QDialog):
+class EditRoleDialog(FormDialog):
     def __init__(self, role_id, parent=None):
         super().__init__(parent)
         self.role_id = role_id
@@ -460,34 +649,11 @@ class EditRoleDialog(QDialog):
         
         # Permissions group
         permissions_group = QWidget()
-        permissions_layout = QVBoxLayout(permissions_group)
-        permissions_layout.addWidget(QLabel("Permissions:"))
-        
-        # Load permissions checkboxes
+        self.permissions_layout = QVBoxLayout(permissions_group)
+        self.permissions_layout.addWidget(QLabel("Permissions:"))
+        self.loading_label = QLabel("Loading...")
+        self.permissions_layout.addWidget(self.loading_label)
         self.permission_boxes = {}
-        conn = sqlite3.connect(os.getenv("DB_PATH"))
-        cursor = conn.cursor()
-        
-        # Load current role data
-        cursor.execute("SELECT name, description FROM roles WHERE id = ?", (role_id,))
-        role_name, role_description = cursor.fetchone()
-        self.name_input.setText(role_name)
-        self.description_input.setText(role_description or "")
-        
-        # Load permissions and check current ones
-        cursor.execute("SELECT id, name, description FROM permissions")
-        permissions = cursor.fetchall()
-        
-        cursor.execute("SELECT permission_id FROM role_permissions WHERE role_id = ?", (role_id,))
-        current_permissions = {row[0] for row in cursor.fetchall()}
-        
-        for perm_id, name, description in permissions:
-            checkbox = QCheckBox(f"{name} - {description}")
-            checkbox.setChecked(perm_id in current_permissions)
-            self.permission_boxes[perm_id] = checkbox
-            permissions_layout.addWidget(checkbox)
-            
-        conn.close()
         
         # Add layouts to main layout
         self.layout.addLayout(form_layout)
@@ -495,14 +661,28 @@ class EditRoleDialog(QDialog):
         
         # Buttons
         buttons = QHBoxLayout()
-        save_btn = QPushButton("Save")
-        save_btn.clicked.connect(self.save_changes)
+        self.save_btn = QPushButton("Save")
+        self.save_btn.clicked.connect(self.save_changes)
         cancel_btn = QPushButton("Cancel")
         cancel_btn.clicked.connect(self.reject)
         
-        buttons.addWidget(save_btn)
+        buttons.addWidget(self.save_btn)
         buttons.addWidget(cancel_btn)
         self.layout.addLayout(buttons)
+        self.load(fetch_role_form, role_id, on_done=self.show_role)
+
+    def show_role(self, form):
+        self.role_name, role_description, choices, self.current_permissions = form
+        self.name_input.setText(self.role_name)
+        self.description_input.setText(role_description or "")
+        
+        # Check the permissions the role holds
+        self.loading_label.hide()
+        for perm_id, key in choices:
+            checkbox = QCheckBox(key)
+            checkbox.setChecked(perm_id in self.current_permissions)
+            self.permission_boxes[perm_id] = checkbox
+            self.permissions_layout.addWidget(checkbox)
 
     def save_changes(self):
         name = self.name_input.text()
@@ -512,26 +692,39 @@ class EditRoleDialog(QDialog):
             QMessageBox.warning(self, "Error", "Role name is required")
             return
         
-        conn = sqlite3.connect(os.getenv("DB_PATH"))
+        conn = db.get_connection()
         cursor = conn.cursor()
         
         try:
             # Update role
             cursor.execute(
-                "UPDATE roles SET name = ?, description = ? WHERE id = ?",
+                "UPDATE roles SET name = ?, description = ? WHERE role_id = ?",
                 (name, description, self.role_id)
             )
             
-            # Update permissions
-            cursor.execute("DELETE FROM role_permissions WHERE role_id = ?", (self.role_id,))
-            for perm_id, checkbox in self.permission_boxes.items():
-                if checkbox.isChecked():
-                    cursor.execute(
-                        "INSERT INTO role_permissions (role_id, permission_id) VALUES (?, ?)",
-                        (self.role_id, perm_id)
-                    )
+            # Update only the permissions that were toggled
+            granted = {perm_id for perm_id, checkbox in self.permission_boxes.items()
+                       if checkbox.isChecked()}
+            cursor.executemany(
+                "DELETE FROM role_permissions WHERE role_id = ? AND permission_id = ?",
+                [(self.role_id, perm_id) for perm_id in self.current_permissions - granted]
+            )
+            cursor.executemany(
+                "INSERT INTO role_permissions (role_id, permission_id) VALUES (?, ?)",
+                [(self.role_id, perm_id) for perm_id in granted - self.current_permissions]
+            )
             
             conn.commit()
+            permissions.refresh()
+            
+            # A rename shows on every permission the role holds, otherwise only toggled ones
+            if name != self.role_name:
+                affected = granted | self.current_permissions
+            else:
+                affected = granted ^ self.current_permissions
+            changes.changed.emit('roles', self.role_id)
+            for perm_id in affected:
+                changes.changed.emit('permissions', perm_id)
             self.accept()
             
         except sqlite3.IntegrityError:
@@ -539,7 +732,35 @@ class EditRoleDialog(QDialog):
         except sqlite3.Error as e:
             QMessageBox.warning(self, "Error", f"Failed to update role: {str(e)}")
         finally:
-            conn.close()
+            if conn.in_transaction:
+                conn.rollback()
+
+class PermissionsModel(QueryTableModel):
+    headers = ["Name", "Assigned To", "Actions"]
+    table = 'permissions'
+    key_column = 'p.permission_id'
+    sort_keys = {0: [('p.permission_id', 0)]}
+
+    def query(self, where, params, order_by, limit):
+        return f'''
+            SELECT 
+                p.permission_id,
+                p.key,
+                GROUP_CONCAT(r.name) as roles
+            FROM permissions p
+            LEFT JOIN role_permissions rp ON p.permission_id = rp.permission_id
+            LEFT JOIN roles r ON rp.role_id = r.role_id
+            WHERE {where}
+            GROUP BY p.permission_id
+            ORDER BY {order_by}
+            LIMIT ?
+        ''', params + [limit]
+
+    def cell(self, row, column):
+        if column < 2:
+            return row[column + 1] or ""
+        return None
+
 
 class PermissionsTab(QWidget):
     def __init__(self):
@@ -554,74 +775,37 @@ class PermissionsTab(QWidget):
         toolbar.addStretch()
         
         # Table
-        self.table = QTableWidget()
-        self.table.setColumnCount(4)
-        self.table.setHorizontalHeaderLabels(["Name", "Description", "Assigned To", "Actions"])
+        self.model = PermissionsModel(self)
+        self.table = QueryTableView(self.model, 2, ["Edit", "Delete"])
+        self.table.action_clicked.connect(self.on_action)
+        changes.watch(self.model)
         
         layout.addLayout(toolbar)
         layout.addWidget(self.table)
-        
-        self.load_permissions()
 
-    def load_permissions(self):
-        conn = sqlite3.connect(os.getenv("DB_PATH"))
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT 
-                p.permission_id,
-                p.key,
-                GROUP_CONCAT(r.name) as roles
-            FROM permissions p
-            LEFT JOIN role_permissions rp ON p.permission_id = rp.permission_id
-            LEFT JOIN roles r ON rp.role_id = r.role_id
-            GROUP BY p.permission_id
-        ''')
-        permissions = cursor.fetchall()
-        conn.close()
-        
-        self.table.setRowCount(len(permissions))
-        for i, (perm_id, key, roles) in enumerate(permissions):
-            self.table.setItem(i, 0, QTableWidgetItem(key))
-            self.table.setItem(i, 1, QTableWidgetItem(roles or ""))
-            
-            # Add action buttons
-            actions = QWidget()
-            actions_layout = QHBoxLayout(actions)
-            actions_layout.setContentsMargins(0, 0, 0, 0)
-            
-            edit_btn = QPushButton("Edit")
-            edit_btn.clicked.connect(lambda checked, p=perm_id: self.edit_permission(p))
-            
-            delete_btn = QPushButton("Delete")
-            delete_btn.clicked.connect(lambda checked, p=perm_id: self.delete_permission(p))
-            
-            actions_layout.addWidget(edit_btn)
-            actions_layout.addWidget(delete_btn)
-            self.table.setCellWidget(i, 3, actions)
+    def on_action(self, action, row):
+        perm_id, perm_name = self.model.row_at(row)[:2]
+        if action == "Edit":
+            self.edit_permission(perm_id)
+        else:
+            self.delete_permission(perm_id, perm_name)
 
     def add_permission(self):
-        dialog = AddPermissionDialog(self)
-        if dialog.exec_() == QDialog.Accepted:   
-            self.load_permissions()
+        AddPermissionDialog(self).exec_()
 
     def edit_permission(self, perm_id):
-        dialog = EditPermissionDialog(perm_id, self)
-        if dialog.exec_() == QDialog.Accepted:
-            self.load_permissions()
+        EditPermissionDialog(perm_id, self).exec_()
 
-    def delete_permission(self, perm_id):
-        conn = sqlite3.connect(os.getenv("DB_PATH"))
-        cursor = conn.cursor()
-        
-        # Get permission name
-        cursor.execute("SELECT name FROM permissions WHERE id = ?", (perm_id,))
-        perm_name = cursor.fetchone()[0]
-        
+    def delete_permission(self, perm_id, perm_name):
         # Check if permission is assigned to any roles
-        cursor.execute("SELECT COUNT(*) FROM role_permissions WHERE permission_id = ?", (perm_id,))
-        role_count = cursor.fetchone()[0]
-        
+        executor.query(ROLES_WITH_PERMISSION, (perm_id,),
+                       on_done=lambda rows: self.confirm_delete(perm_id, perm_name, rows[0][0]),
+                       on_error=self.on_check_error, owner=self)
+
+    def on_check_error(self, message):
+        QMessageBox.warning(self, "Error", f"Failed to check permission: {message}")
+
+    def confirm_delete(self, perm_id, perm_name, role_count):
         if role_count > 0:
             QMessageBox.warning(self, "Cannot Delete Permission", 
                               f"Permission '{perm_name}' is assigned to {role_count} roles. "
@@ -633,35 +817,132 @@ class PermissionsTab(QWidget):
                                    QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
         
         if reply == QMessageBox.Yes:
+            conn = db.get_connection()
+            cursor = conn.cursor()
             try:
-                cursor.execute("DELETE FROM permissions WHERE id = ?", (perm_id,))
+                cursor.execute("DELETE FROM permissions WHERE permission_id = ?", (perm_id,))
                 conn.commit()
-                self.load_permissions()
+                permissions.refresh()
+                changes.removed.emit('permissions', perm_id)
             except sqlite3.Error as e:
                 QMessageBox.warning(self, "Error", f"Failed to delete permission: {str(e)}")
             finally:
-                conn.close()
+                if conn.in_transaction:
+                    conn.rollback()
 
-class ModulesTab(QWidget):
-    def __init__(self):
-        super().__init__()
-        layout = QVBoxLayout(self)
+class AddPermissionDialog(QDialog):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Add Permission")
+        self.layout = QFormLayout(self)
         
-        # Table
-        self.table = QTableWidget()
-        self.table.setColumnCount(4)
-        self.table.setHorizontalHeaderLabels(["Name", "Status", "Required Permission", "Actions"])
+        self.key_input = QLineEdit()
+        self.key_input.setPlaceholderText("e.g. reports_export")
+        self.layout.addRow("Name:", self.key_input)
         
-        layout.addWidget(self.table)
+        # Buttons
+        button_box = QHBoxLayout()
+        save_btn = QPushButton("Save")
+        save_btn.clicked.connect(self.save_permission)
+        cancel_btn = QPushButton("Cancel")
+        cancel_btn.clicked.connect(self.reject)
         
-        self.load_modules()
+        button_box.addWidget(save_btn)
+        button_box.addWidget(cancel_btn)
+        self.layout.addRow(button_box)
 
-    def load_modules(self):
-        conn = sqlite3.connect(os.getenv("DB_PATH"))
+    def save_permission(self):
+        key = self.key_input.text().strip()
+        if not key:
+            QMessageBox.warning(self, "Error", "Permission name is required")
+            return
+        
+        conn = db.get_connection()
         cursor = conn.cursor()
+        try:
+            cursor.execute("INSERT INTO permissions (key) VALUES (?)", (key,))
+            conn.commit()
+            permissions.refresh()
+            changes.changed.emit('permissions', cursor.lastrowid)
+            self.accept()
+        except sqlite3.IntegrityError:
+            QMessageBox.warning(self, "Error", "Permission already exists")
+        except sqlite3.Error as e:
+            QMessageBox.warning(self, "Error", f"Failed to create permission: {str(e)}")
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+
+
+class EditPermissionDialog(FormDialog):
+    def __init__(self, perm_id, parent=None):
+        super().__init__(parent)
+        self.perm_id = perm_id
+        self.setWindowTitle("Edit Permission")
+        self.layout = QFormLayout(self)
         
+        self.key_input = QLineEdit()
+        self.key_input.setPlaceholderText("Loading...")
+        self.layout.addRow("Name:", self.key_input)
+        
+        # Buttons
+        button_box = QHBoxLayout()
+        self.save_btn = QPushButton("Save")
+        self.save_btn.clicked.connect(self.save_changes)
+        cancel_btn = QPushButton("Cancel")
+        cancel_btn.clicked.connect(self.reject)
+        
+        button_box.addWidget(self.save_btn)
+        button_box.addWidget(cancel_btn)
+        self.layout.addRow(button_box)
+        self.load(fetch_permission_key, perm_id, on_done=self.key_input.setText)
+
+    def save_changes(self):
+        key = self.key_input.text().strip()
+        if not key:
+            QMessageBox.warning(self, "Error", "Permission name is required")
+            return
+        
+        conn = db.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("UPDATE permissions SET key = ? WHERE permission_id = ?",
+                           (key, self.perm_id))
+            conn.commit()
+            permissions.refresh()
+            
+            # Roles list the key and modules show it as their requirement
+            changes.changed.emit('permissions', self.perm_id)
+            cursor.execute("SELECT role_id FROM role_permissions WHERE permission_id = ?",
+                           (self.perm_id,))
+            for (role_id,) in cursor.fetchall():
+                changes.changed.emit('roles', role_id)
+            cursor.execute("SELECT module_id FROM modules WHERE required_permission_id = ?",
+                           (self.perm_id,))
+            for (module_id,) in cursor.fetchall():
+                changes.changed.emit('modules', module_id)
+            self.accept()
+        except sqlite3.IntegrityError:
+            QMessageBox.warning(self, "Error", "Permission already exists")
+        except sqlite3.Error as e:
+            QMessageBox.warning(self, "Error", f"Failed to update permission: {str(e)}")
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+
+
+class ModulesModel(QueryTableModel):
+    headers = ["Name", "Status", "Required Permission", "Actions"]
+
+    table = 'modules'
+    key_column = 'm.module_id'
+    sort_keys = {0: [('m.module_id', 0)]}
+
+    toggled = pyqtSignal(int, bool)  # module_id, is_active
+
+    def query(self, where, params, order_by, limit):
         # Get modules with their required permissions
-        cursor.execute('''
+        return f'''
             SELECT 
                 m.module_id,
                 m.name,
@@ -669,68 +950,77 @@ class ModulesTab(QWidget):
                 p.key as permission_key
             FROM modules m
             LEFT JOIN permissions p ON m.required_permission_id = p.permission_id
-        ''')
-        modules = cursor.fetchall()
-        conn.close()
-        
-        self.table.setRowCount(len(modules))
-        for i, (module_id, name, is_active, permission_key) in enumerate(modules):
-            # Module name
-            self.table.setItem(i, 0, QTableWidgetItem(name))
-            
-            # Status
-            status_widget = QWidget()
-            status_layout = QHBoxLayout(status_widget)
-            status_checkbox = QCheckBox()
-            status_checkbox.setChecked(bool(is_active))
-            status_checkbox.stateChanged.connect(lambda state, mid=module_id: self.toggle_module(mid, state))
-            status_layout.addWidget(status_checkbox)
-            status_layout.setAlignment(Qt.AlignCenter)
-            status_layout.setContentsMargins(0, 0, 0, 0)
-            self.table.setCellWidget(i, 1, status_widget)
-            
-            # Required permission
-            self.table.setItem(i, 2, QTableWidgetItem(permission_key or "None"))
-            
-            # Actions
-            actions = QWidget()
-            actions_layout = QHBoxLayout(actions)
-            actions_layout.setContentsMargins(0, 0, 0, 0)
-            
-            edit_btn = QPushButton("Edit")
-            edit_btn.clicked.connect(lambda checked, m=module_id: self.edit_module(m))
-            actions_layout.addWidget(edit_btn)
-            
-            self.table.setCellWidget(i, 3, actions)
-            
-            # Make name and permission cells read-only
-            for col in [0, 2]:
-                item = self.table.item(i, col)
-                if item:
-                    item.setFlags(item.flags() & ~Qt.ItemIsEditable)
+            WHERE {where}
+            ORDER BY {order_by}
+            LIMIT ?
+        ''', params + [limit]
+
+    def cell(self, row, column):
+        if column == 0:
+            return row[1]
+        if column == 2:
+            return row[3] or "None"
+        return None
+
+    def flags(self, index):
+        flags = super().flags(index)
+        if index.column() == 1:  # Status is a checkbox painted by the view
+            flags |= Qt.ItemIsUserCheckable
+        return flags
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role == Qt.CheckStateRole and index.column() == 1:
+            return Qt.Checked if self.rows[index.row()][2] else Qt.Unchecked
+        return super().data(index, role)
+
+    def setData(self, index, value, role=Qt.EditRole):
+        if role != Qt.CheckStateRole or index.column() != 1:
+            return False
+        module_id, name, _, permission_key = self.rows[index.row()]
+        is_active = value == Qt.Checked
+        self.set_row(index.row(), (module_id, name, is_active, permission_key))
+        self.toggled.emit(module_id, is_active)
+        return True
+
+
+class ModulesTab(QWidget):
+    def __init__(self):
+        super().__init__()
+        layout = QVBoxLayout(self)
+        
+        # Table
+        self.model = ModulesModel(self)
+        self.model.toggled.connect(self.toggle_module)
+        self.table = QueryTableView(self.model, 3, ["Edit"])
+        self.table.action_clicked.connect(
+            lambda action, row: self.edit_module(self.model.row_at(row)[0]))
+        changes.watch(self.model)
+        
+        layout.addWidget(self.table)
 
     def toggle_module(self, module_id, state):
         """Toggle module active status"""
-        conn = sqlite3.connect(os.getenv("DB_PATH"))
+        conn = db.get_connection()
         cursor = conn.cursor()
         try:
             cursor.execute(
-                "UPDATE modules SET is_active = ? WHERE id = ?",
+                "UPDATE modules SET is_active = ? WHERE module_id = ?",
                 (bool(state), module_id)
             )
             conn.commit()
+            permissions.refresh()
         except sqlite3.Error as e:
             QMessageBox.warning(self, "Error", f"Failed to update module status: {str(e)}")
+            self.model.upsert(module_id)  # Show the stored state again
         finally:
-            conn.close()
+            if conn.in_transaction:
+                conn.rollback()
 
     def edit_module(self, module_id):
-        dialog = EditModuleDialog(module_id, self)
-        if dialog.exec_() == QDialog.Accepted:
-            self.load_modules()
+        EditModuleDialog(module_id, self).exec_()
 
 
-class EditModuleDialog(QDialog):
+class EditModuleDialog(FormDialog):
     def __init__(self, module_id, parent=None):
         super().__init__(parent)
         self.module_id = module_id
@@ -743,30 +1033,7 @@ class EditModuleDialog(QDialog):
         # Required permission combo
         self.permission_combo = QComboBox()
         self.permission_combo.addItem("None", None)
-        
-        # Load permissions
-        conn = sqlite3.connect(os.getenv("DB_PATH"))
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT id, name FROM permissions")
-        for perm_id, name in cursor.fetchall():
-            self.permission_combo.addItem(name, perm_id)
-        
-        # Load current module data
-        cursor.execute("""
-            SELECT name, required_permission_id 
-            FROM modules 
-            WHERE id = ?
-        """, (module_id,))
-        module_name, current_permission_id = cursor.fetchone()
-        conn.close()
-        
-        # Set current values
-        self.name_label = QLabel(module_name)
-        if current_permission_id:
-            index = self.permission_combo.findData(current_permission_id)
-            if index >= 0:
-                self.permission_combo.setCurrentIndex(index)
+        self.name_label = QLabel("Loading...")
         
         form_layout.addRow("Name:", self.name_label)
         form_layout.addRow("Required Permission:", self.permission_combo)
@@ -775,19 +1042,32 @@ class EditModuleDialog(QDialog):
         
         # Buttons
         buttons = QHBoxLayout()
-        save_btn = QPushButton("Save")
-        save_btn.clicked.connect(self.save_changes)
+        self.save_btn = QPushButton("Save")
+        self.save_btn.clicked.connect(self.save_changes)
         cancel_btn = QPushButton("Cancel")
         cancel_btn.clicked.connect(self.reject)
         
-        buttons.addWidget(save_btn)
+        buttons.addWidget(self.save_btn)
         buttons.addWidget(cancel_btn)
         self.layout.addLayout(buttons)
+        self.load(fetch_module_form, module_id, on_done=self.show_module)
+
+    def show_module(self, form):
+        module_name, current_permission_id, choices = form
+        self.name_label.setText(module_name)
+        for perm_id, key in choices:
+            self.permission_combo.addItem(key, perm_id)
+        
+        # Set current values
+        if current_permission_id:
+            index = self.permission_combo.findData(current_permission_id)
+            if index >= 0:
+                self.permission_combo.setCurrentIndex(index)
 
     def save_changes(self):
         permission_id = self.permission_combo.currentData()
         
-        conn = sqlite3.connect(os.getenv("DB_PATH"))
+        conn = db.get_connection()
         cursor = conn.cursor()
         
         try:
@@ -796,8 +1076,11 @@ class EditModuleDialog(QDialog):
                 (permission_id, self.module_id)
             )
             conn.commit()
+            permissions.refresh()
+            changes.changed.emit('modules', self.module_id)
             self.accept()
         except sqlite3.Error as e:
             QMessageBox.warning(self, "Error", f"Failed to update module: {str(e)}")
         finally:
-            conn.close()
+            if conn.in_transaction:
+                conn.rollback()
@@ -4,7 +4,8 @@ from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QPushButton,
 from PyQt5.QtCore import Qt
 import sqlite3
 import bcrypt
-import os
+
+import db
 
 class UserManagementPage(QWidget):
     def __init__(self):
@@ -29,7 +30,7 @@ class UserManagementPage(QWidget):
         self.load_users()
 
     def load_users(self):
-        conn = sqlite3.connect(os.getenv("DB_PATH"))
+        conn = db.get_connection()
         cursor = conn.cursor()
         cursor.execute('''
             SELECT users.username, roles.name, users.is_active, users.id 
@@ -37,7 +38,6 @@ class UserManagementPage(QWidget):
             JOIN roles ON users.role_id = roles.id
         ''')
         users = cursor.fetchall()
-        conn.close()
 
         self.user_table.setRowCount(len(users))
         for i, user in enumerate(users):
@@ -88,11 +88,10 @@ class AddUserDialog(QDialog):
         self.layout.addRow(buttons)
 
     def load_roles(self):
-        conn = sqlite3.connect(os.getenv("DB_PATH"))
+        conn = db.get_connection()
         cursor = conn.cursor()
         cursor.execute("SELECT id, name FROM roles")
         roles = cursor.fetchall()
-        conn.close()
         
         for role_id, role_name in roles:
             self.role_combo.addItem(role_name, role_id)
@@ -109,7 +108,7 @@ class AddUserDialog(QDialog):
         # Hash password
         password_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
         
-        conn = sqlite3.connect(os.getenv("DB_PATH"))
+        conn = db.get_connection()
         cursor = conn.cursor()
         try:
             cursor.execute(
@@ -121,4 +120,5 @@ class AddUserDialog(QDialog):
         except sqlite3.IntegrityError:
             QMessageBox.warning(self, "Error", "Username already exists")
         finally:
-            conn.close()
+            if conn.in_transaction:
+                conn.rollback()
@@ -0,0 +1,157 @@
+import time
+import uuid
+
+import db
+from services.sales_summary import current_shift, register_id
+
+
+def to_cents(amount):
+    return int(round(amount * 100))
+
+
+def from_cents(cents):
+    return cents / 100
+
+
+class CartLine:
+    __slots__ = ('product_id', 'name', 'unit_price', 'quantity', 'discount')
+
+    def __init__(self, product_id, name, unit_price, quantity, discount=0):
+        self.product_id = product_id
+        self.name = name
+        self.unit_price = unit_price    # cents
+        self.quantity = quantity
+        self.discount = discount        # cents
+
+    @property
+    def total(self):
+        return self.unit_price * self.quantity - self.discount
+
+
+class Cart:
+    """Basket held in memory until checkout; every change updates the totals in O(1)
+
+    Amounts are kept in integer cents so running totals never drift.
+    """
+
+    def __init__(self):
+        self.lines = {}             # product_id -> CartLine, in insertion order
+        self.subtotal = 0
+        self.line_discounts = 0
+        self.discount = 0           # whole-basket discount
+
+    @property
+    def total(self):
+        return self.subtotal - self.line_discounts - self.discount
+
+    @property
+    def item_count(self):
+        return sum(line.quantity for line in self.lines.values())
+
+    def add(self, product, quantity=1):
+        """Add a catalog product, merging with an existing line"""
+        line = self.lines.get(product.product_id)
+        if line is None:
+            line = CartLine(product.product_id, product.name, to_cents(product.price), 0)
+            self.lines[product.product_id] = line
+        line.quantity += quantity
+        self.subtotal += line.unit_price * quantity
+        return line
+
+    def set_quantity(self, product_id, quantity):
+        if quantity <= 0:
+            self.remove(product_id)
+            return None
+        line = self.lines[product_id]
+        self.subtotal += line.unit_price * (quantity - line.quantity)
+        line.quantity = quantity
+        return line
+
+    def set_line_discount(self, product_id, discount):
+        line = self.lines[product_id]
+        discount = to_cents(discount)
+        self.line_discounts += discount - line.discount
+        line.discount = discount
+        return line
+
+    def set_discount(self, discount):
+        self.discount = to_cents(discount)
+
+    def remove(self, product_id):
+        line = self.lines.pop(product_id, None)
+        if line is not None:
+            self.subtotal -= line.unit_price * line.quantity
+            self.line_discounts -= line.discount
+        return line
+
+    def clear(self):
+        self.lines.clear()
+        self.subtotal = 0
+        self.line_discounts = 0
+        self.discount = 0
+
+    def to_sale(self, username=None):
+        """Snapshot the basket as a plain, JSON-serializable sale record"""
+        if not self.lines:
+            raise ValueError("Cart is empty")
+
+        return {
+            'sale_uuid': uuid.uuid4().hex,
+            'username': username,
+            'register_id': register_id(),
+            'shift': current_shift(),
+            'created_at': int(time.time()),
+            'subtotal': from_cents(self.subtotal),
+            'discount': from_cents(self.line_discounts + self.discount),
+            'total': from_cents(self.total),
+            'lines': [
+                [line.product_id, line.quantity, from_cents(line.unit_price),
+                 from_cents(line.discount), from_cents(line.total)]
+                for line in self.lines.values()
+            ],
+        }
+
+    def checkout(self, username=None):
+        """Record the basket as one sale header plus its lines in a single transaction"""
+        sale = self.to_sale(username)
+        conn = db.get_connection()
+        with conn:
+            sale_id = record_sale(conn, sale)
+        self.clear()
+        return sale_id
+
+
+def record_sale(conn, sale, apply_stock=True):
+    """Insert a sale record from Cart.to_sale() inside the caller's transaction
+
+    Idempotent on sale_uuid: a sale that is already stored is skipped and
+    None is returned, otherwise the new sale_id. The username is kept as
+    sent; user_id is set only where this database has that user. With
+    apply_stock, stock of the tracked products is decremented in the same
+    transaction.
+    """
+    # Only a duplicate sale_uuid is skipped; any other constraint violation raises
+    cursor = conn.execute('''
+        INSERT INTO sales
+            (sale_uuid, username, user_id, register_id, shift, subtotal, discount, total,
+             created_at)
+        VALUES (?, ?, (SELECT user_id FROM users WHERE username = ?), ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(sale_uuid) DO NOTHING
+    ''', (sale['sale_uuid'], sale['username'], sale['username'], sale['register_id'],
+          sale['shift'], sale['subtotal'], sale['discount'], sale['total'], sale['created_at']))
+    if not cursor.rowcount:
+        return None
+
+    sale_id = cursor.lastrowid
+    conn.executemany('''
+        INSERT INTO sale_lines
+            (sale_id, line_no, product_id, quantity, unit_price, discount, total)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', [(sale_id, line_no, *line) for line_no, line in enumerate(sale['lines'], start=1)])
+    if apply_stock:
+        # Relative update, so concurrent registers never overwrite each other's counts
+        conn.executemany('''
+            UPDATE inventory SET on_hand = on_hand - ?, updated_at = strftime('%s', 'now')
+            WHERE product_id = ?
+        ''', [(quantity, product_id) for product_id, quantity, *_ in sale['lines']])
+    return sale_id
@@ -0,0 +1,159 @@
+from collections import namedtuple
+
+import db
+from services import changelog
+
+Product = namedtuple('Product', ['product_id', 'name', 'price', 'sku', 'barcode'])
+
+# Products logged after a changelog seq, joined to their current row (NULLs once deleted)
+PRODUCT_CHANGES = '''
+    SELECT c.seq, c.row_key, p.product_id, p.name, p.price, p.sku, p.barcode
+    FROM changelog c
+    LEFT JOIN products p ON p.product_id = c.row_key
+    WHERE c.table_name = 'products' AND c.seq > ?
+    ORDER BY c.seq
+'''
+
+
+class ProductCatalog:
+    """In-memory copy of the products table indexed for till lookups
+
+    Kept current from the change log: high_water is the last changelog seq
+    applied, and refreshes read only the products logged after it.
+    """
+
+    def __init__(self):
+        self._by_id = {}
+        self._by_code = {}      # barcode / SKU -> product_id
+        self._high_water = None
+        self.loaded = False
+
+    def load(self):
+        """Load the full catalog once"""
+        self.apply_load(self.fetch_all())
+
+    def fetch_all(self):
+        """Read every product and the seq it is current to; safe to run on a query thread"""
+        conn = db.get_connection()
+        # Read the seq first: a change landing in between is in the rows and replayed, harmlessly
+        seq = changelog.latest_seq(conn)
+        rows = conn.execute('''
+            SELECT product_id, name, price, sku, barcode
+            FROM products
+        ''').fetchall()
+        return seq, rows
+
+    def apply_load(self, snapshot):
+        """Replace the cache with the (seq, rows) from fetch_all()"""
+        seq, rows = snapshot
+        self._by_id.clear()
+        self._by_code.clear()
+        for row in rows:
+            product = Product(*row)
+            self._by_id[product.product_id] = product
+            self._index_codes(product)
+
+        self._high_water = seq
+        self.loaded = True
+
+    def refresh(self):
+        """Pull only the products changed since the last load or refresh"""
+        if not self.loaded:
+            self.load()
+            return []
+        return self.apply_changes(self.fetch_changes(self._high_water))
+
+    def fetch_changes(self, since):
+        """Products logged after seq since, as (last seq, {product_id: Product or None if deleted})
+
+        Returns None if the log no longer reaches back to since. Safe to run
+        on a query thread; the rows are turned into Products here so the GUI
+        thread only swaps dictionary entries.
+        """
+        conn = db.get_connection()
+        if not changelog.is_complete(conn, since):
+            return None
+        latest = {}
+        seq = since
+        for seq, product_id, *row in conn.execute(PRODUCT_CHANGES, (since,)):
+            # The join reads the current row, so later entries for a product repeat it
+            latest[product_id] = None if row[0] is None else Product(*row)
+        return seq, latest
+
+    def apply_changes(self, changes):
+        """Merge the result of fetch_changes() and return the products added, changed or removed
+
+        None (the log was pruned past our seq) marks the cache unloaded, so
+        the next refresh reloads it.
+        """
+        if changes is None:
+            self.loaded = False
+            return []
+        seq, latest = changes
+        changed = []
+        for product_id, product in latest.items():
+            old = self._by_id.get(product_id)
+            if product is None:
+                if old is not None:
+                    self.discard(product_id)
+                    changed.append(old)
+            elif old != product:
+                self._store(product)
+                changed.append(product)
+        self._high_water = max(self._high_water, seq)
+        return changed
+
+    @property
+    def high_water(self):
+        """Last changelog seq applied, the starting point for the next fetch_changes()"""
+        return self._high_water
+
+    def discard(self, product_id):
+        """Drop a deleted product from the cache"""
+        product = self._by_id.pop(product_id, None)
+        if product is None:
+            return
+        self._unindex(product)
+
+    def get(self, product_id):
+        return self._by_id.get(product_id)
+
+    def price(self, product_id):
+        return self._by_id[product_id].price
+
+    def lookup_code(self, code):
+        """Find a product by barcode, SKU or numeric id"""
+        product_id = self._by_code.get(code)
+        if product_id is None and code.isdigit():
+            product_id = int(code)
+        return self._by_id.get(product_id)
+
+    def products(self):
+        """Iterate every cached product"""
+        return iter(self._by_id.values())
+
+    def __len__(self):
+        return len(self._by_id)
+
+    def _store(self, product):
+        old = self._by_id.get(product.product_id)
+        self._by_id[product.product_id] = product
+        # Price and name edits, the common batch, leave the code index alone
+        if old is None or (old.sku, old.barcode) != (product.sku, product.barcode):
+            if old is not None:
+                self._unindex(old)
+            self._index_codes(product)
+
+    def _unindex(self, product):
+        for code in (product.barcode, product.sku):
+            if code and self._by_code.get(code) == product.product_id:
+                del self._by_code[code]
+
+    def _index_codes(self, product):
+        for code in (product.barcode, product.sku):
+            if code:
+                self._by_code[code] = product.product_id
+
+
+# Shared instance used by the pages
+catalog = ProductCatalog()
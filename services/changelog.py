@@ -0,0 +1,64 @@
+"""Reader side of the changelog table (migration 12)
+
+Triggers append (seq, table, key, op) for every insert, update and delete
+on products, users, roles, permissions, role_permissions (keyed by role)
+and modules. A cache remembers the seq it last saw and asks for the
+changes after it instead of re-reading whole tables.
+"""
+import os
+from collections import namedtuple
+
+import db
+
+Change = namedtuple('Change', ['seq', 'table', 'key', 'op'])
+
+# Entries older than this many days are pruned at startup
+RETENTION_DAYS = int(os.getenv("CHANGELOG_DAYS", "30"))
+
+
+def latest_seq(conn=None):
+    """Sequence number of the newest change, 0 if there is none"""
+    conn = conn or db.get_connection()
+    return conn.execute("SELECT COALESCE(MAX(seq), 0) FROM changelog").fetchone()[0]
+
+
+def is_complete(conn, since):
+    """Whether every change after since is still in the log"""
+    first = conn.execute("SELECT MIN(seq) FROM changelog").fetchone()[0]
+    return first is None or since >= first - 1
+
+
+def changes_since(since, tables=None, limit=None, conn=None):
+    """Changes after seq since, oldest first, or None if some were pruned (reload instead)"""
+    conn = conn or db.get_connection()
+    if not is_complete(conn, since):
+        return None
+    return [Change(*row) for row in conn.execute(*changes_query(since, tables, limit))]
+
+
+def changes_query(since, tables=None, limit=None):
+    """The (sql, params) changes_since() runs"""
+    if tables is None:
+        sql, params = "SELECT seq, table_name, row_key, op FROM changelog WHERE seq > ?", [since]
+    else:
+        sql = f'''
+            SELECT seq, table_name, row_key, op FROM changelog
+            WHERE table_name IN ({', '.join('?' * len(tables))}) AND seq > ?
+        '''
+        params = [*tables, since]
+    sql += " ORDER BY seq"
+    if limit is not None:
+        sql += " LIMIT ?"
+        params.append(limit)
+    return sql, params
+
+
+def prune(conn=None, days=RETENTION_DAYS):
+    """Delete entries older than days; the newest is kept so readers can tell what is missing"""
+    conn = conn or db.get_connection()
+    with conn:
+        return conn.execute('''
+            DELETE FROM changelog
+            WHERE changed_at < strftime('%s', 'now') - ? * 86400
+              AND seq < (SELECT MAX(seq) FROM changelog)
+        ''', (days,)).rowcount
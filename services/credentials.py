@@ -0,0 +1,123 @@
+import os
+from collections import namedtuple
+
+import bcrypt
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+import db
+
+VerifiedUser = namedtuple('VerifiedUser', ['username', 'role', 'badge_code', 'pin_hash'])
+
+LOGIN_QUERY = '''
+    SELECT u.password_hash, u.user_id, r.name as role_name, u.badge_code, u.pin_hash
+    FROM users u
+    JOIN roles r ON u.role_id = r.role_id
+    WHERE u.username = ? AND u.is_active = 1
+'''
+
+
+def bcrypt_rounds():
+    """Work factor for new hashes, from BCRYPT_ROUNDS"""
+    return int(os.getenv("BCRYPT_ROUNDS", "12"))
+
+
+def hash_password(password):
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(bcrypt_rounds()))
+
+
+def check_password(password, stored_hash):
+    if isinstance(stored_hash, str):
+        stored_hash = stored_hash.encode('utf-8')
+    return bcrypt.checkpw(password.encode('utf-8'), stored_hash)
+
+
+def needs_rehash(stored_hash):
+    """True when a hash ($2b$<cost>$...) was made with a different work factor"""
+    if isinstance(stored_hash, str):
+        stored_hash = stored_hash.encode('utf-8')
+    return int(stored_hash.split(b'$')[2]) != bcrypt_rounds()
+
+
+def verify_credentials(username, password):
+    """Return a VerifiedUser if the password matches, else None
+
+    Runs on a worker thread. A matching hash made with an outdated work
+    factor is transparently replaced.
+    """
+    conn = db.get_connection()
+    user_data = conn.execute(LOGIN_QUERY, (username,)).fetchone()
+    if not user_data:
+        return None
+
+    stored_hash, user_id, role_name, badge_code, pin_hash = user_data
+    if not check_password(password, stored_hash):
+        return None
+
+    if needs_rehash(stored_hash):
+        with conn:
+            conn.execute("UPDATE users SET password_hash = ? WHERE user_id = ?",
+                         (hash_password(password), user_id))
+    return VerifiedUser(username, role_name, badge_code, pin_hash)
+
+
+class TaskSignals(QObject):
+    finished = pyqtSignal(object)
+    error = pyqtSignal(str)
+
+
+class Task(QRunnable):
+    """Run a function on the pool and report back through queued signals"""
+
+    def __init__(self, func, *args):
+        super().__init__()
+        self.func = func
+        self.args = args
+        self.signals = TaskSignals()
+
+    def run(self):
+        try:
+            result = self.func(*self.args)
+        except Exception as e:
+            self.signals.error.emit(str(e))
+        else:
+            self.signals.finished.emit(result)
+
+
+class CredentialService:
+    """Keeps bcrypt off the GUI thread"""
+
+    def __init__(self, max_threads=2):
+        self.max_threads = max_threads
+        self._pool = None
+        self._running = set()
+
+    def verify(self, username, password, on_done, on_error):
+        """Call on_done(VerifiedUser or None) once the check finishes"""
+        self.run(verify_credentials, username, password, on_done=on_done, on_error=on_error)
+
+    def hash(self, password, on_done, on_error):
+        """Call on_done(hash) with a hash at the configured work factor"""
+        self.run(hash_password, password, on_done=on_done, on_error=on_error)
+
+    def run(self, func, *args, on_done, on_error):
+        """Run any other bcrypt-bound function on the pool"""
+        self._start(Task(func, *args), on_done, on_error)
+
+    def _start(self, task, on_done, on_error):
+        if self._pool is None:
+            self._pool = QThreadPool()
+            self._pool.setMaxThreadCount(self.max_threads)
+
+        def finish(callback, value):
+            self._running.discard(task)
+            callback(value)
+
+        # Keep the task (and its signals) alive until it reports back
+        self._running.add(task)
+        task.signals.finished.connect(lambda result: finish(on_done, result))
+        task.signals.error.connect(lambda message: finish(on_error, message))
+        self._pool.start(task)
+
+
+# Shared instance used by the pages
+credentials = CredentialService()
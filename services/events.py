@@ -0,0 +1,22 @@
+from PyQt5.QtCore import QObject, pyqtSignal
+
+
+class ChangeNotifier(QObject):
+    """Announces which rows an edit touched so open views can patch just those rows
+
+    Whoever commits a change emits the table and primary key of every row
+    whose display changed. That includes rows in other tables whose
+    aggregates changed, e.g. the permissions granted to an edited role.
+    """
+
+    changed = pyqtSignal(str, object)  # table, key of an inserted or updated row
+    removed = pyqtSignal(str, object)  # table, key of a deleted row
+
+    def watch(self, model):
+        """Keep a QueryTableModel for model.table in step with the notifications"""
+        self.changed.connect(model.on_changed)
+        self.removed.connect(model.on_removed)
+
+
+# Shared instance used by the pages
+changes = ChangeNotifier()
@@ -0,0 +1,275 @@
+"""Latency histograms for UI handlers and SQL statements, plus a slow-query log
+
+Off unless INSTRUMENT=1 is set when the app starts. Disabled, @timed
+returns the handler unchanged and connections are plain sqlite3
+connections, so nothing is added to any call. Enabled, every statement
+run through db.connect() connections is timed and attributed to the
+@timed handler running on the same thread, and statements slower than
+SLOW_QUERY_MS are logged with their EXPLAIN QUERY PLAN.
+"""
+import functools
+import inspect
+import json
+import os
+import sqlite3
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+
+ENABLED = os.getenv("INSTRUMENT", "0") == "1"
+
+# Statements slower than this many milliseconds go to the slow-query log
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "50"))
+
+# Upper bounds in milliseconds of the histogram buckets; one more bucket catches the rest
+BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+# Slow queries kept for the diagnostics page
+SLOW_LOG_SIZE = 100
+
+# Statements are grouped by their text; very long ones are cut to this length
+SQL_KEY_LENGTH = 300
+
+
+class Histogram:
+    __slots__ = ('count', 'total', 'max', 'buckets')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * (len(BUCKETS_MS) + 1)
+
+    def add(self, ms):
+        self.count += 1
+        self.total += ms
+        self.max = max(self.max, ms)
+        self.buckets[bisect_left(BUCKETS_MS, ms)] += 1
+
+    def percentile(self, fraction):
+        """Upper bound of the bucket holding the given fraction of samples"""
+        wanted = fraction * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if n and seen >= wanted:
+                return BUCKETS_MS[i] if i < len(BUCKETS_MS) else self.max
+        return 0.0
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'total_ms': round(self.total, 3),
+            'mean_ms': round(self.total / self.count, 3) if self.count else 0.0,
+            'p50_ms': self.percentile(0.5),
+            'p95_ms': self.percentile(0.95),
+            'max_ms': round(self.max, 3),
+            'buckets': dict(zip([*map(str, BUCKETS_MS), 'inf'], self.buckets)),
+        }
+
+
+class Recorder:
+    """Collects timings from every thread; read it through snapshot() or dump()"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()     # .action: name of the @timed handler running
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.actions = {}       # handler name -> Histogram
+            self.action_queries = {}  # handler name -> statements run by its calls
+            self.queries = {}       # statement -> Histogram
+            self.slow = deque(maxlen=SLOW_LOG_SIZE)
+
+    def current_action(self):
+        return getattr(self._local, 'action', None)
+
+    def run_action(self, name, func, args, kwargs):
+        outer = self.current_action()
+        self._local.action = name
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            ms = (time.perf_counter() - start) * 1000
+            self._local.action = outer
+            with self._lock:
+                self.actions.setdefault(name, Histogram()).add(ms)
+
+    def record_query(self, sql, ms, plan=None, params=None):
+        action = self.current_action()
+        key = ' '.join(sql.split())[:SQL_KEY_LENGTH]
+        with self._lock:
+            self.queries.setdefault(key, Histogram()).add(ms)
+            if action is not None:
+                self.action_queries[action] = self.action_queries.get(action, 0) + 1
+            if plan is not None:
+                self.slow.append({
+                    'at': time.time(),
+                    'ms': round(ms, 3),
+                    'action': action,
+                    'thread': threading.current_thread().name,
+                    'sql': key,
+                    'params': repr(params)[:200],
+                    'plan': plan,
+                })
+
+    def snapshot(self):
+        """Plain-data copy of everything recorded so far"""
+        with self._lock:
+            return {
+                'enabled': ENABLED,
+                'slow_query_ms': SLOW_QUERY_MS,
+                'actions': {
+                    name: {**h.to_dict(), 'queries': self.action_queries.get(name, 0)}
+                    for name, h in self.actions.items()
+                },
+                'queries': {sql: h.to_dict() for sql, h in self.queries.items()},
+                'slow_queries': list(self.slow),
+            }
+
+    def dump(self, path):
+        """Write snapshot() to a JSON file"""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.snapshot(), f, indent=2)
+
+
+def timed(func):
+    """Record the latency of a handler and the statements it runs; a no-op unless enabled"""
+    if not ENABLED:
+        return func
+
+    name = func.__qualname__
+    params = inspect.signature(func).parameters.values()
+    takes_varargs = any(p.kind == p.VAR_POSITIONAL for p in params)
+    positional = sum(1 for p in params if p.kind in (p.POSITIONAL_ONLY, p.POSITIONAL_OR_KEYWORD))
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        # Qt passes signal arguments (e.g. clicked's checked flag) the handler may not take
+        if not takes_varargs:
+            args = args[:positional]
+        return recorder.run_action(name, func, args, kwargs)
+    return wrapper
+
+
+class TimedCursor(sqlite3.Cursor):
+    """Cursor that times execute and fetch calls and logs slow statements"""
+
+    _sql = None
+    _params = None
+    _elapsed = 0.0
+
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._finish_step(sql, parameters, start)
+
+    def executemany(self, sql, seq_of_parameters):
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            # The first row stands in for all of them when a plan is captured
+            rows = seq_of_parameters
+            self._finish_step(sql, rows[0] if isinstance(rows, (list, tuple)) and rows else None,
+                              start)
+
+    def fetchone(self):
+        start = time.perf_counter()
+        try:
+            return super().fetchone()
+        finally:
+            self._elapsed += time.perf_counter() - start
+
+    def fetchmany(self, size=None):
+        start = time.perf_counter()
+        try:
+            return super().fetchmany(size) if size is not None else super().fetchmany()
+        finally:
+            self._elapsed += time.perf_counter() - start
+            self._flush()
+
+    def fetchall(self):
+        start = time.perf_counter()
+        try:
+            return super().fetchall()
+        finally:
+            self._elapsed += time.perf_counter() - start
+            self._flush()
+
+    def close(self):
+        self._flush()
+        super().close()
+
+    def __del__(self):
+        # Rows read by iterating the cursor are only counted up to here. A finalizer
+        # may run on any thread at any time, so it records without running EXPLAIN
+        self._flush(explain_slow=False)
+
+    def _finish_step(self, sql, params, start):
+        self._flush()
+        self._sql = sql
+        self._params = params
+        self._elapsed = time.perf_counter() - start
+        # A read's rows are fetched later; keep it open so the fetch time counts too.
+        # A statement already slow is recorded (and explained) right after execute
+        if sql.lstrip()[:6].upper() not in ('SELECT', 'WITH') or self._elapsed * 1000 >= SLOW_QUERY_MS:
+            self._flush()
+
+    def _flush(self, explain_slow=True):
+        """Record the statement run last, with the fetch time spent on it so far"""
+        if self._sql is None:
+            return
+        sql, params, ms = self._sql, self._params, self._elapsed * 1000
+        self._sql = None
+        plan = None
+        if ms >= SLOW_QUERY_MS:
+            plan = (explain(self.connection, sql, params) if explain_slow
+                    else ["(no plan: recorded when the cursor was released)"])
+        recorder.record_query(sql, ms, plan, params)
+
+
+class TimedConnection(sqlite3.Connection):
+    """Connection whose cursors, including the ones behind execute(), are TimedCursors"""
+
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    # The built-in shortcuts open plain cursors, so route them through cursor()
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def commit(self):
+        start = time.perf_counter()
+        try:
+            super().commit()
+        finally:
+            recorder.record_query('COMMIT', (time.perf_counter() - start) * 1000)
+
+
+def explain(conn, sql, params):
+    """EXPLAIN QUERY PLAN lines for a statement, or the error that prevented it"""
+    try:
+        cursor = sqlite3.Cursor(conn)
+        rows = cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params or ()).fetchall()
+        return [detail for *_, detail in rows]
+    except sqlite3.Error as e:
+        return [f"(no plan: {e})"]
+
+
+def connection_factory():
+    """sqlite3.connect() factory for db.connect(): timed when enabled, plain otherwise"""
+    return TimedConnection if ENABLED else sqlite3.Connection
+
+
+# Shared instance, filled from every thread
+recorder = Recorder()
@@ -0,0 +1,191 @@
+import csv
+from collections import namedtuple
+
+import db
+
+StockLevel = namedtuple('StockLevel', ['product_id', 'on_hand', 'reorder_level'])
+
+# Codes per IN (...) lookup, well under SQLite's bound-parameter limit
+LOOKUP_CHUNK = 400
+
+# Absolute levels from a stock take or an adjustment; an untracked product gets its first row
+SET_LEVELS = '''
+    INSERT INTO inventory (product_id, on_hand, reorder_level) VALUES (?, ?, ?)
+    ON CONFLICT (product_id) DO UPDATE SET
+        on_hand = excluded.on_hand,
+        reorder_level = excluded.reorder_level,
+        updated_at = strftime('%s', 'now')
+'''
+
+# Counted quantity for a product given by SKU or barcode; the reorder level is kept
+SET_COUNT_BY_CODE = '''
+    INSERT INTO inventory (product_id, on_hand)
+    SELECT product_id, :count FROM products WHERE sku = :code OR barcode = :code
+    ON CONFLICT (product_id) DO UPDATE SET
+        on_hand = excluded.on_hand,
+        updated_at = strftime('%s', 'now')
+'''
+
+# Levels changed at or after an updated_at; the one-second resolution means the
+# boundary second is read again
+STOCK_CHANGES = '''
+    SELECT product_id, on_hand, reorder_level, updated_at
+    FROM inventory
+    WHERE updated_at >= ?
+'''
+
+
+class StockCache:
+    """In-memory stock levels so the till never reads SQLite for stock
+
+    Checkout decrements the cached levels right away (the journal writes
+    the same decrement to SQLite), and refresh() pulls the levels other
+    registers or a stock take changed. Items at or below their reorder
+    level are kept in a set so the low-stock alert needs no query.
+    """
+
+    def __init__(self):
+        self._levels = {}       # product_id -> StockLevel
+        self._low = set()       # product_ids at or below their reorder level
+        self._high_water = None
+        self.loaded = False
+
+    def load(self):
+        """Load every stock level once"""
+        self.apply_load(self.fetch_all())
+
+    def fetch_all(self):
+        """Read every stock level; safe to run on a query thread"""
+        return db.get_connection().execute('''
+            SELECT product_id, on_hand, reorder_level, updated_at
+            FROM inventory
+        ''').fetchall()
+
+    def apply_load(self, rows):
+        """Replace the cache with rows from fetch_all()"""
+        self._levels.clear()
+        self._low.clear()
+        self._high_water = 0
+        self.apply_changes(rows)
+        self.loaded = True
+
+    def refresh(self):
+        """Pull only the levels changed since the last load or refresh"""
+        if not self.loaded:
+            self.load()
+            return []
+        return self.apply_changes(self.fetch_changes(self._high_water))
+
+    def fetch_changes(self, since):
+        """Read the levels changed at or after since; safe to run on a query thread"""
+        return db.get_connection().execute(STOCK_CHANGES, (since,)).fetchall()
+
+    def apply_changes(self, rows):
+        """Merge rows from fetch_changes() and return the levels that differ"""
+        changed = []
+        for product_id, on_hand, reorder_level, updated_at in rows:
+            level = StockLevel(product_id, on_hand, reorder_level)
+            if self._levels.get(product_id) != level:
+                self._store(level)
+                changed.append(level)
+            self._high_water = max(self._high_water, updated_at)
+        return changed
+
+    def apply_sale(self, sale):
+        """Decrement the cached levels for a sale record; return the items it took low"""
+        now_low = []
+        for product_id, quantity, *_ in sale['lines']:
+            level = self._levels.get(product_id)
+            if level is None:
+                continue
+            was_low = product_id in self._low
+            self._store(level._replace(on_hand=level.on_hand - quantity))
+            if not was_low and product_id in self._low:
+                now_low.append(product_id)
+        return now_low
+
+    @property
+    def high_water(self):
+        """Largest updated_at seen, the starting point for the next fetch_changes()"""
+        return self._high_water
+
+    def get(self, product_id):
+        """Stock level of a product, or None if it is not tracked"""
+        return self._levels.get(product_id)
+
+    def on_hand(self, product_id):
+        level = self._levels.get(product_id)
+        return None if level is None else level.on_hand
+
+    def is_low(self, product_id):
+        return product_id in self._low
+
+    def low_stock(self):
+        """Levels at or below their reorder level, furthest below first"""
+        return sorted((self._levels[product_id] for product_id in self._low),
+                      key=lambda level: (level.on_hand - level.reorder_level, level.product_id))
+
+    def __len__(self):
+        return len(self._levels)
+
+    def _store(self, level):
+        self._levels[level.product_id] = level
+        if level.on_hand <= level.reorder_level:
+            self._low.add(level.product_id)
+        else:
+            self._low.discard(level.product_id)
+
+
+def set_levels(conn, levels):
+    """Write (product_id, on_hand, reorder_level) rows in one executemany"""
+    conn.executemany(SET_LEVELS, levels)
+
+
+def stock_take(conn, counts):
+    """Apply counted (code, quantity) pairs by SKU or barcode; return the codes that matched nothing"""
+    counts = list(counts)
+    codes = list({code for code, _ in counts})
+    known = set()
+    for i in range(0, len(codes), LOOKUP_CHUNK):
+        chunk = codes[i:i + LOOKUP_CHUNK]
+        marks = ', '.join('?' for _ in chunk)
+        known.update(code for code, in conn.execute(f'''
+            SELECT sku FROM products WHERE sku IN ({marks})
+            UNION SELECT barcode FROM products WHERE barcode IN ({marks})
+        ''', chunk + chunk))
+    conn.executemany(SET_COUNT_BY_CODE, [{'code': code, 'count': count}
+                                         for code, count in counts if code in known])
+    return [code for code, _ in counts if code not in known]
+
+
+def apply_stock_take(path):
+    """Read a counts CSV and apply it in one transaction; safe to run on a query thread
+
+    Returns the number of counts applied and the codes that matched nothing.
+    """
+    counts = read_counts(path)
+    conn = db.get_connection()
+    with conn:
+        unknown = stock_take(conn, counts)
+    return len(counts) - len(unknown), unknown
+
+
+def read_counts(path):
+    """Read (code, quantity) pairs from a CSV with code and count columns"""
+    counts = []
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        reader = csv.DictReader(f)
+        for record in reader:
+            code = (record.get('code') or record.get('sku') or record.get('barcode') or '').strip()
+            try:
+                count = int(record.get('count') or '')
+            except ValueError:
+                raise ValueError(f"line {reader.line_num}: invalid count {record.get('count')!r}")
+            if not code:
+                raise ValueError(f"line {reader.line_num}: code is required")
+            counts.append((code, count))
+    return counts
+
+
+# Shared instance used by the pages
+stock = StockCache()
@@ -0,0 +1,257 @@
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+from PyQt5.QtCore import QObject, pyqtSignal
+
+import db
+from services.cart import record_sale
+
+# Most sales written per group commit
+MAX_BATCH = 200
+
+# Seconds to wait before retrying a batch SQLite refused (e.g. locked)
+RETRY_DELAY = 0.5
+
+# Attempts per batch before giving up on it for this run
+MAX_ATTEMPTS = 5
+
+# Seconds stop() waits for the writer before leaving it to exit with the process
+STOP_TIMEOUT = 10
+
+logger = logging.getLogger('cashier.journal')
+
+
+def journal_path():
+    """Append-only sales log, from JOURNAL_PATH (default: next to the database)"""
+    return os.getenv("JOURNAL_PATH") or f"{os.getenv('DB_PATH', 'cashier.db')}.journal"
+
+
+def journal_fsync():
+    """Whether each checkout is fsynced to the log before it is confirmed, from JOURNAL_FSYNC
+
+    Off by default: the checkout only waits for the OS write, which
+    survives the app crashing, and the writer fsyncs the log once per
+    batch. A power cut can lose the sales of the last few milliseconds;
+    turn it on to close that window at the cost of a disk flush per sale.
+    """
+    return os.getenv("JOURNAL_FSYNC", "0") == "1"
+
+
+def encode(sale):
+    """One log line for a sale"""
+    return (json.dumps(sale, separators=(',', ':')) + '\n').encode('utf-8')
+
+
+class SalesJournal(QObject):
+    """Write-behind sales journal: checkout appends to a log, a writer thread commits to SQLite
+
+    submit() only appends one JSON line to the log and queues the sale, so
+    a checkout never waits for a SQLite commit. The writer drains whatever
+    has queued up meanwhile, fsyncs the log once for all of it and commits
+    it as one transaction (group commit). Once everything logged is in
+    SQLite the log is truncated; the writer's connection runs with
+    synchronous=FULL, so those commits are on disk first. Sales still in
+    the log after a crash are replayed by start(); replay is idempotent
+    because inserts are keyed on sale_uuid.
+    """
+
+    committed = pyqtSignal(int)  # number of sales durably written by a group commit
+    failed = pyqtSignal(str)     # a group commit failed; it is retried or set aside
+
+    def __init__(self, path=None):
+        super().__init__()
+        self.path = path
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()   # orders log appends against truncation
+        self._log = None
+        self._pending = 0               # sales in the log not yet committed or given up on
+        self._stranded = []             # sales SQLite kept refusing, kept in the log for start()
+        self._thread = None
+        self._stopping = False
+
+    def start(self):
+        """Open the log, queue any sales left from a previous run and start the writer"""
+        if self._thread is not None:
+            return
+        self.path = self.path or journal_path()
+        replayed = self._replay()
+        self._log = open(self.path, 'ab')
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name='sales-journal', daemon=True)
+        self._thread.start()
+        return replayed
+
+    def submit(self, sale):
+        """Durably log a sale (from Cart.to_sale()) and queue it for the database"""
+        self.start()
+        line = encode(sale)
+        with self._lock:
+            self._log.write(line)
+            self._log.flush()
+            if journal_fsync():
+                os.fsync(self._log.fileno())
+            self._pending += 1
+        self._queue.put(sale)
+
+    def pending(self):
+        """Sales accepted but not yet committed to SQLite"""
+        return self._pending + len(self._stranded)
+
+    def stop(self):
+        """Commit everything queued, then stop the writer
+
+        Gives up after STOP_TIMEOUT seconds; whatever is still uncommitted
+        stays in the log and is replayed on the next start().
+        """
+        if self._thread is None:
+            return
+        self._stopping = True
+        self._queue.put(None)
+        self._thread.join(STOP_TIMEOUT)
+        if self._thread.is_alive():
+            logger.warning("Sales journal writer did not stop; %d sales left in %s",
+                           self.pending(), self.path)
+            return
+        self._thread = None
+        self._log.close()
+        self._log = None
+
+    def _replay(self):
+        if not os.path.exists(self.path):
+            return 0
+        count = 0
+        complete = 0    # end of the last newline-terminated line
+        with open(self.path, 'r+b') as f:
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break  # a line torn by the crash was never confirmed
+                complete += len(line)
+                try:
+                    sale = json.loads(line)
+                except ValueError:
+                    continue
+                self._queue.put(sale)
+                count += 1
+            # Drop the fragment, or the next sale would be appended onto it and lost too
+            f.truncate(complete)
+        self._pending += count
+        return count
+
+    def _run(self):
+        # The log is truncated right after a commit, so the commit itself must be durable
+        db.get_connection().execute("PRAGMA synchronous = FULL")
+        stopping = False
+        while not stopping:
+            sale = self._queue.get()
+            if sale is None:
+                break
+            batch = [sale]
+            while len(batch) < MAX_BATCH:
+                try:
+                    sale = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if sale is None:
+                    stopping = True
+                    break
+                batch.append(sale)
+            # One flush covers every sale in the batch; submit() only waited for the OS write
+            os.fsync(self._log.fileno())
+            self._commit(batch)
+
+    def _commit(self, batch):
+        """Write a batch, retrying at most MAX_ATTEMPTS times
+
+        If a sale in it is bad, the rest are written one by one and the bad
+        ones are moved to the .rejected file. If the database itself keeps
+        refusing (locked, disk full), the batch stays in the log for the next
+        start() and the writer moves on.
+        """
+        for attempt in range(MAX_ATTEMPTS):
+            try:
+                self._write(batch)
+            except sqlite3.OperationalError as e:
+                self.failed.emit(str(e))
+                if self._stopping:
+                    break
+                time.sleep(RETRY_DELAY)
+            except (sqlite3.Error, KeyError, TypeError, ValueError):
+                self._commit_each(batch)
+                return
+            else:
+                self._done(len(batch), len(batch))
+                return
+        logger.error("Leaving %d sales in %s after %d failed attempts", len(batch), self.path,
+                     attempt + 1)
+        self._strand(batch)
+
+    def _commit_each(self, batch):
+        written = set_aside = 0
+        stranded = []
+        for sale in batch:
+            try:
+                self._write([sale])
+                written += 1
+            except sqlite3.OperationalError as e:
+                self.failed.emit(str(e))
+                stranded.append(sale)
+            except (sqlite3.Error, KeyError, TypeError, ValueError) as e:
+                self._reject(sale, e)
+                set_aside += 1
+        self._done(written + set_aside, written)
+        if stranded:
+            self._strand(stranded)
+
+    def _write(self, batch):
+        conn = db.get_connection()
+        with conn:
+            for sale in batch:
+                record_sale(conn, sale)
+
+    def _reject(self, sale, error):
+        """Move a sale SQLite will never accept out of the way, keeping it for inspection"""
+        logger.error("Sale %s rejected: %s", sale.get('sale_uuid') if isinstance(sale, dict)
+                     else sale, error)
+        self.failed.emit(f"Sale set aside: {error}")
+        with open(f"{self.path}.rejected", 'a', encoding='utf-8') as f:
+            f.write(json.dumps({'error': str(error), 'sale': sale}) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _strand(self, sales):
+        """Give up on sales for this run; they stay in the log for the next start()"""
+        with self._lock:
+            self._stranded.extend(sales)
+        self._done(len(sales), 0)
+
+    def _rewrite(self, sales):
+        """Atomically replace the log with just these sales (caller holds the lock)"""
+        tmp = f"{self.path}.tmp"
+        with open(tmp, 'wb') as f:
+            f.write(b''.join(encode(sale) for sale in sales))
+            f.flush()
+            os.fsync(f.fileno())
+        self._log.close()
+        os.replace(tmp, self.path)
+        self._log = open(self.path, 'ab')
+
+    def _done(self, count, written):
+        """Count sales off the log; written of them reached SQLite, the rest were set aside"""
+        with self._lock:
+            self._pending -= count
+            if self._pending == 0:
+                # Everything logged is in SQLite, set aside or stranded now; keep only the stranded
+                if self._stranded:
+                    self._rewrite(self._stranded)
+                else:
+                    self._log.truncate(0)
+        if written:
+            self.committed.emit(written)
+
+# Shared instance used by the pages
+journal = SalesJournal()
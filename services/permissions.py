@@ -0,0 +1,126 @@
+import db
+from services import changelog
+
+# Permission required to open a page whose module has none configured
+DEFAULT_MODULE_PERMISSIONS = {
+    'inventory': 'inventory_read',
+    'reports': 'reports_read',
+    'diagnostics': 'settings_read',
+    'settings': 'settings_read',
+}
+
+# Change log tables that can alter what a user may do
+PERMISSION_TABLES = ('users', 'roles', 'permissions', 'role_permissions', 'modules')
+
+
+def affects(change, user_id, role_id):
+    """Whether a logged change can alter what the given user may do"""
+    if change.table == 'users':
+        return change.key == user_id
+    if change.table in ('roles', 'role_permissions'):
+        return change.key == role_id
+    return True  # permission keys and modules apply to everyone
+
+
+class PermissionService:
+    """Holds the logged-in user's permissions so authorization checks never touch SQLite
+
+    Everything is loaded at login. After that only the change log is read:
+    the Settings tabs call refresh() after their own edits, and the main
+    window polls fetch_update() on the query thread for edits made by
+    other processes. The permissions are reloaded only when a logged
+    change affects the logged-in user.
+    """
+
+    def __init__(self):
+        self.username = None
+        self.user_id = None
+        self.role_id = None
+        self.permissions = frozenset()
+        self.modules = {}   # module name -> (is_active, required permission key)
+        self.seq = 0        # last changelog seq the permissions reflect
+
+    def load(self, username):
+        self.apply(username, self.fetch(username))
+
+    def fetch(self, username):
+        """Read a user's permissions and the seq they are current to; safe on a query thread"""
+        conn = db.get_connection()
+        seq = changelog.latest_seq(conn)
+        user_id, role_id = conn.execute(
+            "SELECT user_id, role_id FROM users WHERE username = ?", (username,)
+        ).fetchone() or (None, None)
+        cursor = conn.execute('''
+            SELECT p.key
+            FROM users u
+            JOIN role_permissions rp ON u.role_id = rp.role_id
+            JOIN permissions p ON rp.permission_id = p.permission_id
+            WHERE u.username = ? AND u.is_active = 1
+        ''', (username,))
+        keys = frozenset(key for key, in cursor)
+
+        cursor = conn.execute('''
+            SELECT m.name, m.is_active, p.key
+            FROM modules m
+            LEFT JOIN permissions p ON m.required_permission_id = p.permission_id
+        ''')
+        modules = {name: (bool(is_active), key) for name, is_active, key in cursor}
+        return seq, user_id, role_id, keys, modules
+
+    def apply(self, username, snapshot):
+        """Install the result of fetch()"""
+        self.seq, self.user_id, self.role_id, self.permissions, self.modules = snapshot
+        self.username = username
+
+    def refresh(self):
+        """Reload if anything logged since the last load affects the user; True if reloaded"""
+        if self.username is None:
+            return False
+        update = self.fetch_update(self.username, self.seq, self.user_id, self.role_id)
+        return self.apply_update(self.username, update)
+
+    def fetch_update(self, username, since, user_id, role_id):
+        """Read the permission changes logged after seq since; safe on a query thread
+
+        Returns (seq, snapshot): snapshot is a fresh fetch() when a change
+        affects the user, None when none does.
+        """
+        changes = changelog.changes_since(since, PERMISSION_TABLES)
+        if changes is None or any(affects(change, user_id, role_id) for change in changes):
+            snapshot = self.fetch(username)
+            return snapshot[0], snapshot
+        return (changes[-1].seq if changes else since), None
+
+    def apply_update(self, username, update):
+        """Merge the result of fetch_update(); True if the permissions were reloaded"""
+        seq, snapshot = update
+        if username != self.username:
+            return False    # logged out or switched user while it was read
+        if snapshot is not None:
+            self.apply(username, snapshot)
+            return True
+        self.seq = max(self.seq, seq)
+        return False
+
+    def clear(self):
+        self.username = None
+        self.user_id = None
+        self.role_id = None
+        self.permissions = frozenset()
+        self.modules = {}
+
+    def has(self, key):
+        return key in self.permissions
+
+    def can_access(self, module):
+        is_active, key = self.modules.get(module, (True, None))
+        key = key or DEFAULT_MODULE_PERMISSIONS.get(module)
+        return is_active and (key is None or key in self.permissions)
+
+    def visible_modules(self):
+        """Names of the active modules the current user may open"""
+        return [name for name in self.modules if self.can_access(name)]
+
+
+# Shared instance used by the pages
+permissions = PermissionService()
@@ -0,0 +1,157 @@
+import itertools
+import sqlite3
+import threading
+
+from PyQt5.QtCore import QObject, QThread, pyqtSignal, pyqtSlot
+
+import db
+from services.instrumentation import ENABLED as INSTRUMENTED, recorder
+
+
+def fetch_all(sql, params=()):
+    """Run a read on the calling thread's connection"""
+    return db.get_connection().execute(sql, params).fetchall()
+
+
+class QueryWorker(QObject):
+    """Lives on the query thread and runs jobs one at a time on that thread's connection"""
+
+    finished = pyqtSignal(int, object)  # job id, result
+    failed = pyqtSignal(int, str)       # job id, message
+
+    def __init__(self):
+        super().__init__()
+        self.lock = threading.Lock()
+        self.cancelled = set()
+        self.current = None
+        self.connection = None
+
+    @pyqtSlot(int, object, object)
+    def run(self, job_id, func, args):
+        with self.lock:
+            if job_id in self.cancelled:
+                self.cancelled.discard(job_id)
+                return
+            self.current = job_id
+            self.connection = db.get_connection()
+        try:
+            if INSTRUMENTED:
+                name = getattr(func, '__qualname__', repr(func))
+                result = recorder.run_action(name, func, args, {})
+            else:
+                result = func(*args)
+        except sqlite3.OperationalError as e:
+            if str(e) != 'interrupted':
+                self.failed.emit(job_id, str(e))
+        except Exception as e:
+            self.failed.emit(job_id, str(e))
+        else:
+            self.finished.emit(job_id, result)
+        finally:
+            with self.lock:
+                self.current = None
+                self.cancelled.discard(job_id)
+
+    def cancel(self, job_id):
+        """Skip a queued job, or interrupt it if it is already running"""
+        with self.lock:
+            if self.current == job_id:
+                self.connection.interrupt()
+            else:
+                self.cancelled.add(job_id)
+
+
+class QueryExecutor(QObject):
+    """Runs page reads on a dedicated thread and delivers results on the GUI thread
+
+    Results arrive through queued signals, so callbacks may touch widgets.
+    Identical calls still in flight share one execution, and cancel(owner)
+    drops a page's pending work when it is navigated away from.
+    """
+
+    dispatch = pyqtSignal(int, object, object)  # job id, func, args
+
+    def __init__(self):
+        super().__init__()
+        self._thread = None
+        self._worker = None
+        self._ids = itertools.count(1)
+        self._jobs = {}     # job id -> (key, [(owner, on_done, on_error)])
+        self._by_key = {}   # (func, args) -> job id still in flight
+
+    def submit(self, func, *args, on_done, on_error=None, owner=None):
+        """Call on_done(func(*args)) once func has run on the query thread"""
+        self._start()
+        try:
+            key = (func, args)
+            job_id = self._by_key.get(key)
+        except TypeError:  # unhashable arguments are never coalesced
+            key = job_id = None
+
+        if job_id is None:
+            job_id = next(self._ids)
+            self._jobs[job_id] = (key, [])
+            if key is not None:
+                self._by_key[key] = job_id
+            self.dispatch.emit(job_id, func, args)
+        self._jobs[job_id][1].append((owner, on_done, on_error))
+        return job_id
+
+    def query(self, sql, params=(), **callbacks):
+        """Fetch all rows of a read-only statement"""
+        return self.submit(fetch_all, sql, tuple(params), **callbacks)
+
+    def cancel(self, owner):
+        """Forget owner's pending callbacks; jobs nobody waits for any more are skipped"""
+        for job_id, (key, waiters) in list(self._jobs.items()):
+            waiters[:] = [waiter for waiter in waiters if waiter[0] is not owner]
+            if not waiters:
+                self._forget(job_id)
+                self._worker.cancel(job_id)
+
+    def pending(self, owner=None):
+        """Number of jobs in flight, optionally only those owner waits for"""
+        return sum(1 for _, waiters in self._jobs.values()
+                   if owner is None or any(waiter[0] is owner for waiter in waiters))
+
+    def shutdown(self):
+        if self._thread is not None:
+            for job_id in list(self._jobs):
+                self._worker.cancel(job_id)
+            self._jobs.clear()
+            self._by_key.clear()
+            self._thread.quit()
+            self._thread.wait()
+            self._thread = self._worker = None
+
+    def _start(self):
+        if self._thread is not None:
+            return
+        self._thread = QThread()
+        self._worker = QueryWorker()
+        self._worker.moveToThread(self._thread)
+        self.dispatch.connect(self._worker.run)
+        self._worker.finished.connect(self._on_finished)
+        self._worker.failed.connect(self._on_failed)
+        self._thread.start()
+
+    def _forget(self, job_id):
+        key, waiters = self._jobs.pop(job_id)
+        if key is not None and self._by_key.get(key) == job_id:
+            del self._by_key[key]
+        return waiters
+
+    def _on_finished(self, job_id, result):
+        if job_id in self._jobs:
+            for _, on_done, _ in self._forget(job_id):
+                on_done(result)
+
+    def _on_failed(self, job_id, message):
+        if job_id in self._jobs:
+            for _, _, on_error in self._forget(job_id):
+                if on_error is not None:
+                    on_error(message)
+
+
+# Shared instance used by the pages
+executor = QueryExecutor()
@@ -0,0 +1,128 @@
+import csv
+from collections import namedtuple
+
+import db
+
+Report = namedtuple('Report', ['title', 'headers', 'money_columns', 'sql'])
+
+# Every report reads a rollup keyed by day first, so a date range is one index range scan;
+# names are joined only after aggregating
+REPORTS = {
+    'day': Report("Sales by Day", ["Day", "Sales", "Subtotal", "Discount", "Total"], {2, 3, 4}, '''
+        SELECT day, SUM(sale_count), SUM(subtotal), SUM(discount), SUM(total)
+        FROM sales_summary
+        WHERE day BETWEEN ? AND ?
+        GROUP BY day
+        ORDER BY day
+    '''),
+    'hour': Report("Sales by Hour", ["Hour", "Sales", "Total"], {2}, '''
+        SELECT printf('%02d:00', hour), SUM(sale_count), SUM(total)
+        FROM sales_hourly
+        WHERE day BETWEEN ? AND ?
+        GROUP BY hour
+        ORDER BY hour
+    '''),
+    'product': Report("Sales by Product", ["Product", "Quantity", "Total"], {2}, '''
+        SELECT COALESCE(p.name, '#' || t.product_id), t.quantity, t.revenue
+        FROM (
+            SELECT product_id, SUM(quantity) AS quantity, SUM(total) AS revenue
+            FROM product_daily
+            WHERE day BETWEEN ? AND ?
+            GROUP BY product_id
+        ) t
+        LEFT JOIN products p ON p.product_id = t.product_id
+        ORDER BY t.revenue DESC
+    '''),
+    'cashier': Report("Sales by Cashier", ["Cashier", "Sales", "Total"], {2}, '''
+        SELECT COALESCE(u.username, '(none)'), t.sale_count, t.revenue
+        FROM (
+            SELECT user_id, SUM(sale_count) AS sale_count, SUM(total) AS revenue
+            FROM cashier_daily
+            WHERE day BETWEEN ? AND ?
+            GROUP BY user_id
+        ) t
+        LEFT JOIN users u ON u.user_id = t.user_id
+        ORDER BY t.revenue DESC
+    '''),
+}
+
+# rollup table -> (columns, query recomputing it from the raw sales), for rebuild and verify
+ROLLUP_QUERIES = {
+    'sales_hourly': (('day', 'hour', 'sale_count', 'total'), '''
+        SELECT date(created_at, 'unixepoch', 'localtime') AS day,
+               CAST(strftime('%H', created_at, 'unixepoch', 'localtime') AS INTEGER) AS hour,
+               COUNT(*), SUM(total)
+        FROM sales
+        GROUP BY day, hour
+    '''),
+    'cashier_daily': (('day', 'user_id', 'sale_count', 'total'), '''
+        SELECT date(created_at, 'unixepoch', 'localtime') AS day, COALESCE(user_id, 0) AS cashier,
+               COUNT(*), SUM(total)
+        FROM sales
+        GROUP BY day, cashier
+    '''),
+    'product_daily': (('day', 'product_id', 'quantity', 'total'), '''
+        SELECT date(s.created_at, 'unixepoch', 'localtime') AS day, l.product_id,
+               SUM(l.quantity), SUM(l.total)
+        FROM sale_lines l
+        JOIN sales s ON s.sale_id = l.sale_id
+        GROUP BY day, l.product_id
+    '''),
+}
+
+
+def run(name, start, end):
+    """Return the rows of a report for the inclusive 'YYYY-MM-DD' date range"""
+    return db.get_connection().execute(REPORTS[name].sql, (start, end)).fetchall()
+
+
+def export_csv(path, name, rows):
+    """Write report rows to a CSV file with a header line"""
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(REPORTS[name].headers)
+        writer.writerows(rows)
+
+
+def rebuild(conn=None):
+    """Recompute every rollup table from the raw sales rows"""
+    conn = conn or db.get_connection()
+    with conn:
+        for table, (columns, query) in ROLLUP_QUERIES.items():
+            conn.execute(f"DELETE FROM {table}")
+            conn.execute(f"INSERT INTO {table} ({', '.join(columns)}) {query}")
+
+
+def verify(conn=None):
+    """Compare the rollups with the raw rows and return (table, key, want, have) for each difference"""
+    conn = conn or db.get_connection()
+    mismatches = []
+    for table, (columns, query) in ROLLUP_QUERIES.items():
+        expected = {row[:2]: row[2:] for row in conn.execute(query)}
+        stored = {row[:2]: row[2:] for row in conn.execute(
+            f"SELECT {', '.join(columns)} FROM {table} WHERE {columns[2]} != 0")}
+        for key in expected.keys() | stored.keys():
+            want = expected.get(key, (0, 0))
+            have = stored.get(key, (0, 0))
+            if want[0] != have[0] or round(want[1] - have[1], 2):
+                mismatches.append((table, key, want, have))
+    return sorted(mismatches)
+
+
+if __name__ == '__main__':
+    import argparse
+    import config
+
+    parser = argparse.ArgumentParser(description="Verify or rebuild the report rollups")
+    parser.add_argument('--rebuild', action='store_true', help="rebuild the rollups from raw sales")
+    args = parser.parse_args()
+
+    if args.rebuild:
+        rebuild()
+        print("report rollups rebuilt")
+
+    mismatches = verify()
+    for table, key, want, have in mismatches:
+        print(f"{table} {key}: expected {want}, stored {have}")
+    print(f"{len(mismatches)} mismatched rows")
+    raise SystemExit(1 if mismatches else 0)
@@ -0,0 +1,90 @@
+import os
+from datetime import datetime
+
+import db
+
+# Columns aggregated from sales into sales_summary, shared by rebuild and verify
+SUMMARY_QUERY = '''
+    SELECT date(created_at, 'unixepoch', 'localtime') AS day, shift, register_id,
+           COUNT(*), SUM(subtotal), SUM(discount), SUM(total)
+    FROM sales
+    GROUP BY day, register_id, shift
+'''
+
+DAY_TOTALS = '''
+    SELECT COALESCE(SUM(sale_count), 0), COALESCE(SUM(total), 0)
+    FROM sales_summary
+    WHERE day = ? AND register_id = ?
+'''
+
+
+def register_id():
+    """Register this till reports as, from REGISTER_ID"""
+    return int(os.getenv("REGISTER_ID", "1"))
+
+
+def current_shift(now=None):
+    """1-based shift number for the given time, from the SHIFT_STARTS hours (e.g. "6,14,22")"""
+    starts = sorted(int(h) for h in os.getenv("SHIFT_STARTS", "6,14,22").split(","))
+    hour = (now or datetime.now()).hour
+    shift = len(starts)  # before the first start we are still in the overnight shift
+    for i, start in enumerate(starts, start=1):
+        if hour >= start:
+            shift = i
+    return shift
+
+
+def day_totals(day=None, register=None):
+    """Return (sale_count, total) for one register and day from the precomputed counters"""
+    day = day or datetime.now().strftime('%Y-%m-%d')
+    register = register_id() if register is None else register
+    return db.get_connection().execute(DAY_TOTALS, (day, register)).fetchone()
+
+
+def rebuild(conn=None):
+    """Recompute sales_summary from the raw sales rows"""
+    conn = conn or db.get_connection()
+    with conn:
+        conn.execute("DELETE FROM sales_summary")
+        conn.execute(f'''
+            INSERT INTO sales_summary (day, shift, register_id, sale_count, subtotal, discount, total)
+            {SUMMARY_QUERY}
+        ''')
+
+
+def verify(conn=None):
+    """Compare sales_summary with the raw rows and return the keys that disagree"""
+    conn = conn or db.get_connection()
+    expected = {row[:3]: row[3:] for row in conn.execute(SUMMARY_QUERY)}
+    stored = {row[:3]: row[3:] for row in conn.execute('''
+        SELECT day, shift, register_id, sale_count, subtotal, discount, total
+        FROM sales_summary
+        WHERE sale_count != 0
+    ''')}
+
+    mismatches = []
+    for key in expected.keys() | stored.keys():
+        want = expected.get(key, (0, 0, 0, 0))
+        have = stored.get(key, (0, 0, 0, 0))
+        if want[0] != have[0] or any(round(a - b, 2) for a, b in zip(want[1:], have[1:])):
+            mismatches.append((key, want, have))
+    return sorted(mismatches)
+
+
+if __name__ == '__main__':
+    import argparse
+    import config
+
+    parser = argparse.ArgumentParser(description="Verify or rebuild the sales summary counters")
+    parser.add_argument('--rebuild', action='store_true', help="rebuild the counters from raw sales")
+    args = parser.parse_args()
+
+    if args.rebuild:
+        rebuild()
+        print("sales_summary rebuilt")
+
+    mismatches = verify()
+    for (day, shift, register), want, have in mismatches:
+        print(f"{day} shift {shift} register {register}: expected {want}, stored {have}")
+    print(f"{len(mismatches)} mismatched rows")
+    raise SystemExit(1 if mismatches else 0)
@@ -0,0 +1,81 @@
+import re
+from collections import OrderedDict
+
+import db
+
+# Shorter input matches too much of the catalog to rank quickly
+MIN_PREFIX = 2
+
+# Prefixes whose results are kept
+CACHE_SIZE = 256
+
+TOKEN = re.compile(r"[\w-]+")
+
+PRODUCT_MATCH = '''
+    SELECT rowid FROM products_fts
+    WHERE products_fts MATCH ?
+    ORDER BY rank
+    LIMIT ?
+'''
+
+
+def match_expression(text):
+    """FTS5 query matching every word of text as a prefix, or None if nothing to search"""
+    tokens = TOKEN.findall(text.lower())
+    if not tokens:
+        return None
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+class ProductSearch:
+    """Ranked prefix search over product name, SKU and barcode with an LRU cache per prefix
+
+    fetch() reads the products_fts index and is safe to run on a query
+    thread; cached() and store() are meant for the GUI thread only, so the
+    cache needs no lock. Call clear() when products change.
+    """
+
+    def __init__(self, cache_size=CACHE_SIZE):
+        self.cache_size = cache_size
+        self._cache = OrderedDict()     # normalized text -> [product_id], least recent first
+
+    def fetch(self, text, limit=20):
+        """Return up to limit product ids matching text, best match first"""
+        expression = match_expression(text)
+        if expression is None or len(text.strip()) < MIN_PREFIX:
+            return []
+        cursor = db.get_connection().execute(PRODUCT_MATCH, (expression, limit))
+        return [product_id for product_id, in cursor]
+
+    def cached(self, text):
+        """Cached result for text, or None"""
+        key = self._key(text)
+        product_ids = self._cache.get(key)
+        if product_ids is not None:
+            self._cache.move_to_end(key)
+        return product_ids
+
+    def store(self, text, product_ids):
+        key = self._key(text)
+        self._cache[key] = product_ids
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def search(self, text, limit=20):
+        """fetch() through the cache, for scripts and other single-threaded callers"""
+        product_ids = self.cached(text)
+        if product_ids is None:
+            product_ids = self.fetch(text, limit)
+            self.store(text, product_ids)
+        return product_ids
+
+    def clear(self):
+        self._cache.clear()
+
+    def _key(self, text):
+        return ' '.join(TOKEN.findall(text.lower()))
+
+
+# Shared instance used by the pages
+product_search = ProductSearch()
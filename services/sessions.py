@@ -0,0 +1,111 @@
+import hashlib
+import hmac
+import os
+import secrets
+import time
+
+# Wrong PINs allowed before the cached session is dropped and a password login is required
+MAX_PIN_FAILURES = 5
+
+
+def quick_switch_ttl():
+    """Seconds a full login stays valid for quick switching, from QUICK_SWITCH_TTL"""
+    return int(os.getenv("QUICK_SWITCH_TTL", "900"))
+
+
+def quick_switch_limit():
+    """Quick switches allowed before a full login is required, from QUICK_SWITCH_MAX"""
+    return int(os.getenv("QUICK_SWITCH_MAX", "10"))
+
+
+class Session:
+    __slots__ = ('username', 'role', 'badge_code', 'pin_hash', 'pin_digest',
+                 'verified_at', 'switches', 'failures')
+
+    def __init__(self, username, role, badge_code, pin_hash):
+        self.username = username
+        self.role = role
+        self.badge_code = badge_code
+        self.pin_hash = pin_hash        # bcrypt hash from the users table
+        self.pin_digest = None          # fast in-memory digest once the PIN is confirmed
+        self.verified_at = time.monotonic()
+        self.switches = 0
+        self.failures = 0               # wrong PINs since the last successful switch
+
+
+class SessionCache:
+    """Memory-only cache of recently verified logins for PIN / badge quick switching
+
+    A full password login adds the user. Switching back to them then costs
+    a dict lookup plus an HMAC compare; the bcrypt PIN hash is only checked
+    the first time. Entries expire after the TTL or the switch limit, and
+    are dropped after MAX_PIN_FAILURES wrong PINs in a row.
+    """
+
+    def __init__(self):
+        self._sessions = {}
+        self._badges = {}
+        self._key = secrets.token_bytes(32)   # never leaves this process
+
+    def remember(self, user):
+        """Record a full password login (a credentials.VerifiedUser)"""
+        self.forget(user.username)
+        session = Session(user.username, user.role, user.badge_code, user.pin_hash)
+        self._sessions[user.username] = session
+        if user.badge_code:
+            self._badges[user.badge_code] = session
+
+    def forget(self, username):
+        """Require a full login next time, e.g. after the user's credentials change"""
+        session = self._sessions.pop(username, None)
+        if session and session.badge_code:
+            self._badges.pop(session.badge_code, None)
+
+    def clear(self):
+        self._sessions.clear()
+        self._badges.clear()
+
+    def get(self, username):
+        """Return a still-valid session or None"""
+        session = self._sessions.get(username)
+        if session and not self._is_valid(session):
+            self.forget(username)
+            return None
+        return session
+
+    def find_badge(self, badge_code):
+        session = self._badges.get(badge_code)
+        return self.get(session.username) if session else None
+
+    def check_pin(self, session, pin):
+        """True/False from the cached digest, or None if the PIN has not been confirmed yet"""
+        if session.pin_digest is None:
+            return None
+        return hmac.compare_digest(session.pin_digest, self._digest(pin))
+
+    def confirm_pin(self, session, pin):
+        """Cache a PIN that was checked against the bcrypt hash"""
+        session.pin_digest = self._digest(pin)
+
+    def record_switch(self, session):
+        session.switches += 1
+        session.failures = 0
+
+    def record_failure(self, session):
+        """Count a wrong PIN; returns True once the session has been dropped"""
+        session.failures += 1
+        if session.failures < MAX_PIN_FAILURES:
+            return False
+        self.forget(session.username)
+        return True
+
+    def _is_valid(self, session):
+        return (time.monotonic() - session.verified_at < quick_switch_ttl()
+                and session.switches < quick_switch_limit())
+
+    def _digest(self, pin):
+        return hmac.new(self._key, pin.encode('utf-8'), hashlib.sha256).digest()
+
+
+# Shared instance used by the pages
+sessions = SessionCache()
@@ -0,0 +1,287 @@
+"""Replication between a till's database and the store server (store_server.py)
+
+Each till keeps writing its own SQLite file. A Replicator thread ships
+committed sales to the store in gzip-compressed batches and pulls back
+the products the store's change log shows as changed or deleted since
+its last pull (a full snapshot the first time). Both positions
+live in sync_state and only move after the other side has the data, so
+a restart resumes where it stopped; the store inserts sales keyed on
+sale_uuid, so a batch sent twice is stored once.
+
+Off unless STORE_URL is set (e.g. http://store-pc:8765).
+"""
+import gzip
+import json
+import os
+import sqlite3
+import threading
+import urllib.request
+
+from PyQt5.QtCore import QObject, pyqtSignal
+
+import db
+from services import changelog
+from services.sales_summary import register_id
+
+# Most sales per request
+SALES_BATCH = 500
+
+# Most products per catalog response
+CATALOG_PAGE = 5000
+
+# Seconds between sync rounds when there is nothing left to send
+SYNC_INTERVAL = float(os.getenv("SYNC_INTERVAL", "5"))
+
+# Seconds between batches while catching up, so a backlog never saturates the disk or the LAN
+BATCH_PAUSE = 0.25
+
+# Longest wait between retries after the store could not be reached
+MAX_BACKOFF = 60
+
+REQUEST_TIMEOUT = 10
+
+# Sales saved before sale_uuid existed get a stable id derived from where they were made
+SALES_AFTER = '''
+    SELECT s.sale_id,
+           COALESCE(s.sale_uuid, 'register-' || s.register_id || '-sale-' || s.sale_id),
+           COALESCE(s.username, u.username), s.register_id, s.shift, s.created_at, s.subtotal, s.discount, s.total
+    FROM sales s
+    LEFT JOIN users u ON u.user_id = s.user_id
+    WHERE s.sale_id > ?
+    ORDER BY s.sale_id
+    LIMIT ?
+'''
+
+SALE_LINES_BETWEEN = '''
+    SELECT sale_id, product_id, quantity, unit_price, discount, total
+    FROM sale_lines
+    WHERE sale_id BETWEEN ? AND ?
+    ORDER BY sale_id, line_no
+'''
+
+# Products the store logged as changed after a seq; deleted ones come back with NULLs
+CATALOG_CHANGES = '''
+    SELECT c.seq, c.row_key, p.name, p.price, p.sku, p.barcode, p.product_id IS NULL
+    FROM changelog c
+    LEFT JOIN products p ON p.product_id = c.row_key
+    WHERE c.table_name = 'products' AND c.seq > ?
+    ORDER BY c.seq
+    LIMIT ?
+'''
+
+CATALOG_SNAPSHOT = '''
+    SELECT product_id, name, price, sku, barcode
+    FROM products
+    WHERE product_id > ?
+    ORDER BY product_id
+    LIMIT ?
+'''
+
+# Frees codes another product is about to take, so a code moved between products applies
+RELEASE_SKU = "UPDATE products SET sku = NULL WHERE sku = ? AND product_id != ?"
+RELEASE_BARCODE = "UPDATE products SET barcode = NULL WHERE barcode = ? AND product_id != ?"
+
+# Unchanged rows are skipped so updated_at only moves for real edits
+UPSERT_PRODUCT = '''
+    INSERT INTO products (product_id, name, price, sku, barcode) VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT(product_id) DO UPDATE SET
+        name = excluded.name, price = excluded.price, sku = excluded.sku, barcode = excluded.barcode
+    WHERE (products.name, products.price, products.sku, products.barcode)
+        IS NOT (excluded.name, excluded.price, excluded.sku, excluded.barcode)
+'''
+
+
+def store_url():
+    return os.getenv("STORE_URL", "").rstrip('/')
+
+
+def sync_token():
+    """Shared secret sent with every request, from SYNC_TOKEN (optional)"""
+    return os.getenv("SYNC_TOKEN", "")
+
+
+def encode(payload):
+    return gzip.compress(json.dumps(payload, separators=(',', ':')).encode('utf-8'))
+
+
+def decode(body):
+    return json.loads(gzip.decompress(body))
+
+
+def get_position(conn, name, default=0):
+    row = conn.execute("SELECT value FROM sync_state WHERE name = ?", (name,)).fetchone()
+    return row[0] if row else default
+
+
+def set_position(conn, name, value):
+    conn.execute('''
+        INSERT INTO sync_state (name, value) VALUES (?, ?)
+        ON CONFLICT(name) DO UPDATE SET value = excluded.value
+    ''', (name, value))
+
+
+def sales_after(conn, sale_id, limit=SALES_BATCH):
+    """Sales with a sale_id above sale_id as Cart.to_sale() records, plus the last sale_id read"""
+    headers = conn.execute(SALES_AFTER, (sale_id, limit)).fetchall()
+    if not headers:
+        return [], sale_id
+
+    lines = {}
+    first, last = headers[0][0], headers[-1][0]
+    for line_sale_id, *line in conn.execute(SALE_LINES_BETWEEN, (first, last)):
+        lines.setdefault(line_sale_id, []).append(line)
+
+    sales = [{
+        'sale_uuid': sale_uuid, 'username': username, 'register_id': register,
+        'shift': shift, 'created_at': created_at, 'subtotal': subtotal,
+        'discount': discount, 'total': total, 'lines': lines.get(header_id, []),
+    } for header_id, sale_uuid, username, register, shift, created_at, subtotal, discount, total
+        in headers]
+    return sales, headers[-1][0]
+
+
+def catalog_page(conn, since, after_id=0, limit=CATALOG_PAGE):
+    """Store side of a catalog pull: the products changed after changelog seq since
+
+    A till with no seq yet (since < 0), or one the pruned log no longer
+    reaches, gets a snapshot instead: every product, paged by product_id after after_id,
+    with the seq to continue from once the last page is applied.
+    """
+    if since >= 0 and changelog.is_complete(conn, since):
+        changes = conn.execute(CATALOG_CHANGES, (since, limit)).fetchall()
+        # Only the latest state of each product matters; rows come back in change order
+        latest = {product_id: (deleted, row) for _, product_id, *row, deleted in changes}
+        return {
+            'snapshot': False,
+            'seq': changes[-1][0] if changes else since,
+            'products': [[product_id, *row] for product_id, (deleted, row) in latest.items()
+                         if not deleted],
+            'deleted': [product_id for product_id, (deleted, _) in latest.items() if deleted],
+            'more': len(changes) == limit,
+        }
+
+    seq = changelog.latest_seq(conn)  # read first, so changes during the snapshot are replayed
+    rows = conn.execute(CATALOG_SNAPSHOT, (after_id, limit)).fetchall()
+    return {'snapshot': True, 'seq': seq, 'products': rows, 'deleted': [],
+            'more': len(rows) == limit}
+
+
+def apply_products(conn, rows):
+    """Upsert [product_id, name, price, sku, barcode] rows in the caller's transaction
+
+    Returns the number of products that changed.
+    """
+    conn.executemany(RELEASE_SKU, [(sku, product_id) for product_id, _, _, sku, _ in rows if sku])
+    conn.executemany(RELEASE_BARCODE, [(barcode, product_id)
+                                       for product_id, _, _, _, barcode in rows if barcode])
+    return conn.executemany(UPSERT_PRODUCT, rows).rowcount
+
+
+def delete_products(conn, product_ids):
+    """Remove products deleted on the store, with their stock rows; return how many were here"""
+    keys = [(product_id,) for product_id in product_ids]
+    conn.executemany("DELETE FROM inventory WHERE product_id = ?", keys)
+    return conn.executemany("DELETE FROM products WHERE product_id = ?", keys).rowcount
+
+
+class Replicator(QObject):
+    """Background thread that sends sales to the store and applies its catalog changes
+
+    Runs on its own connection and only reads sales already committed, so
+    checkout never waits on it; its writes are the small sync_state updates
+    and catalog deltas.
+    """
+
+    synced = pyqtSignal(int)            # sales acknowledged by the store
+    catalog_updated = pyqtSignal(int)   # products changed locally by a pull
+    failed = pyqtSignal(str)            # the store could not be reached; will retry
+
+    def __init__(self, url=None):
+        super().__init__()
+        self.url = url
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start replicating; does nothing when STORE_URL is not set"""
+        self.url = self.url or store_url()
+        if self._thread is not None or not self.url:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='store-sync', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def sync_once(self):
+        """Send one batch of sales and pull one page of products; True if more is waiting"""
+        conn = db.get_connection()
+        more = self.push_sales(conn)
+        return self.pull_catalog(conn) or more
+
+    def push_sales(self, conn):
+        sent = get_position(conn, 'sales_sent')
+        sales, last = sales_after(conn, sent)
+        if not sales:
+            return False
+        self._request('/sales', {'register_id': register_id(), 'sales': sales})
+        with conn:
+            set_position(conn, 'sales_sent', last)
+        self.synced.emit(len(sales))
+        return len(sales) == SALES_BATCH
+
+    def pull_catalog(self, conn):
+        since = get_position(conn, 'catalog_seq', default=-1)
+        after_id = get_position(conn, 'catalog_after_id')
+        page = self._request(f'/catalog?since={since}&after={after_id}')
+        with conn:
+            changed = (apply_products(conn, page['products'])
+                       + delete_products(conn, page['deleted']))
+            if not page['snapshot']:
+                set_position(conn, 'catalog_seq', page['seq'])
+            elif page['more']:
+                if not after_id:
+                    set_position(conn, 'catalog_snapshot_seq', page['seq'])
+                set_position(conn, 'catalog_after_id', page['products'][-1][0])
+            else:
+                # Snapshot complete; changes made while it was read follow as deltas
+                seq = get_position(conn, 'catalog_snapshot_seq') if after_id else page['seq']
+                set_position(conn, 'catalog_seq', seq)
+                set_position(conn, 'catalog_after_id', 0)
+        if changed:
+            self.catalog_updated.emit(changed)
+        return page['more']
+
+    def _request(self, path, payload=None):
+        data = None if payload is None else encode(payload)
+        request = urllib.request.Request(self.url + path, data=data)
+        if data is not None:
+            request.add_header('Content-Type', 'application/json')
+            request.add_header('Content-Encoding', 'gzip')
+        if sync_token():
+            request.add_header('X-Sync-Token', sync_token())
+        with urllib.request.urlopen(request, timeout=REQUEST_TIMEOUT) as response:
+            return decode(response.read())
+
+    def _run(self):
+        backoff = SYNC_INTERVAL
+        while not self._stop.is_set():
+            try:
+                more = self.sync_once()
+            except (OSError, ValueError, sqlite3.Error) as e:
+                # URLError and HTTPError are OSErrors; a locked database is retried the same way
+                self.failed.emit(str(e))
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, MAX_BACKOFF)
+                continue
+            backoff = SYNC_INTERVAL
+            self._stop.wait(BATCH_PAUSE if more else SYNC_INTERVAL)
+
+
+# Shared instance, started by main
+replicator = Replicator()
@@ -0,0 +1,120 @@
+"""Event-loop stall watchdog
+
+A QTimer on the GUI thread beats every HEARTBEAT_MS. A monitor thread
+checks the last beat; once the loop has been blocked for more than
+WATCHDOG_STALL_MS it logs the GUI thread's Python stack, then again every
+WATCHDOG_STALL_MS while the stall lasts (up to MAX_SAMPLES), and the total
+length once the loop runs again. The log rotates; see WATCHDOG_LOG.
+Set WATCHDOG=0 to turn it off.
+"""
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from logging.handlers import RotatingFileHandler
+
+from PyQt5.QtCore import QObject, QTimer
+
+ENABLED = os.getenv("WATCHDOG", "1") == "1"
+
+# The loop counts as stalled when a beat is this many milliseconds late
+STALL_MS = float(os.getenv("WATCHDOG_STALL_MS", "250"))
+
+HEARTBEAT_MS = 100
+
+# Stacks logged per stall; a long freeze shows its progress without flooding the log
+MAX_SAMPLES = 10
+
+# Rotation of the stall log
+LOG_MAX_BYTES = 1024 * 1024
+LOG_BACKUPS = 3
+
+
+def log_path():
+    """Stall log, from WATCHDOG_LOG (default: next to the database)"""
+    return os.getenv("WATCHDOG_LOG") or f"{os.getenv('DB_PATH', 'cashier.db')}.stalls.log"
+
+
+class Watchdog(QObject):
+    """Logs the GUI thread's stack whenever the event loop stops turning
+
+    start() must be called on the GUI thread once the QApplication exists.
+    """
+
+    def __init__(self, stall_ms=STALL_MS, path=None):
+        super().__init__()
+        self.stall_ms = stall_ms
+        self.path = path
+        self.logger = logging.getLogger('cashier.watchdog')
+        self.logger.propagate = False
+        self._timer = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._gui_thread = None
+        self._beat = 0.0
+
+    def start(self):
+        """Begin watching; does nothing when WATCHDOG=0"""
+        if self._thread is not None or not ENABLED:
+            return
+        if not self.logger.handlers:
+            handler = RotatingFileHandler(self.path or log_path(), maxBytes=LOG_MAX_BYTES,
+                                          backupCount=LOG_BACKUPS, encoding='utf-8')
+            handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(message)s'))
+            self.logger.addHandler(handler)
+            self.logger.setLevel(logging.INFO)
+
+        self._gui_thread = threading.get_ident()
+        self._beat = time.monotonic()
+        self._timer = QTimer(self)
+        self._timer.setInterval(HEARTBEAT_MS)
+        self._timer.timeout.connect(self.beat)
+        self._timer.start()
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='watchdog', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._timer.stop()
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def beat(self):
+        self._beat = time.monotonic()
+
+    def _run(self):
+        late = (HEARTBEAT_MS + self.stall_ms) / 1000
+        stalled_since = None    # beat the current stall started from
+        samples = 0
+        next_sample = 0.0
+        while not self._stop.wait(self.stall_ms / 4000):
+            beat, now = self._beat, time.monotonic()
+            if stalled_since is not None and beat != stalled_since:
+                self.logger.warning("Event loop resumed after %.0f ms",
+                                    (beat - stalled_since) * 1000 - HEARTBEAT_MS)
+                stalled_since = None
+            if now - beat < late:
+                continue
+            if stalled_since is None:
+                stalled_since, samples, next_sample = beat, 0, now
+            if samples < MAX_SAMPLES and now >= next_sample:
+                samples += 1
+                next_sample = now + self.stall_ms / 1000
+                self.logger.warning("Event loop blocked for %.0f ms (sample %d):\n%s",
+                                    (now - beat) * 1000 - HEARTBEAT_MS, samples, self.gui_stack())
+
+    def gui_stack(self):
+        frame = sys._current_frames().get(self._gui_thread)
+        if frame is None:
+            return "  (GUI thread not running Python code)"
+        return ''.join(traceback.format_stack(frame)).rstrip()
+
+
+# Shared instance, started by main
+watchdog = Watchdog()
@@ -0,0 +1,135 @@
+"""Store aggregator that the tills replicate to (see services/sync.py).
+
+    python store_server.py --db store.db --port 8765
+
+Tills POST gzip-compressed sale batches to /sales; each batch is stored
+in one transaction keyed on sale_uuid, so resent batches are harmless.
+Each sale keeps the username and register_id the till sent. The store's
+inventory is left alone: stock is counted and decremented on the tills.
+GET /catalog?since=SEQ&after=ID returns the products the store's change
+log shows as changed or deleted after SEQ, or a snapshot page for a
+till that has no usable SEQ (see services.sync.catalog_page). Manage the
+store's catalog with catalog_io.py --db store.db; the tills pick the
+changes up on their next sync. Requests are handled one at a time on a
+single connection.
+
+Without SYNC_TOKEN the server only listens on the loopback interface;
+set the same SYNC_TOKEN on the store and the tills to serve the LAN.
+"""
+import argparse
+import hmac
+import ipaddress
+import os
+import socket
+import sqlite3
+import sys
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import db
+from services.cart import record_sale
+from services import changelog
+from services.sync import catalog_page, decode, encode, sync_token
+
+# Largest request body accepted, compressed
+MAX_BODY = 32 * 1024 * 1024
+
+
+class StoreHandler(BaseHTTPRequestHandler):
+    timeout = 30
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path != '/catalog':
+            return self.send_error(404)
+        if not self.authorized():
+            return self.send_error(403)
+        query = parse_qs(url.query)
+        try:
+            since = int(query.get('since', ['-1'])[0])
+            after_id = int(query.get('after', ['0'])[0])
+        except ValueError:
+            return self.send_error(400, "since and after must be integers")
+        self.reply(catalog_page(db.get_connection(), since, after_id))
+
+    def do_POST(self):
+        if urlsplit(self.path).path != '/sales':
+            return self.send_error(404)
+        if not self.authorized():
+            return self.send_error(403)
+        length = int(self.headers.get('Content-Length', 0))
+        if not 0 < length <= MAX_BODY:
+            return self.send_error(413 if length else 411)
+        try:
+            batch = decode(self.rfile.read(length))
+            sales = batch['sales']
+        except (OSError, ValueError, KeyError, TypeError):
+            return self.send_error(400, "expected a gzip-compressed JSON batch")
+
+        # Stock levels belong to the tills, which already decremented them
+        conn = db.get_connection()
+        try:
+            with conn:
+                stored = sum(record_sale(conn, sale, apply_stock=False) is not None
+                             for sale in sales)
+        except (sqlite3.Error, KeyError, TypeError) as e:
+            return self.send_error(500, str(e))
+        self.log_message("register %s: %d sales, %d new", batch.get('register_id'), len(sales),
+                         stored)
+        self.reply({'received': len(sales), 'stored': stored})
+
+    def authorized(self):
+        token = sync_token()
+        if not token:
+            return True     # main() only allows this on a loopback address
+        sent = self.headers.get('X-Sync-Token', '')
+        return hmac.compare_digest(sent.encode('utf-8'), token.encode('utf-8'))
+
+    def reply(self, payload):
+        body = encode(payload)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def is_loopback(host):
+    """Whether every address host resolves to is on the loopback interface"""
+    try:
+        return all(ipaddress.ip_address(info[4][0]).is_loopback
+                   for info in socket.getaddrinfo(host, None))
+    except (OSError, ValueError):
+        return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--db', default='store.db', help="store database, created if missing")
+    parser.add_argument('--host', help="address to listen on (default: all interfaces if "
+                                       "SYNC_TOKEN is set, else 127.0.0.1)")
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+
+    if args.host is None:
+        args.host = '0.0.0.0' if sync_token() else '127.0.0.1'
+    elif not sync_token() and not is_loopback(args.host):
+        parser.error(f"refusing to listen on {args.host} without SYNC_TOKEN set")
+
+    os.environ['DB_PATH'] = args.db
+    db.setup_database(args.db)
+    changelog.prune()
+    server = HTTPServer((args.host, args.port), StoreHandler)
+    print(f"store server on {args.host}:{args.port}, database {args.db}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        db.close_all()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
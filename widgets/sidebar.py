@@ -1,16 +1,9 @@
-from msilib.schema import Icon
-import sqlite3
 from PyQt5.QtWidgets import QApplication, QMainWindow, QVBoxLayout, QWidget, QPushButton, QComboBox, QSpinBox, QLabel, QHBoxLayout, QGridLayout, QStackedWidget, QFrame, QLineEdit, QMessageBox
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QVBoxLayout, QWidget, 
     QPushButton, QComboBox, QSpinBox, QLabel, QHBoxLayout, QGridLayout, 
     QStackedWidget, QFrame)
 from PyQt5.QtCore import Qt, pyqtSignal
 
-import os
-from dotenv import load_dotenv
-load_dotenv()
-
-DB_PATH = os.getenv("DB_PATH")
 
 class Sidebar(QFrame):
     def __init__(self, parent=None):
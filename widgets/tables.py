@@ -0,0 +1,439 @@
+from PyQt5.QtWidgets import (QStyledItemDelegate, QStyleOptionButton, QStyle, QApplication,
+    QTableView, QAbstractItemView, QLineEdit, QMessageBox)
+from PyQt5.QtGui import QPainter
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex, QEvent, QRect, QSize, QTimer, pyqtSignal
+
+import db
+from services.queries import executor
+
+
+class QueryTableModel(QAbstractTableModel):
+    """Table model that holds a window of rows from SQLite around what the view shows
+
+    Pages are read on the query thread and added when they arrive; loading
+    is True while one is in flight. Scrolling down appends pages (Qt's
+    fetchMore) and scrolling back up prepends the pages before the first
+    held row. At most window_pages pages are held: once more arrive, the
+    rows furthest from the viewport the view reports through
+    set_viewport() are dropped and read again if the user comes back.
+    head_shifted tells the view how many rows were added (or dropped)
+    above it, so it can keep the same rows on screen. upsert() re-reads
+    an edited row on the query thread too.
+
+    Subclasses set headers, key_column and sort_keys and implement query()
+    and cell(). Rows are plain tuples whose first element is the primary
+    key. sort_keys maps each sortable column to the (sql expression, row
+    index) pairs that order it uniquely, so a page starts right after (or
+    before) a held row (keyset paging).
+    """
+
+    loading_changed = pyqtSignal(bool)
+    load_failed = pyqtSignal(str)
+    head_shifted = pyqtSignal(int)  # rows added (negative: dropped) above the held ones
+
+    headers = []
+    table = None
+    key_column = None
+    sort_keys = {}
+    page_size = 200
+    window_pages = 3
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.rows = []
+        self.keys = {}          # key -> held row, so find() need not scan
+        self.patching = {}      # key -> changed again while its re-read was in flight
+        self.has_more = True    # rows after the last held one
+        self.has_before = False  # rows before the first held one, dropped earlier
+        self.loading = False
+        self.viewport = (0, 0)  # first and last row the view shows
+        self.filters = {}
+        self.sort_column = next(iter(self.sort_keys), 0)
+        self.sort_order = Qt.AscendingOrder
+
+    def query(self, where, params, order_by, limit):
+        """(sql, params) reading up to limit rows matching where and the filters, in order_by"""
+        raise NotImplementedError
+
+    def fetch(self, where, params, limit, backward=False):
+        order_by = self.order_by(reverse=backward)
+        return db.get_connection().execute(*self.query(where, params, order_by, limit)).fetchall()
+
+    def fetch_page(self, after, limit):
+        """Return up to limit rows following the row after (None for the first page)"""
+        where, params = self.keyset(after)
+        return self.fetch(where, params, limit)
+
+    def fetch_page_before(self, before, limit):
+        """Return up to limit rows preceding the row before, in display order"""
+        where, params = self.keyset(before, backward=True)
+        return self.fetch(where, params, limit, backward=True)[::-1]
+
+    def fetch_row(self, key):
+        """Return the row with this key, or None if it is gone or filtered out"""
+        rows = self.fetch(f'{self.key_column} = ?', [key], 1)
+        return rows[0] if rows else None
+
+    def order_by(self, reverse=False):
+        descending = (self.sort_order == Qt.DescendingOrder) != reverse
+        direction = 'DESC' if descending else 'ASC'
+        return ', '.join(f'{expr} {direction}' for expr, _ in self.sort_keys[self.sort_column])
+
+    def keyset(self, after, backward=False):
+        """SQL condition and parameters selecting the rows that sort after (or before) a row"""
+        if after is None:
+            return '1', []
+        keys = self.sort_keys[self.sort_column]
+        descending = (self.sort_order == Qt.DescendingOrder) != backward
+        op = '<' if descending else '>'
+        columns = ', '.join(expr for expr, _ in keys)
+        marks = ', '.join('?' for _ in keys)
+        return f'({columns}) {op} ({marks})', [after[index] for _, index in keys]
+
+    def set_filter(self, name, value):
+        """Set or clear (value None / empty) a named filter and reload"""
+        if value in (None, ''):
+            self.filters.pop(name, None)
+        else:
+            self.filters[name] = value
+        self.reload()
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        if column not in self.sort_keys:
+            return
+        self.sort_column = column
+        self.sort_order = order
+        self.reload()
+
+    def cell(self, row, column):
+        """Display value for a column of a row tuple"""
+        raise NotImplementedError
+
+    def reload(self):
+        executor.cancel(self)  # a page for the old filters / sort is useless now
+        self.beginResetModel()
+        self.rows = []
+        self.keys = {}
+        self.patching = {}
+        self.has_more = True
+        self.has_before = False
+        self.set_loading(False)
+        self.endResetModel()
+
+    def set_loading(self, loading):
+        if loading != self.loading:
+            self.loading = loading
+            self.loading_changed.emit(loading)
+
+    def row_at(self, row):
+        return self.rows[row]
+
+    def set_row(self, i, row):
+        """Replace the held row at position i (same key)"""
+        self.rows[i] = row
+        self.keys[row[0]] = row
+        self.dataChanged.emit(self.index(i, 0), self.index(i, self.columnCount() - 1))
+
+    def find(self, key):
+        """Position of the held row with this key, or -1"""
+        row = self.keys.get(key)
+        if row is None:
+            return -1
+        i = self.position(row)
+        if i < len(self.rows) and self.rows[i][0] == key:
+            return i
+        # A row edited in place without set_row() no longer sorts where its old value says
+        for i, held in enumerate(self.rows):
+            if held[0] == key:
+                return i
+        return -1
+
+    def sort_value(self, row):
+        return tuple(row[index] for _, index in self.sort_keys[self.sort_column])
+
+    def position(self, row):
+        """Where a row belongs among the held rows under the current sort"""
+        value = self.sort_value(row)
+        descending = self.sort_order == Qt.DescendingOrder
+        lo, hi = 0, len(self.rows)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            other = self.sort_value(self.rows[mid])
+            if (other > value) if descending else (other < value):
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def upsert(self, key):
+        """Re-read one row on the query thread after it was inserted or updated"""
+        if key in self.patching:
+            self.patching[key] = True  # the read in flight may predate this change
+            return
+        self.patching[key] = False
+        executor.submit(self.fetch_row, key, on_done=lambda row: self.patched(key, row),
+                        on_error=lambda message: self.patch_failed(key, message), owner=self)
+
+    def patched(self, key, row):
+        """Put a re-read row in place, or read it again if it changed meanwhile"""
+        if self.patching.pop(key):
+            self.upsert(key)
+            return
+        i = self.find(key)
+        if row is None:  # deleted, or no longer matches the filters
+            self.remove(key)
+            return
+        if i >= 0 and self.sort_value(self.rows[i]) == self.sort_value(row):
+            self.set_row(i, row)
+            return
+        if i >= 0:
+            self.remove(key)
+        # A row sorting outside the held window arrives with the page it falls in
+        i = self.position(row)
+        if (i < len(self.rows) or not self.has_more) and (i > 0 or not self.has_before):
+            self.beginInsertRows(QModelIndex(), i, i)
+            self.rows.insert(i, row)
+            self.keys[key] = row
+            self.endInsertRows()
+
+    def patch_failed(self, key, message):
+        self.patching.pop(key, None)
+        self.load_failed.emit(message)
+
+    def remove(self, key):
+        if key in self.patching:
+            self.patching[key] = True  # a read from before the delete must not put it back
+        i = self.find(key)
+        if i >= 0:
+            self.beginRemoveRows(QModelIndex(), i, i)
+            del self.rows[i]
+            del self.keys[key]
+            self.endRemoveRows()
+
+    def on_changed(self, table, key):
+        if table == self.table:
+            self.upsert(key)
+
+    def on_removed(self, table, key):
+        if table == self.table:
+            self.remove(key)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.headers)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.headers[section]
+        return super().headerData(section, orientation, role)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and index.isValid():
+            return self.cell(self.rows[index.row()], index.column())
+        return None
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self.has_more and not self.loading
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or self.loading:
+            return
+        self.set_loading(True)
+        executor.submit(self.fetch_page, self.rows[-1] if self.rows else None, self.page_size,
+                        on_done=self.append_page, on_error=self.on_fetch_error, owner=self)
+
+    def fetch_before(self):
+        """Read back the page before the first held row, dropped earlier"""
+        if self.loading or not self.has_before or not self.rows:
+            return
+        self.set_loading(True)
+        executor.submit(self.fetch_page_before, self.rows[0], self.page_size,
+                        on_done=self.prepend_page, on_error=self.on_fetch_error, owner=self)
+
+    def set_viewport(self, first, last):
+        """Called by the view as it scrolls; reads back dropped rows when it nears them"""
+        self.viewport = (first, last)
+        if first < self.page_size // 2:
+            self.fetch_before()
+
+    def append_page(self, page):
+        self.set_loading(False)
+        self.has_more = len(page) == self.page_size
+        if page:
+            self.beginInsertRows(QModelIndex(), len(self.rows), len(self.rows) + len(page) - 1)
+            self.rows.extend(page)
+            self.keys.update((row[0], row) for row in page)
+            self.endInsertRows()
+            self.drop_head()
+
+    def prepend_page(self, page):
+        self.set_loading(False)
+        self.has_before = len(page) == self.page_size
+        if page:
+            self.beginInsertRows(QModelIndex(), 0, len(page) - 1)
+            self.rows[:0] = page
+            self.keys.update((row[0], row) for row in page)
+            self.endInsertRows()
+            self.viewport = tuple(i + len(page) for i in self.viewport)
+            self.head_shifted.emit(len(page))
+            self.drop_tail()
+
+    def drop_head(self):
+        """Drop held rows above the viewport beyond the window, keeping a page of margin"""
+        excess = len(self.rows) - self.page_size * self.window_pages
+        count = min(excess, self.viewport[0] - self.page_size)
+        if count <= 0:
+            return
+        self.beginRemoveRows(QModelIndex(), 0, count - 1)
+        for row in self.rows[:count]:
+            del self.keys[row[0]]
+        del self.rows[:count]
+        self.endRemoveRows()
+        self.has_before = True
+        self.viewport = tuple(i - count for i in self.viewport)
+        self.head_shifted.emit(-count)
+
+    def drop_tail(self):
+        """Drop held rows below the viewport beyond the window, keeping a page of margin"""
+        excess = len(self.rows) - self.page_size * self.window_pages
+        count = min(excess, len(self.rows) - 1 - self.viewport[1] - self.page_size)
+        if count <= 0:
+            return
+        start = len(self.rows) - count
+        self.beginRemoveRows(QModelIndex(), start, len(self.rows) - 1)
+        for row in self.rows[start:]:
+            del self.keys[row[0]]
+        del self.rows[start:]
+        self.endRemoveRows()
+        self.has_more = True
+
+    def on_fetch_error(self, message):
+        self.set_loading(False)
+        self.has_more = False
+        self.has_before = False
+        self.load_failed.emit(message)
+
+
+class ActionButtonDelegate(QStyledItemDelegate):
+    """Paints a row of push buttons in a cell without creating widgets per row"""
+
+    clicked = pyqtSignal(str, int)  # action label, row
+
+    MARGIN = 2
+
+    def __init__(self, actions, parent=None):
+        super().__init__(parent)
+        self.actions = actions
+
+    def button_rects(self, rect):
+        width = (rect.width() - self.MARGIN * (len(self.actions) + 1)) // len(self.actions)
+        return [QRect(rect.x() + self.MARGIN + i * (width + self.MARGIN), rect.y() + self.MARGIN,
+                      width, rect.height() - 2 * self.MARGIN)
+                for i in range(len(self.actions))]
+
+    def paint(self, painter, option, index):
+        style = option.widget.style() if option.widget else QApplication.style()
+        for label, rect in zip(self.actions, self.button_rects(option.rect)):
+            button = QStyleOptionButton()
+            button.rect = rect
+            button.text = label
+            button.state = QStyle.State_Enabled | QStyle.State_Raised
+            style.drawControl(QStyle.CE_PushButton, button, painter, option.widget)
+
+    def editorEvent(self, event, model, option, index):
+        if event.type() == QEvent.MouseButtonRelease and event.button() == Qt.LeftButton:
+            for label, rect in zip(self.actions, self.button_rects(option.rect)):
+                if rect.contains(event.pos()):
+                    self.clicked.emit(label, index.row())
+                    return True
+        return False
+
+    def sizeHint(self, option, index):
+        return QSize(80 * len(self.actions), 30)
+
+
+class QueryTableView(QTableView):
+    """Read-only, row-selecting view with optional delegate-painted action buttons"""
+
+    action_clicked = pyqtSignal(str, int)  # action label, row
+
+    def __init__(self, model, action_column=None, actions=(), sortable=False, parent=None):
+        super().__init__(parent)
+        self.setModel(model)
+        self.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.verticalHeader().setDefaultSectionSize(32)
+        if actions:
+            delegate = ActionButtonDelegate(actions, self)
+            delegate.clicked.connect(self.action_clicked)
+            self.setItemDelegateForColumn(action_column, delegate)
+            self.setColumnWidth(action_column, 80 * len(actions))
+        model.loading_changed.connect(self.viewport().update)
+        model.load_failed.connect(self.show_error)
+        model.head_shifted.connect(self.keep_position)
+        self.verticalScrollBar().valueChanged.connect(self.report_viewport)
+        if sortable:
+            # Clicking a header re-queries with a different ORDER BY
+            self.setSortingEnabled(True)
+            self.sortByColumn(model.sort_column, Qt.AscendingOrder)
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if self.model().loading and not self.model().rowCount():
+            painter = QPainter(self.viewport())
+            painter.setPen(self.palette().placeholderText().color())
+            painter.drawText(self.viewport().rect(), Qt.AlignCenter, "Loading...")
+
+    def report_viewport(self):
+        """Tell the model which rows are on screen, so it can drop or read back the rest"""
+        first = self.rowAt(0)
+        last = self.rowAt(self.viewport().height() - 1)
+        rows = self.model().rowCount()
+        self.model().set_viewport(max(first, 0), last if last >= 0 else rows - 1)
+
+    def keep_position(self, rows):
+        """Scroll by the rows the model added or dropped above, so the same rows stay on screen"""
+        self.updateGeometries()
+        if self.verticalScrollMode() == QAbstractItemView.ScrollPerPixel:
+            rows *= self.verticalHeader().defaultSectionSize()
+        bar = self.verticalScrollBar()
+        bar.setValue(bar.value() + rows)
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.report_viewport()
+
+    def hideEvent(self, event):
+        # Navigated away mid-load: drop the page, it is fetched again when shown
+        if self.model().loading:
+            self.model().reload()
+        super().hideEvent(event)
+
+    def show_error(self, message):
+        QMessageBox.warning(self, "Database Error", f"Failed to load rows: {message}")
+
+
+class SearchBox(QLineEdit):
+    """Line edit that reports its text once typing pauses, not on every keystroke"""
+
+    search = pyqtSignal(str)
+
+    DEBOUNCE_MS = 250
+
+    def __init__(self, placeholder="Search...", parent=None):
+        super().__init__(parent)
+        self.setPlaceholderText(placeholder)
+        self.setClearButtonEnabled(True)
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(self.DEBOUNCE_MS)
+        self.timer.timeout.connect(lambda: self.search.emit(self.text().strip()))
+        self.textChanged.connect(self.timer.start)
+        self.returnPressed.connect(self.flush)
+
+    def flush(self):
+        """Report the current text now"""
+        self.timer.stop()
+        self.search.emit(self.text().strip())